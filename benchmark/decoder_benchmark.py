@@ -0,0 +1,87 @@
+# coding: utf-8
+import sys
+import time
+import statistics
+
+from collections import Counter, defaultdict
+
+try:
+    from clients.capture import read_frames
+    from clients.decoder import MessageDecoder, DECODER_BACKENDS
+except ImportError:
+    import os
+
+    CURRENT_DIR = os.path.dirname(sys.argv[0])
+
+    sys.path.append(os.path.join(CURRENT_DIR, "../"))
+
+    from clients.capture import read_frames
+    from clients.decoder import MessageDecoder, DECODER_BACKENDS
+
+
+def load_frames(path, count=50000):
+    """
+    Load captured frames, e.g. by: python -m examples.replay capture
+    :param path: segment file, directory or glob pattern
+    :param count: max frames loaded
+    :return: list of raw frames
+    """
+    frames = list()
+
+    for captured in read_frames(path):
+        frames.append(captured.frame)
+
+        if len(frames) >= count:
+            break
+
+    return frames
+
+
+def busiest_table(frames):
+    decoder = MessageDecoder()
+
+    tables = Counter()
+
+    for frame in frames:
+        message = decoder.decode(frame)
+
+        if isinstance(message, dict) and "table" in message:
+            tables[message["table"]] += 1
+
+    return tables.most_common(1)[0][0]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: decoder_benchmark.py <capture path> [count]")
+        sys.exit(1)
+
+    frame_list = load_frames(
+        sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 50000)
+    skip_table = busiest_table(frame_list)
+
+    print("{} captured frames, skipped table: {}".format(
+        len(frame_list), skip_table))
+
+    metrics = defaultdict(list)
+
+    for run in range(10):
+        for backend in DECODER_BACKENDS:
+            for ignore in ((), (skip_table, )):
+                decoder = MessageDecoder(backend=backend,
+                                         ignore_tables=ignore)
+
+                start = time.perf_counter()
+                for frame in frame_list:
+                    decoder.decode(frame)
+                time_span = time.perf_counter() - start
+
+                metrics[(backend, bool(ignore))].append(
+                    len(frame_list) / time_span)
+
+    for (backend, ignored), value_list in metrics.items():
+        print("{:<12s}{:<24s}decode rate: Avg[{:.2f}] Max[{:.2f}] "
+              "Std[{:.2f}] fps".format(
+                backend, "skip " + skip_table if ignored else "full",
+                statistics.mean(value_list), max(value_list),
+                statistics.stdev(value_list)))
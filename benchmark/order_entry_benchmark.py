@@ -0,0 +1,123 @@
+# coding: utf-8
+import json
+import statistics
+import sys
+import time
+
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+try:
+    from clients.nge_rest import api
+    from clients.order_entry import OrderEntryClient
+except ImportError:
+    import os
+
+    CURRENT_DIR = os.path.dirname(sys.argv[0])
+
+    sys.path.append(os.path.join(CURRENT_DIR, "../"))
+
+    from clients.nge_rest import api
+    from clients.order_entry import OrderEntryClient
+
+
+ORDER = {"orderID": "00000000-0000-0000-0000-000000000001",
+         "symbol": "XBTUSD", "side": "Buy", "orderQty": 10, "price": 100.5,
+         "ordStatus": "New"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers & body are written separately, avoid delayed ack stall
+    disable_nagle_algorithm = True
+
+    SINGLE = json.dumps(ORDER).encode("utf-8")
+    LIST = json.dumps([ORDER]).encode("utf-8")
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if self.command == "DELETE" or self.path.endswith("/bulk"):
+            content = self.LIST
+        else:
+            content = self.SINGLE
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_POST = do_PUT = do_DELETE = _handle
+
+
+def swagger_calls(client):
+    order = client.Order
+
+    return {
+        "new": lambda: order.Order_new(
+            symbol="XBTUSD", side="Buy", orderQty=10, price=100.5).result(),
+        "amend": lambda: order.Order_amend(
+            orderID=ORDER["orderID"], price=101.0).result(),
+        "cancel": lambda: order.Order_cancel(
+            orderID=ORDER["orderID"]).result(),
+        "newBulk": lambda: order.Order_newBulk(orders=[
+            dict(symbol="XBTUSD", side="Buy", orderQty=10, price=100.5)
+        ] * 5).result()
+    }
+
+
+def direct_calls(client):
+    return {
+        "new": lambda: client.new(
+            symbol="XBTUSD", side="Buy", orderQty=10, price=100.5),
+        "amend": lambda: client.amend(
+            orderID=ORDER["orderID"], price=101.0),
+        "cancel": lambda: client.cancel(orderID=ORDER["orderID"]),
+        "newBulk": lambda: client.new_bulk([
+            dict(symbol="XBTUSD", side="Buy", orderQty=10, price=100.5)
+        ] * 5)
+    }
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+
+    server_thread = Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    url = "http://127.0.0.1:{}".format(server.server_port)
+
+    paths = {
+        "bravado": swagger_calls(
+            api(host=url, api_key="key", api_secret="secret")),
+        "direct": direct_calls(OrderEntryClient(url, "key", "secret"))
+    }
+
+    metrics = defaultdict(list)
+
+    for run in range(5):
+        for path_name, calls in paths.items():
+            for call_name, call in calls.items():
+                start = time.perf_counter()
+                for _ in range(count):
+                    call()
+                time_span = time.perf_counter() - start
+
+                metrics[(call_name, path_name)].append(count / time_span)
+
+    for (call_name, path_name), value_list in sorted(metrics.items()):
+        print("{:<10s}{:<10s}request rate: Avg[{:.2f}] Max[{:.2f}] "
+              "Std[{:.2f}] rps".format(
+                call_name, path_name, statistics.mean(value_list),
+                max(value_list), statistics.stdev(value_list)))
+
+    server.shutdown()
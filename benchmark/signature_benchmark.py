@@ -0,0 +1,91 @@
+# coding: utf-8
+import json
+import statistics
+import sys
+import time
+
+from collections import OrderedDict, defaultdict
+
+import requests
+
+try:
+    from clients.nge_rest import NGEAPIKeyAuthenticator
+    from clients.utils import generate_signature, Signer
+except ImportError:
+    import os
+
+    CURRENT_DIR = os.path.dirname(sys.argv[0])
+
+    sys.path.append(os.path.join(CURRENT_DIR, "../"))
+
+    from clients.nge_rest import NGEAPIKeyAuthenticator
+    from clients.utils import generate_signature, Signer
+
+
+SECRET = ("sKNKrI5BTh122tDs4DtHBpy5quM9v05XIpcw6y7s"
+          "m0AhT0Lu5nEmq8g43K860CE9IgM6e9xgB7Ffx61bDa")
+
+URL = "https://www.btcmex.com/api/v1/order"
+PATH = "/api/v1/order"
+ORDER = OrderedDict(symbol="XBTUSD", side="Buy", orderQty=10, price=100.5,
+                    clOrdID="00000000-0000-0000-0000-000000000001")
+BODY = json.dumps(ORDER)
+BODY_BYTES = BODY.encode("utf-8")
+
+
+def legacy_apply(authenticator, req):
+    """
+    Authenticator.apply() before Signer, prepares request for path and
+    leaves body serialized again by requests.
+    """
+    expires = int(round(time.time()) + 5)
+    req.headers['api-expires'] = str(expires)
+    req.headers['api-key'] = authenticator.api_key
+    req.json = OrderedDict(req.data)
+    req.data = None
+    prepared = req.prepare()
+    body = json.dumps(req.json)
+    req.headers['api-signature'] = generate_signature(
+        authenticator.api_secret, req.method, prepared.path_url, expires,
+        body)
+    return req
+
+
+def new_request():
+    return requests.Request("POST", URL, data=ORDER, params=dict())
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    authenticator = NGEAPIKeyAuthenticator(URL, "key", SECRET)
+    signer = Signer(SECRET)
+
+    cases = {
+        "generate_signature": lambda: generate_signature(
+            SECRET, "POST", URL, 1700000000, BODY),
+        "Signer.sign": lambda: signer.sign(
+            "POST", PATH, 1700000000, BODY_BYTES),
+        # apply & prepare as RequestsClient does
+        "legacy apply+prepare": lambda: legacy_apply(
+            authenticator, new_request()).prepare(),
+        "apply+prepare": lambda: authenticator.apply(
+            new_request()).prepare()
+    }
+
+    metrics = defaultdict(list)
+
+    for run in range(5):
+        for name, case in cases.items():
+            start = time.perf_counter()
+            for _ in range(count):
+                case()
+            time_span = time.perf_counter() - start
+
+            metrics[name].append(count / time_span)
+
+    for name, value_list in metrics.items():
+        print("{:<22s}rate: Avg[{:.2f}] Max[{:.2f}] Std[{:.2f}] "
+              "per second".format(name, statistics.mean(value_list),
+                                  max(value_list),
+                                  statistics.stdev(value_list)))
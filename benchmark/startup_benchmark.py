@@ -0,0 +1,65 @@
+# coding: utf-8
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import os
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(CURRENT_DIR, "../")
+
+sys.path.append(ROOT_DIR)
+
+from clients.nge_rest import SPEC_CACHE_DIR  # noqa: E402
+
+
+MEASURE_SCRIPT = """
+import json
+import time
+
+from clients.nge_rest import api
+
+start = time.perf_counter()
+api(host="http://127.0.0.1", api_key="key", api_secret="secret")
+first = time.perf_counter() - start
+
+start = time.perf_counter()
+api(host="http://127.0.0.1", api_key="key", api_secret="secret")
+shared = time.perf_counter() - start
+
+start = time.perf_counter()
+api(host="http://127.0.0.1", api_key="key", api_secret="secret",
+    shared=False)
+rebuilt = time.perf_counter() - start
+
+print(json.dumps([first, shared, rebuilt]))
+"""
+
+
+def measure(cold):
+    if cold:
+        shutil.rmtree(SPEC_CACHE_DIR, ignore_errors=True)
+
+    output = subprocess.check_output(
+        [sys.executable, "-c", MEASURE_SCRIPT], cwd=ROOT_DIR)
+
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    results = {"cold": list(), "warm": list()}
+
+    for _ in range(rounds):
+        results["cold"].append(measure(cold=True))
+        results["warm"].append(measure(cold=False))
+
+    for name, samples in results.items():
+        first, shared, rebuilt = zip(*samples)
+
+        print("{}: first api() {:.3f}s, shared {:.4f}s, "
+              "rebuilt in process {:.3f}s".format(
+                name, statistics.mean(first), statistics.mean(shared),
+                statistics.mean(rebuilt)))
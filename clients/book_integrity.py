@@ -0,0 +1,125 @@
+# coding: utf-8
+import logging
+import time
+
+from threading import Event, Thread
+
+
+logger = logging.getLogger(__name__)
+
+
+def top_levels(book, depth):
+    """
+    Get top price levels of both sides.
+    :param book: orderBookL2 rows
+    :param depth: levels per side
+    :return: (bids, asks) as lists of (price, size)
+    """
+    bids = sorted(((level["price"], level["size"]) for level in book
+                   if level["side"] == "Buy"), reverse=True)
+    asks = sorted((level["price"], level["size"]) for level in book
+                  if level["side"] == "Sell")
+
+    return bids[:depth], asks[:depth]
+
+
+class BookIntegrityChecker(object):
+    """
+    Check orderBookL2 of websocket periodically: crossed book, and
+    difference of top levels with REST snapshot. Inconsistent table is
+    resynced by websocket. Both books keep moving while comparing, so
+    REST difference must be seen in CONFIRM_COUNT continuous comparisons
+    with RECHECK_DELAY seconds between.
+
+    check() sleeps and fetches REST snapshots blocking, so it runs in
+    checker's own thread, it must not be called in an event loop.
+    """
+
+    CHECK_INTERVAL = 60
+    DEPTH = 25
+    CONFIRM_COUNT = 2
+    RECHECK_DELAY = 1
+
+    def __init__(self, ws, fetch_book, interval=CHECK_INTERVAL, depth=DEPTH,
+                 running=None):
+        """
+        :param ws: NGEWebsocket
+        :param fetch_book: function(symbol, depth) to get REST
+        orderBookL2 rows
+        :param interval: check interval seconds, 0 for checking manually
+        :param depth: compared levels per side
+        :param running: running flag Event of websocket
+        """
+        self._ws = ws
+        self._fetch_book = fetch_book
+        self._interval = interval
+        self._depth = depth
+
+        self._running_flag = running if running else Event()
+
+        if interval:
+            self._checker_tr = Thread(target=self.__run,
+                                      name="book-integrity")
+            self._checker_tr.daemon = True
+            self._checker_tr.start()
+
+    @property
+    def metrics(self):
+        return self._ws.integrity_metrics
+
+    def check(self, symbol=None):
+        """
+        Check orderBookL2 of symbol, resync it if inconsistent.
+        It blocks, never call it in event loop of AsyncTrader.
+        :param symbol: primary symbol if not specified
+        :return: True if consistent
+        """
+        symbol = symbol or self._ws.symbol
+
+        if self._ws.is_stale:
+            return True
+
+        self.metrics["check"] += 1
+
+        if self._ws.is_crossed(symbol):
+            self.metrics["crossed"] += 1
+
+            self._ws.resync_table("orderBookL2", symbol)
+
+            return False
+
+        for count in range(1, self.CONFIRM_COUNT + 1):
+            if count > 1:
+                time.sleep(self.RECHECK_DELAY)
+
+            remote = top_levels(self._fetch_book(symbol, self._depth),
+                                self._depth)
+            # local book after REST response is closer to REST snapshot
+            local = top_levels(
+                self._ws.snapshot(symbol).tables.get("orderBookL2", ()),
+                self._depth)
+
+            if local == remote:
+                return True
+
+            self.metrics["mismatch"] += 1
+
+        logger.warning(
+            "orderBookL2 of {} mismatch with REST in {} checks.".format(
+                symbol, self.CONFIRM_COUNT))
+
+        self._ws.resync_table("orderBookL2", symbol)
+
+        return False
+
+    def __run(self):
+        self._running_flag.wait()
+
+        while self._running_flag.is_set():
+            time.sleep(self._interval)
+
+            for symbol in list(self._ws.symbols):
+                try:
+                    self.check(symbol)
+                except Exception as e:
+                    logger.exception(e)
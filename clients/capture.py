@@ -0,0 +1,189 @@
+# coding: utf-8
+import glob
+import gzip
+import logging
+import os
+import struct
+
+from collections import namedtuple
+from queue import Queue, Full
+from threading import Thread
+
+
+logger = logging.getLogger(__name__)
+
+CapturedFrame = namedtuple("CapturedFrame", ("timestamp", "frame"))
+
+# receipt timestamp in epoch nanoseconds, frame length
+RECORD_HEADER = struct.Struct("<qI")
+
+SEGMENT_SUFFIX = ".cap.gz"
+
+
+class FrameCapture(object):
+    """
+    Capture raw websocket frames into rotating gzip segments.
+
+    Frames are queued by socket thread and written by a background
+    writer thread, frames are dropped and counted instead of blocking
+    socket thread if queue is full.
+    Segment file is named by prefix and receipt timestamp of its first
+    frame, so segments are sorted in capture order by name.
+    """
+
+    SEGMENT_SIZE = 64 * 1024 * 1024
+    MAX_QUEUE = 100000
+    COMPRESS_LEVEL = 6
+
+    def __init__(self, directory, prefix="frames",
+                 segment_size=SEGMENT_SIZE, max_queue=MAX_QUEUE,
+                 compress_level=COMPRESS_LEVEL):
+        """
+        :param directory: segments directory, created if not exists
+        :param prefix: segment file name prefix
+        :param segment_size: uncompressed bytes per segment
+        :param max_queue: max frames pending to write
+        :param compress_level: gzip compress level
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.prefix = prefix
+
+        self._segment_size = segment_size
+        self._compress_level = compress_level
+
+        self._queue = Queue(maxsize=max_queue)
+
+        self._segment = None
+        self._segment_written = 0
+        self.segments = list()
+
+        self.captured = 0
+        self.dropped = 0
+
+        self._closed = False
+
+        self._writer = Thread(target=self.__run,
+                              name="{}-capture".format(prefix))
+        self._writer.daemon = True
+        self._writer.start()
+
+    def write(self, frame, ts):
+        """
+        Queue frame without blocking.
+        :param frame: str or bytes
+        :param ts: receipt timestamp in epoch nanoseconds
+        :return: False if frame dropped
+        """
+        if self._closed:
+            return False
+
+        try:
+            self._queue.put_nowait((ts, frame))
+        except Full:
+            self.dropped += 1
+            return False
+
+        return True
+
+    def close(self, timeout=None):
+        """
+        Write pending frames and close current segment.
+        :param timeout:
+        :return:
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+
+        self._writer.join(timeout)
+
+    def _rotate(self, ts):
+        if self._segment:
+            self._segment.close()
+
+        file_name = os.path.join(self.directory, "{}-{:019d}{}".format(
+            self.prefix, ts, SEGMENT_SUFFIX))
+
+        self._segment = gzip.open(file_name, "wb",
+                                  compresslevel=self._compress_level)
+        self._segment_written = 0
+        self.segments.append(file_name)
+
+        logger.info("Capturing frames to {}".format(file_name))
+
+    def __run(self):
+        while True:
+            record = self._queue.get()
+
+            if record is None:
+                break
+
+            ts, frame = record
+
+            if isinstance(frame, str):
+                frame = frame.encode("utf-8")
+
+            try:
+                if (not self._segment or
+                        self._segment_written >= self._segment_size):
+                    self._rotate(ts)
+
+                self._segment.write(RECORD_HEADER.pack(ts, len(frame)))
+                self._segment.write(frame)
+            except OSError as e:
+                logger.exception(e)
+                self.dropped += 1
+                continue
+
+            self._segment_written += RECORD_HEADER.size + len(frame)
+            self.captured += 1
+
+        if self._segment:
+            self._segment.close()
+            self._segment = None
+
+
+def list_segments(path, prefix="frames"):
+    """
+    List segment files in capture order.
+    :param path: segment file, directory or glob pattern
+    :param prefix: segment prefix if path is directory
+    :return:
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, "{}-*{}".format(prefix, SEGMENT_SUFFIX))
+
+    return sorted(glob.glob(path))
+
+
+def read_frames(path, prefix="frames"):
+    """
+    Iterate captured frames in capture order, truncated tail of
+    segment(e.g. process killed while capturing) is skipped.
+    :param path: segment file, directory or glob pattern
+    :param prefix: segment prefix if path is directory
+    :return: CapturedFrame iterator
+    """
+    for file_name in list_segments(path, prefix):
+        with gzip.open(file_name, "rb") as segment:
+            try:
+                while True:
+                    header = segment.read(RECORD_HEADER.size)
+
+                    if len(header) < RECORD_HEADER.size:
+                        break
+
+                    ts, length = RECORD_HEADER.unpack(header)
+                    frame = segment.read(length)
+
+                    if len(frame) < length:
+                        break
+
+                    yield CapturedFrame(ts, frame.decode("utf-8"))
+            except EOFError:
+                logger.warning(
+                    "segment {} is truncated.".format(file_name))
@@ -0,0 +1,121 @@
+# coding: utf-8
+import json
+import logging
+import re
+
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+def _load_backends():
+    backends = OrderedDict()
+
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        backends["orjson"] = orjson.loads
+
+    try:
+        import ujson
+    except ImportError:
+        pass
+    else:
+        backends["ujson"] = ujson.loads
+
+    # simplejson without C speedups is slower than stdlib
+    backends["json"] = json.loads
+
+    try:
+        import simplejson
+    except ImportError:
+        pass
+    else:
+        backends["simplejson"] = simplejson.loads
+
+    return backends
+
+
+# available json loads function in preferred order
+DECODER_BACKENDS = _load_backends()
+
+
+class MessageDecoder(object):
+    """
+    Decode websocket frames with the fastest available json backend.
+
+    Frames of ignored tables are dropped by peeking the table name
+    at frame head without decoding the whole frame, or after decoded
+    if table name is not found in frame head.
+    """
+
+    # table name is always leading in NGE & BitMEX frames
+    TABLE_PEEK_LEN = 64
+    TABLE_PATTERN = re.compile(r'"table"\s*:\s*"(?P<table>[^"]+)"')
+    TABLE_BYTES_PATTERN = re.compile(
+        rb'"table"\s*:\s*"(?P<table>[^"]+)"')
+
+    def __init__(self, backend=None, ignore_tables=None):
+        """
+        :param backend: backend name in DECODER_BACKENDS,
+        the fastest one if not specified
+        :param ignore_tables: table names not interested in
+        """
+        if not backend:
+            backend = next(iter(DECODER_BACKENDS))
+
+        try:
+            self._loads = DECODER_BACKENDS[backend]
+        except KeyError:
+            raise ValueError(
+                "json backend[{}] is not available, "
+                "valid backends: {}".format(
+                    backend, ", ".join(DECODER_BACKENDS)))
+
+        self._backend = backend
+        self._ignore_tables = frozenset(ignore_tables or ())
+
+        logger.debug("using json backend: {}".format(backend))
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def ignore_tables(self):
+        return self._ignore_tables
+
+    def peek_table(self, frame):
+        if isinstance(frame, bytes):
+            match = self.TABLE_BYTES_PATTERN.search(
+                frame, 0, self.TABLE_PEEK_LEN)
+
+            return match.group("table").decode() if match else None
+
+        match = self.TABLE_PATTERN.search(frame, 0, self.TABLE_PEEK_LEN)
+
+        return match.group("table") if match else None
+
+    def decode(self, frame):
+        """
+        Decode frame to message dict.
+        :param frame: raw frame
+        :return: None if frame belongs to ignored tables
+        :raise: ValueError
+        """
+        if not self._ignore_tables:
+            return self._loads(frame)
+
+        if self.peek_table(frame) in self._ignore_tables:
+            return None
+
+        message = self._loads(frame)
+
+        if isinstance(message, dict) and (
+                message.get("table") in self._ignore_tables):
+            return None
+
+        return message
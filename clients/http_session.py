@@ -0,0 +1,205 @@
+# coding: utf-8
+import time
+
+from threading import Lock, local
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from clients.rate_limit import (RateLimiter, RateLimitExceeded,
+                                request_priority)
+from clients.rest_metrics import RESTMetrics, operation_name
+
+
+# connecting latency of last new connection in current thread
+_connect_timing = local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter_ns()
+        super(_TimedHTTPConnection, self).connect()
+        _connect_timing.latency = time.perf_counter_ns() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter_ns()
+        super(_TimedHTTPSConnection, self).connect()
+        _connect_timing.latency = time.perf_counter_ns() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    Adapter measuring connecting latency of new connections.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
+
+
+class PooledSession(requests.Session):
+    """
+    Keep-alive session with connection pool, retries and default timeout.
+
+    Only idempotent methods are retried, orders sent by POST are never
+    duplicated by retrying.
+
+    Requests are paced by a RateLimiter of each api key if rate_limit
+    is enabled, limiters are updated by rate limit headers of responses.
+    Requests wait for budget up to RateLimiter.max_wait() of their
+    priority: cancels wait ahead of others, new orders fail fast instead
+    of stalling the calling thread.
+
+    Latencies, errors and requests in flight of each operation are
+    recorded in self.metrics if enabled.
+    """
+
+    POOL_CONNECTIONS = 10
+    POOL_SIZE = 10
+
+    RETRIES = 3
+    BACKOFF_FACTOR = 0.3
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    # (connect, read) timeout in seconds
+    TIMEOUT = (3.05, 10)
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS,
+                 pool_size=POOL_SIZE, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, timeout=TIMEOUT,
+                 rate_limit=True, metrics=True):
+        """
+        :param pool_connections: count of host pools
+        :param pool_size: max kept-alive connections per host
+        :param retries: max retries of idempotent requests
+        :param backoff_factor: retry backoff factor in seconds
+        :param timeout: default timeout if not specified by request
+        :param rate_limit: pace requests by rate limit headers
+        :param metrics: RESTMetrics, True for a new one, False to disable
+        """
+        super(PooledSession, self).__init__()
+
+        self.timeout = timeout
+
+        self.rate_limit = rate_limit
+        # api key -> RateLimiter, None for unauthenticated requests
+        self._limiters = dict()
+        self._limiters_lock = Lock()
+
+        if metrics is True:
+            metrics = RESTMetrics()
+        self.metrics = metrics or None
+
+        retry = Retry(total=retries, connect=retries, read=retries,
+                      status=retries, backoff_factor=backoff_factor,
+                      status_forcelist=self.RETRY_STATUS,
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+
+        adapter = TimedHTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_size,
+                                   max_retries=retry)
+
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def limiter(self, api_key=None):
+        """
+        Get rate limiter of api key, created if not exists.
+        :param api_key:
+        :rtype: RateLimiter
+        """
+        limiter = self._limiters.get(api_key)
+
+        if limiter is None:
+            with self._limiters_lock:
+                limiter = self._limiters.setdefault(api_key, RateLimiter())
+
+        return limiter
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        limiter = None
+
+        if self.rate_limit:
+            limiter = self.limiter(request.headers.get("api-key"))
+            priority = request_priority(request.method, request.path_url)
+
+            if not limiter.acquire(priority, limiter.max_wait(priority)):
+                raise RateLimitExceeded(
+                    "rate limit budget exhausted.", request=request)
+
+        _connect_timing.latency = None
+        start = self.metrics.begin() if self.metrics else None
+        response = None
+
+        try:
+            response = super(PooledSession, self).send(request, **kwargs)
+        except requests.ConnectionError as e:
+            # read timeout is wrapped by retry, raise it as timeout
+            reason = getattr(e.args[0], "reason", None) if e.args else None
+
+            if isinstance(reason, ReadTimeoutError):
+                raise requests.ReadTimeout(e, request=e.request) from e
+
+            raise
+        finally:
+            if start is not None:
+                self._record(request, start, response)
+
+        if limiter:
+            limiter.update(response.status_code, response.headers)
+
+        return response
+
+    def _record(self, request, start, response):
+        status, first_byte = 0, None
+
+        if response is not None:
+            status = response.status_code
+            first_byte = int(response.elapsed.total_seconds() * 1000000000)
+
+        self.metrics.end(operation_name(request.method, request.path_url),
+                         start, status=status, first_byte=first_byte,
+                         connect=_connect_timing.latency)
+
+
+_shared_session = None
+_shared_lock = Lock()
+
+
+def shared_session():
+    """
+    Get process wide PooledSession, connections are reused by swagger
+    client, kline and http_request().
+    :rtype: PooledSession
+    """
+    global _shared_session
+
+    if _shared_session is None:
+        with _shared_lock:
+            if _shared_session is None:
+                _shared_session = PooledSession()
+
+    return _shared_session
@@ -0,0 +1,223 @@
+# coding: utf-8
+import asyncio
+import json
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlencode
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from clients.http_session import PooledSession
+from clients.nge_rest import NGEAPIKeyAuthenticator
+from clients.rate_limit import (RateLimiter, RateLimitExceeded,
+                                request_priority)
+from clients.rest_metrics import RESTMetrics, operation_name
+
+RESTResponse = namedtuple("RESTResponse",
+                          ("status_code", "headers", "text"))
+
+
+class AsyncNGERest(object):
+    """
+    Asyncio REST client for NGE API.
+
+    Any number of requests can be awaited concurrently, requests over
+    max_in_flight limit wait for running ones to finish.
+    Requests are sent by aiohttp if installed, otherwise by a pooled
+    requests session in a thread pool sized by max_in_flight.
+    Requests are signed same as swagger client and never retried,
+    results are returned as (result, RESTResponse).
+    Requests are paced by rate_limiter if specified, e.g. to share
+    budget with swagger client: shared_session().limiter(api_key).
+    """
+
+    BASE_PATH = "/api/v1"
+
+    MAX_IN_FLIGHT = 10
+
+    def __init__(self, host, api_key=None, api_secret=None,
+                 max_in_flight=MAX_IN_FLIGHT, base_path=BASE_PATH,
+                 use_aiohttp=True, rate_limiter=None, metrics=True):
+        """
+        :param host: same as nge_rest.api()
+        :param api_key:
+        :param api_secret:
+        :param max_in_flight: max concurrent requests
+        :param base_path: api base path
+        :param use_aiohttp: use aiohttp if installed
+        :param rate_limiter: RateLimiter, True for a new one
+        :param metrics: RESTMetrics, True for a new one, False to disable
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive.")
+
+        self._prefix = host.rstrip("/")
+        self._base_path = base_path
+
+        self.authenticator = None
+        if api_key and api_secret:
+            self.authenticator = NGEAPIKeyAuthenticator(
+                host=host, api_key=api_key, api_secret=api_secret)
+
+        if rate_limiter is True:
+            rate_limiter = RateLimiter()
+        self.rate_limiter = rate_limiter
+
+        if metrics is True:
+            metrics = RESTMetrics()
+        self.metrics = metrics or None
+
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self.backend = "aiohttp" if use_aiohttp and aiohttp else "requests"
+
+        self._semaphore = None
+        self._session = None
+        self._executor = None
+
+        self._headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+
+    def _open(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        if self.backend == "aiohttp":
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight))
+        else:
+            self._session = PooledSession(pool_size=self.max_in_flight,
+                                          retries=0, rate_limit=False)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_in_flight,
+                thread_name_prefix="async-rest")
+
+    async def close(self):
+        if self._session is None:
+            return
+
+        if self.backend == "aiohttp":
+            await self._session.close()
+        else:
+            self._executor.shutdown(wait=False)
+            self._session.close()
+
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _send(self, method, url, body, headers):
+        """
+        :return: (RESTResponse, first byte latency in nanoseconds)
+        """
+        if self.backend == "aiohttp":
+            start = time.perf_counter_ns()
+
+            async with self._session.request(
+                    method, url, data=body, headers=headers) as rsp:
+                first_byte = time.perf_counter_ns() - start
+
+                return RESTResponse(rsp.status, rsp.headers,
+                                    await rsp.text()), first_byte
+
+        rsp = await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(self._session.request, method, url,
+                                    data=body, headers=headers))
+
+        return (RESTResponse(rsp.status_code, rsp.headers, rsp.text),
+                int(rsp.elapsed.total_seconds() * 1000000000))
+
+    async def request(self, method, endpoint, query=None, data=None):
+        """
+        Send request and wait for result.
+        :param method: http method
+        :param endpoint: api path without base path, e.g. /position
+        :param query: query params dict, dict or list values are
+        encoded in json
+        :param data: body params dict
+        :return: (result, RESTResponse)
+        :raises requests.HTTPError: if response status is not ok
+        :raises RateLimitExceeded: if rate limit budget exhausted
+        """
+        if self._session is None:
+            self._open()
+
+        path = self._base_path + endpoint
+
+        if query:
+            path = "{}?{}".format(path, urlencode({
+                k: json.dumps(v) if isinstance(v, (dict, list)) else v
+                for k, v in query.items() if v is not None}))
+
+        body = ""
+        if data:
+            body = json.dumps(
+                {k: v for k, v in data.items() if v is not None})
+
+        if self.rate_limiter:
+            priority = request_priority(method, path)
+
+            if not await self.rate_limiter.acquire_async(
+                    priority, self.rate_limiter.max_wait(priority)):
+                raise RateLimitExceeded("rate limit budget exhausted.")
+
+        async with self._semaphore:
+            headers = dict(self._headers)
+
+            # signed after acquired, so expires is not consumed by waiting
+            if self.authenticator:
+                headers.update(self.authenticator.sign(method, path, body))
+
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+            start = self.metrics.begin() if self.metrics else None
+            rsp, first_byte = None, None
+
+            try:
+                rsp, first_byte = await self._send(
+                    method, self._prefix + path, body.encode("utf-8"),
+                    headers)
+            finally:
+                self.in_flight -= 1
+
+                if start is not None:
+                    self.metrics.end(
+                        operation_name(method, path), start,
+                        status=rsp.status_code if rsp else 0,
+                        first_byte=first_byte)
+
+        if self.rate_limiter:
+            self.rate_limiter.update(rsp.status_code, rsp.headers)
+
+        if rsp.status_code >= 400:
+            raise requests.HTTPError(rsp.text, response=rsp)
+
+        return json.loads(rsp.text) if rsp.text else None, rsp
+
+    async def get(self, endpoint, **query):
+        return await self.request("GET", endpoint, query=query)
+
+    async def post(self, endpoint, **data):
+        return await self.request("POST", endpoint, data=data)
+
+    async def put(self, endpoint, **data):
+        return await self.request("PUT", endpoint, data=data)
+
+    async def delete(self, endpoint, **data):
+        return await self.request("DELETE", endpoint, data=data)
@@ -0,0 +1,272 @@
+# coding: utf-8
+import asyncio
+import json
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+
+    _HEADER_ARG = "additional_headers"
+except ImportError:
+    # websockets < 14
+    from websockets import connect as ws_connect
+
+    _HEADER_ARG = "extra_headers"
+
+from websockets.exceptions import WebSocketException
+
+from clients.nge_websocket import NGEWebsocket
+from clients.utils import backoff_delay
+
+
+class AsyncNGEWebsocket(NGEWebsocket):
+    """
+    Asyncio version of NGEWebsocket.
+
+    Table semantics and handlers are inherited from NGEWebsocket, so
+    Trader callbacks work the same way. Partials are awaited by events
+    instead of polling, and any number of clients can share one
+    event loop without extra threads.
+    """
+
+    def __init__(self, host, symbol, api_key=None, api_secret=None,
+                 **kwargs):
+        # (symbol, table) -> partial received event,
+        # used in _reset_tables() of super class
+        self._partial_events = dict()
+        # resubscribing tasks / futures, referenced until done
+        self._resubscribing = set()
+
+        super(AsyncNGEWebsocket, self).__init__(
+            host, symbol, api_key=api_key, api_secret=api_secret, **kwargs)
+
+        self.ws = None
+        self._ws_task = None
+        self._loop = None
+
+    @property
+    def running(self):
+        return self._running_flag.is_set()
+
+    @running.setter
+    def running(self, value):
+        # connection is established by start() in event loop
+        if value:
+            self._running_flag.set()
+            return
+
+        self._running_flag.clear()
+
+        if self._ws_task and not self._ws_task.done():
+            self._loop.call_soon_threadsafe(self._ws_task.cancel)
+
+    def _partial_event(self, table_name, symbol):
+        if table_name not in self.SYMBOL_TABLES:
+            symbol = None
+
+        try:
+            return self._partial_events[(symbol, table_name)]
+        except KeyError:
+            event = self._partial_events[(symbol, table_name)] = \
+                asyncio.Event()
+
+            return event
+
+    def _on_partial(self, table_name, symbol):
+        self._partial_event(table_name, symbol).set()
+
+    def _reset_tables(self):
+        super(AsyncNGEWebsocket, self)._reset_tables()
+
+        for event in self._partial_events.values():
+            event.clear()
+
+    async def start(self):
+        """
+        Connect to websocket and wait for all partials.
+        :return:
+        :raise: WebSocketException, OSError, asyncio.TimeoutError
+        """
+        self._loop = asyncio.get_event_loop()
+
+        self.running = True
+
+        connected = self._loop.create_future()
+        self._ws_task = self._loop.create_task(self.__run(connected))
+
+        await connected
+
+        await self.wait_for_partials()
+
+        self.logger.info('Got all market data. Starting.')
+
+    async def stop(self):
+        self._running_flag.clear()
+
+        if self.ws:
+            await self.ws.close()
+
+        if self._ws_task:
+            await asyncio.gather(self._ws_task, return_exceptions=True)
+
+    async def join(self, timeout=None):
+        if self._ws_task:
+            await asyncio.wait({self._ws_task}, timeout=timeout)
+
+    async def wait_for_partials(self, symbols=None, timeout=None):
+        """
+        On subscribe, this data will come down. Wait for it.
+        :param symbols: all subscribed symbols if not specified
+        :param timeout: default PARTIAL_TIMEOUT
+        :return:
+        """
+        wait_tables = self._symbol_tables()
+        if self._api_key:
+            wait_tables |= self._account_tables()
+
+        await asyncio.wait_for(
+            asyncio.gather(*[self._partial_event(table, symbol).wait()
+                             for table in wait_tables
+                             for symbol in (symbols or self.symbols)]),
+            timeout or self.PARTIAL_TIMEOUT)
+
+    async def subscribe(self, symbol, wait=True):
+        """
+        Subscribe symbol's tables in current connection.
+        :param symbol:
+        :param wait: wait for symbol's partials
+        :return:
+        """
+        if symbol in self._partitions:
+            return
+
+        self._add_partition(symbol)
+
+        await self.send_command("subscribe",
+                                self._symbol_subscriptions(symbol))
+
+        if wait:
+            await self.wait_for_partials(symbols=[symbol])
+
+    async def unsubscribe(self, symbol):
+        """
+        Unsubscribe symbol's tables and drop its partition.
+        :param symbol:
+        :return:
+        :raise: ValueError if unsubscribe primary symbol
+        """
+        if symbol == self.symbol:
+            raise ValueError(
+                "primary symbol[{}] can not be unsubscribed.".format(symbol))
+
+        if symbol not in self._partitions:
+            return
+
+        await self.send_command("unsubscribe",
+                                self._symbol_subscriptions(symbol))
+
+        self._drop_partition(symbol)
+
+        for table_name in self._symbol_subs():
+            self._partial_events.pop((symbol, table_name), None)
+
+    def _resubscribe(self, subscriptions):
+        # called by handlers in event loop, or by integrity checker thread
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+
+        if in_loop:
+            future = self._loop.create_task(
+                self.__resubscribe(subscriptions))
+        else:
+            future = asyncio.run_coroutine_threadsafe(
+                self.__resubscribe(subscriptions), self._loop)
+
+        # keep reference until done, or task may be garbage collected
+        self._resubscribing.add(future)
+        future.add_done_callback(self._resubscribing.discard)
+
+    async def __resubscribe(self, subscriptions):
+        await self.send_command("unsubscribe", subscriptions)
+        await self.send_command("subscribe", subscriptions)
+
+    async def send_command(self, command, args=None):
+        """
+        Send a raw command.
+        :param command:
+        :param args:
+        :return:
+        """
+        if args is None:
+            args = []
+        await self.ws.send(json.dumps({"op": command, "args": args}))
+
+    async def __run(self, connected: asyncio.Future):
+        ws_url = self._get_url()
+
+        attempt = 0
+
+        while self.running:
+            # auth nonce will be expired, regenerate on every connect
+            headers = [tuple(header.split(": ", 1))
+                       for header in self._get_auth()]
+
+            self.logger.info("Connecting to %s" % ws_url)
+
+            established = False
+
+            try:
+                async with ws_connect(ws_url,
+                                      **{_HEADER_ARG: headers}) as ws:
+                    self.ws = ws
+                    established = True
+                    attempt = 0
+
+                    if not connected.done():
+                        connected.set_result(True)
+                        self.logger.info('Connected to WS.')
+                    else:
+                        self._record_reconnected()
+
+                    async for frame in ws:
+                        self._on_frame(frame)
+            except (WebSocketException, OSError) as e:
+                if not connected.done():
+                    self.logger.error("Couldn't connect to WS! Exiting.")
+                    self._running_flag.clear()
+                    connected.set_exception(e)
+                    return
+
+                self.logger.warning("Websocket error: {}".format(e))
+            finally:
+                self.ws = None
+
+            if not self.running:
+                break
+
+            if established:
+                self.logger.info('Websocket Closed')
+
+                # keep old tables readable as stale until resynced
+                self._record_disconnected()
+            else:
+                self.reconnect_metrics["connect_failed"] += 1
+
+            delay = backoff_delay(attempt, self.RECONNECT_DELAY_BASE,
+                                  self.RECONNECT_DELAY_MAX)
+            attempt += 1
+
+            self.logger.info(
+                "Delay {:.3f}s to connect, attempt[{}].".format(
+                    delay, attempt))
+            await asyncio.sleep(delay)
+
+
+async def start_all(*clients: AsyncNGEWebsocket):
+    """
+    Start many clients concurrently in current event loop.
+    :param clients:
+    :return:
+    """
+    await asyncio.gather(*[c.start() for c in clients])
@@ -1,6 +1,10 @@
 # coding: utf-8
 
+import glob
+import hashlib
 import json
+import logging
+import pickle
 import time
 import uuid
 import re
@@ -10,14 +14,43 @@ import os
 from collections import OrderedDict
 from itertools import product
 from datetime import datetime
+from threading import Lock
+from urllib.parse import urlsplit, urlunsplit
 
 from bravado.client import SwaggerClient
 from bravado.requests_client import RequestsClient, Authenticator
 from bravado_core.formatter import SwaggerFormat, NO_OP
 from bravado_core.exception import SwaggerValidationError
+from requests.models import RequestEncodingMixin
+from requests.utils import requote_uri
 
-from clients.utils import generate_nonce, generate_signature
-from common.utils import path, pushd
+from clients.http_session import shared_session
+from clients.utils import generate_nonce, Signer
+from common.utils import path
+
+
+logger = logging.getLogger(__name__)
+
+SPEC_DIR = path("@/swagger")
+SPEC_NAMES = ("nge", "bitmex")
+SPEC_EXTENSIONS = ("yaml", "yml", "json")
+SPEC_CACHE_DIR = os.path.join(SPEC_DIR, ".cache")
+
+# libyaml loader is much faster if available
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+SPEC_LOADERS = {
+    "yaml": lambda content: yaml.load(content, Loader=_YAML_LOADER),
+    "yml": lambda content: yaml.load(content, Loader=_YAML_LOADER),
+    "json": json.loads
+}
+
+# (spec path, mtime, size) -> (digest, validated, pickled spec)
+_spec_cache = dict()
+
+# (host, api_key, api_secret, spec mtime, spec size) -> SwaggerClient
+_client_cache = dict()
+_client_lock = Lock()
 
 
 class NGEAPIKeyAuthenticator(Authenticator):
@@ -25,6 +58,7 @@ class NGEAPIKeyAuthenticator(Authenticator):
         super(NGEAPIKeyAuthenticator, self).__init__(host)
         self.api_key = api_key
         self.api_secret = api_secret
+        self._signer = Signer(api_secret)
 
     # Forces this to apply to all requests.
     def matches(self, url):
@@ -32,18 +66,48 @@ class NGEAPIKeyAuthenticator(Authenticator):
             return False
         return True
 
-    def apply(self, req):
+    def sign(self, verb, path, body):
+        """
+        Generate auth headers for request.
+        :param verb: http method
+        :param path: request path with query string
+        :param body: request body in bytes or str
+        :return: auth headers dict
+        """
         # 5s grace period in case of clock skew
         expires = generate_nonce()
-        req.headers['api-expires'] = str(expires)
-        req.headers['api-key'] = self.api_key
-        req.json = OrderedDict(req.data)
-        req.data = None
-        prepared = req.prepare()
-        body = json.dumps(req.json)
-        url = prepared.path_url
-        req.headers['api-signature'] = generate_signature(
-            self.api_secret, req.method, url, expires, body)
+
+        return {
+            'api-expires': str(expires),
+            'api-key': self.api_key,
+            'api-signature': self._signer.sign(verb, path, expires, body)
+        }
+
+    @staticmethod
+    def path_url(req):
+        """
+        Path with query string of requests.Request same as
+        PreparedRequest.path_url, without preparing whole request.
+        """
+        parsed = urlsplit(req.url)
+
+        query = parsed.query
+        params = RequestEncodingMixin._encode_params(req.params)
+
+        if params:
+            query = "{}&{}".format(query, params) if query else params
+
+        return requote_uri(urlunsplit(
+            ("", "", parsed.path or "/", query, "")))
+
+    def apply(self, req):
+        # body serialized once, sent as is
+        body = json.dumps(OrderedDict(req.data)).encode("utf-8")
+
+        req.data = body
+        req.json = None
+        req.headers['Content-Type'] = 'application/json'
+        req.headers.update(self.sign(req.method, self.path_url(req), body))
         return req
 
 
@@ -84,12 +148,134 @@ def guid_deserializer(guid_string):
         return guid_string
 
 
+def find_spec_file(spec_dir=SPEC_DIR):
+    """
+    Find swagger spec file in spec dir.
+    :param spec_dir:
+    :return: spec file path
+    :raise: RuntimeError if not found
+    """
+    for name, ext in product(SPEC_NAMES, SPEC_EXTENSIONS):
+        spec_file = os.path.join(spec_dir, ".".join([name, ext]))
+
+        if os.path.isfile(spec_file):
+            return spec_file
+
+    raise RuntimeError("no valid swagger api define file found.")
+
+
+def _spec_cache_file(digest):
+    return os.path.join(SPEC_CACHE_DIR, "spec-{}.pickle".format(digest))
+
+
+def load_spec(spec_file=None):
+    """
+    Load swagger spec, parsed spec is cached in memory and pickled
+    in SPEC_CACHE_DIR keyed by spec content digest.
+    :param spec_file: found in SPEC_DIR if not specified
+    :return: (spec dict, digest, whether spec is validated before)
+    """
+    spec_file = spec_file or find_spec_file()
+
+    stat = os.stat(spec_file)
+    memory_key = (os.path.abspath(spec_file), stat.st_mtime_ns, stat.st_size)
+
+    try:
+        digest, validated, content = _spec_cache[memory_key]
+    except KeyError:
+        pass
+    else:
+        # spec dict may be modified by client, always get a new one
+        return pickle.loads(content), digest, validated
+
+    with open(spec_file, "rb") as f:
+        raw = f.read()
+
+    digest = hashlib.sha1(raw).hexdigest()
+
+    try:
+        with open(_spec_cache_file(digest), "rb") as f:
+            content = f.read()
+    except OSError:
+        ext = os.path.splitext(spec_file)[1].lstrip(".")
+        spec_dict = SPEC_LOADERS[ext](raw.decode("utf-8"))
+        content = pickle.dumps(spec_dict, pickle.HIGHEST_PROTOCOL)
+        validated = False
+    else:
+        spec_dict = pickle.loads(content)
+        validated = True
+
+    _spec_cache[memory_key] = (digest, validated, content)
+
+    return spec_dict, digest, validated
+
+
+def save_spec_cache(digest):
+    """
+    Save spec loaded by load_spec() to cache after validated,
+    stale caches are removed.
+
+    Spec dict is annotated with resolution scope of origin url while
+    validating, so spec parsed before validation is saved.
+    :param digest:
+    :return:
+    """
+    cache_file = _spec_cache_file(digest)
+
+    contents = [content for cached_digest, _, content in _spec_cache.values()
+                if cached_digest == digest]
+
+    if not contents:
+        raise ValueError("spec {} not loaded.".format(digest))
+
+    try:
+        os.makedirs(SPEC_CACHE_DIR, exist_ok=True)
+
+        temp_file = "{}.{}".format(cache_file, os.getpid())
+        with open(temp_file, "wb") as f:
+            f.write(contents[0])
+        os.replace(temp_file, cache_file)
+
+        for stale in glob.glob(os.path.join(SPEC_CACHE_DIR, "spec-*.pickle")):
+            if stale != cache_file:
+                os.remove(stale)
+    except OSError as e:
+        logger.warning("fail to save swagger spec cache: {}".format(e))
+        return
+
+    for key, (cached_digest, _, content) in list(_spec_cache.items()):
+        if cached_digest == digest:
+            _spec_cache[key] = (digest, True, content)
+
+
 def api(host="https://www.btcmex.com", config=None, api_key=None,
-        api_secret=None):
+        api_secret=None, session=None, shared=True):
     """
     Factory method to get NGE swagger client.
+    :param host:
+    :param config: bravado config
+    :param api_key:
+    :param api_secret:
+    :param session: requests session, shared PooledSession by default
+    :param shared: share one client for same host & keys if config and
+    session are default
     :rtype: SwaggerClient
     """
+    if shared and not config and not session:
+        stat = os.stat(find_spec_file())
+        client_key = (host, api_key, api_secret,
+                      stat.st_mtime_ns, stat.st_size)
+
+        with _client_lock:
+            client = _client_cache.get(client_key)
+
+            if not client:
+                client = _client_cache[client_key] = api(
+                    host=host, api_key=api_key, api_secret=api_secret,
+                    shared=False)
+
+        return client
+
     if not config:
         # See full config options at
         # http://bravado.readthedocs.io/en/latest/configuration.html
@@ -128,44 +314,27 @@ def api(host="https://www.btcmex.com", config=None, api_key=None,
                         )]
         }
 
-    spec_dir = path("@/swagger")
-    spec_name = ("nge", "bitmex")
-    spec_extension = ("yaml", "yml", "json")
+    spec_dict, digest, validated = load_spec()
 
-    load_method = {
-        "yaml": yaml.safe_load,
-        "yml": yaml.safe_load,
-        "json": json.dumps
-    }
+    if validated:
+        config = dict(config, validate_swagger_spec=False)
 
-    with pushd(spec_dir):
-        spec_file = ""
-
-        for name, ext in product(spec_name, spec_extension):
-            spec_file = ".".join([name, ext])
-
-            if os.path.isfile(spec_file):
-                break
-
-        if not spec_file:
-            raise RuntimeError("no valid swagger api define file found.")
-
-        with open(spec_file, encoding="utf-8") as f:
-            spec_dict = load_method[ext](f.read())
+    request_client = RequestsClient()
+    # reuse kept-alive connections instead of bravado's own session
+    request_client.session = session or shared_session()
 
     if api_key and api_secret:
-        request_client = RequestsClient()
-
         request_client.authenticator = NGEAPIKeyAuthenticator(
             host=host, api_key=api_key, api_secret=api_secret)
 
-        return SwaggerClient.from_spec(
-            spec_dict, origin_url=host, config=config,
-            http_client=request_client)
+    client = SwaggerClient.from_spec(
+        spec_dict, origin_url=host, config=config,
+        http_client=request_client)
 
-    else:
-        return SwaggerClient.from_spec(
-            spec_dict, origin_url=host, config=config)
+    if not validated:
+        save_spec_cache(digest)
+
+    return client
 
 
 if __name__ == "__main__":
@@ -5,12 +5,22 @@ import websocket
 import threading
 import json
 
-from time import sleep, time
+from collections import deque, OrderedDict, ChainMap, Counter, namedtuple
+from contextlib import nullcontext
+from itertools import islice
+from types import MappingProxyType
+from time import sleep, time, time_ns, monotonic, perf_counter_ns
 from threading import Event
 from urllib.parse import urlparse, urlunparse
 
-from clients.utils import generate_nonce, generate_signature
-from common.utils import time_ms
+from clients.decoder import MessageDecoder
+from clients.trade_tape import TradeTape, timestamp_ns
+from clients.utils import generate_nonce, generate_signature, backoff_delay
+from common.metrics import LatencyRecorder
+from common.clock import WALL_CLOCK
+
+
+TableSnapshot = namedtuple("TableSnapshot", ("version", "tables"))
 
 
 # noinspection PyUnusedLocal
@@ -18,22 +28,83 @@ class NGEWebsocket(object):
     # Don't grow a table larger than this amount. Helps cap memory usage.
     MAX_TABLE_LEN = 200
 
+    # Append only tables are kept in fixed capacity ring buffers,
+    # capacity for table not listed here is MAX_TABLE_LEN.
+    TABLE_CAPACITY = {
+        "trade": 2000
+    }
+
+    # Don't trim these tables because we'll lose valuable state if we do.
+    UNBOUNDED_TABLES = ("order", "orderBookL2")
+
+    # Capacity of columnar trade tape, 0 means disabled.
+    TRADE_TAPE_CAPACITY = 0
+
+    # Rows in these tables are scoped by symbol,
+    # they're partitioned per subscribed symbol.
+    SYMBOL_TABLES = ("instrument", "orderBookL2", "orderBook10", "trade",
+                     "quote", "order", "execution", "position")
+
+    # Never mutate tables & rows exposed by snapshot() in place, so
+    # readers in other threads get consistent views without locking.
+    # Tables are copied only on first write after exposed.
+    COPY_ON_WRITE = False
+
+    # Resync table by resubscribing when rows are inconsistent.
+    INTEGRITY_TABLES = ("orderBookL2", )
+    # Seconds waiting for partial of resynced or subscribed table.
+    PARTIAL_TIMEOUT = 30
+
+    # Record per message latency histograms in nanoseconds, recording
+    # costs about as much as applying a small message, so it's opt-in
+    # and can be sampled every LATENCY_SAMPLE messages.
+    LATENCY_METRICS = False
+    LATENCY_SAMPLE = 1
+
+    CONNECT_TIMEOUT = 5
+
+    # Jittered exponential backoff for reconnecting.
+    RECONNECT_DELAY_BASE = 0.5
+    RECONNECT_DELAY_MAX = 30
+
     BITMEX_COMPATIABLE = False
 
-    def __init__(self, host, symbol, api_key=None, api_secret=None):
+    def __init__(self, host, symbol, api_key=None, api_secret=None,
+                 table_capacity=None, trade_tape_capacity=None,
+                 json_backend=None, ignore_tables=None, copy_on_write=None,
+                 latency_metrics=None, latency_sample=None, capture=None):
         """
         Connect to the websocket and initialize data stores.
         :param host:
-        :param symbol:
+        :param symbol: symbol or symbol list subscribed in one connection,
+        the first one is primary symbol
         :param api_key:
         :param api_secret:
+        :param table_capacity: per table ring buffer capacity,
+        override TABLE_CAPACITY
+        :param trade_tape_capacity: enable columnar trade tape with
+        capacity, override TRADE_TAPE_CAPACITY
+        :param json_backend: json decoder backend name,
+        the fastest installed if not specified
+        :param ignore_tables: tables to skip decoding
+        :param copy_on_write: override COPY_ON_WRITE
+        :param latency_metrics: override LATENCY_METRICS
+        :param latency_sample: override LATENCY_SAMPLE
+        :param capture: FrameCapture to record raw frames,
+        it's not closed by websocket
         """
         self.logger = logging.getLogger(__name__)
 
         self.logger.debug("Initializing WebSocket.")
 
         self.endpoint = host
-        self.symbol = symbol
+
+        if isinstance(symbol, str):
+            symbol = [symbol]
+        self.symbols = list(symbol)
+        # self.data and helpers without symbol argument are scoped to
+        # primary symbol
+        self.symbol = self.symbols[0]
         self.subscribed = list()
 
         if api_key is not None and api_secret is None:
@@ -44,9 +115,84 @@ class NGEWebsocket(object):
         self._api_key = api_key
         self._api_secret = api_secret
 
-        self.data = dict()
+        self._table_capacity = self.TABLE_CAPACITY.copy()
+        if table_capacity:
+            self._table_capacity.update(table_capacity)
+
+        if trade_tape_capacity is None:
+            trade_tape_capacity = self.TRADE_TAPE_CAPACITY
+        self._trade_tape_capacity = trade_tape_capacity
+        self._trade_tapes = dict()
+
+        self._decoder = MessageDecoder(backend=json_backend,
+                                       ignore_tables=ignore_tables)
+
+        # There are four possible actions from the WS:
+        # 'partial' - full table image
+        # 'insert'  - new row
+        # 'update'  - update row
+        # 'delete'  - delete row
+        self._action_switch = {
+            "partial": self._partial_handler,
+            "insert": self._insert_handler,
+            "update": self._update_handler,
+            "delete": self._delete_handler
+        }
+
+        self._copy_on_write = (self.COPY_ON_WRITE if copy_on_write is None
+                               else copy_on_write)
+        if (self.LATENCY_METRICS if latency_metrics is None
+                else latency_metrics):
+            self.latency = LatencyRecorder()
+        else:
+            self.latency = None
+        self._latency_sample = max(
+            self.LATENCY_SAMPLE if latency_sample is None
+            else latency_sample, 1)
+        self._latency_countdown = 1
+        self.capture = capture
+        # time source of message timestamps
+        self.clock = WALL_CLOCK
+
+        # perf counter when base handler finished applying message
+        self._applied_ns = None
+        # receipt timestamp of frame being applied
+        self._received_ns = None
+        # whole rows applied by last update message
+        self._updated_rows = list()
+
+        # (version, {symbol: partition tables}, generic tables)
+        self._published = (0, dict(), MappingProxyType(dict()))
+        # ids of tables exposed by snapshot(), copied before next write
+        self._shared = set()
+        # guards exposing tables against writing them
+        self._snapshot_lock = threading.RLock()
+
+        self._partitions = OrderedDict()
+        self._generic = dict()
+        self.data = None
         self.keys = dict()
+        self._reset_tables()
+
+        # (partitions, generic) filled by partials after reconnect,
+        # swapped with live tables when all partials received
+        self._staging = None
+        self._disconnected_ts = 0
+
+        # reconnect, connect_failed, downtime & recovery(in seconds)
+        self.reconnect_metrics = Counter()
+
+        # anomaly & table resync counters
+        self.integrity_metrics = Counter()
+        # (table, symbol) -> monotonic seconds resubscribed, waiting for
+        # partial, changed by feed and integrity checker threads
+        self._resyncing = dict()
+        self._resync_lock = threading.Lock()
+
         self._running_flag = Event()
+        self._connected = Event()
+        self._connecting = Event()
+        self._reconnect_lock = threading.Lock()
 
     @property
     def has_authorization(self):
@@ -59,17 +205,32 @@ class NGEWebsocket(object):
     def running(self):
         return self._running_flag.is_set()
 
+    @property
+    def is_stale(self):
+        """
+        Whether tables are stale snapshot before reconnecting,
+        they will be refreshed when all partials received.
+        :return:
+        """
+        return self._staging is not None
+
     @running.setter
     def running(self, value):
         if value:
             self._running_flag.set()
-            ws_url = self.__get_url()
+            ws_url = self._get_url()
             self.logger.info("Connecting to %s" % ws_url)
-            self.__connect(ws_url)
+            try:
+                self.__connect(ws_url)
+            except websocket.WebSocketException:
+                self.logger.error("Couldn't connect to WS! Exiting.")
+                self.running = False
+                raise
             self.logger.info('Connected to WS.')
 
             # Connected. Wait for partials
-            self.__wait_for_symbol(self.symbol)
+            for symbol in self.symbols:
+                self.__wait_for_symbol(symbol)
             if self._api_key:
                 self.__wait_for_account()
 
@@ -89,13 +250,66 @@ class NGEWebsocket(object):
     def join(self, timeout=None):
         self.wst.join(timeout)
 
-    def get_instrument(self):
+    def tables(self, symbol=None):
+        """
+        Get tables scoped to symbol, generic tables(margin, etc.)
+        are shared by all symbols.
+        :param symbol: primary symbol if not specified
+        :return:
+        :raise: KeyError if symbol is not subscribed
+        """
+        return ChainMap(self._partitions[symbol or self.symbol],
+                        self._generic)
+
+    def snapshot(self, symbol=None):
+        """
+        Get consistent read-only view of tables without locking.
+
+        Tables in snapshot are never modified by feed thread
+        if copy on write enabled, callers must not modify them either.
+        If copy on write disabled, version is None and tables are live.
+        :param symbol: primary symbol if not specified
+        :rtype: TableSnapshot
+        :raise: KeyError if symbol is not subscribed
+        """
+        if not self._copy_on_write:
+            return TableSnapshot(None, self.tables(symbol))
+
+        with self._snapshot_lock:
+            version, partitions, generic = self._published
+            partition = partitions[symbol or self.symbol]
+
+            self._shared.update(id(table) for table in partition.values())
+            self._shared.update(id(table) for table in generic.values())
+
+        return TableSnapshot(version, MappingProxyType(
+            ChainMap(partition, generic)))
+
+    def latency_summary(self, reset=False):
+        """
+        Get feed latency histograms' summaries in nanoseconds:
+            decode: frame received -> decoded
+            apply: decoded -> tables applied
+            dispatch: tables applied -> handlers(callbacks) returned
+            total: frame received -> handlers returned
+            lag.<table>: exchange timestamp of last row -> frame received,
+            affected by clock offset to exchange
+        :param reset: reset histograms after summarized
+        :return: dict of name -> summary, empty if disabled
+        """
+        if not self.latency:
+            return dict()
+
+        return self.latency.summary(reset=reset)
+
+    def get_instrument(self, symbol=None):
         """
         Get the raw instrument data for this symbol.
+        :param symbol: primary symbol if not specified
         :return:
         """
         # Turn the 'tickSize' into 'tickLog' for use in rounding
-        instrument = self.data['instrument'][0]
+        instrument = self.tables(symbol)['instrument'][0]
         instrument['tickLog'] = int(
             math.fabs(math.log10(instrument['tickSize'])))
         return instrument
@@ -128,92 +342,635 @@ class NGEWebsocket(object):
         """
         return self.data['margin'][0]
 
-    def market_depth(self):
+    def market_depth(self, symbol=None):
         """
         Get market depth (orderbook). Returns all levels.
+        :param symbol: primary symbol if not specified
         :return:
         """
-        return self.data['orderBookL2']
+        return self.tables(symbol)['orderBookL2']
 
-    def open_orders(self, clr_id_prefix):
+    def open_orders(self, clr_id_prefix, symbol=None):
         """
         Get all your open orders.
         :param clr_id_prefix:
+        :param symbol: primary symbol if not specified
         :return:
         """
-        orders = self.data['order']
+        orders = self.tables(symbol)['order']
         # Filter to only open orders (leavesQty > 0) and those that we
         # actually placed
         return [o for o in orders if
                 str(o['clOrdID']).startswith(clr_id_prefix) and o[
                     'leavesQty'] > 0]
 
-    def recent_trades(self):
+    def recent_trades(self, count=0, symbol=None):
         """
         Get recent trades.
+        :param count: only return latest count trades if specified
+        :param symbol: primary symbol if not specified
+        :return:
+        """
+        trades = self.tables(symbol)['trade']
+
+        if not count or count >= len(trades):
+            return trades
+
+        # walk from the newest end, cost is O(count) not O(len)
+        latest = list(islice(reversed(trades), count))
+        latest.reverse()
+
+        return latest
+
+    @property
+    def trade_tape(self):
+        """
+        Columnar trade store of primary symbol, None if not enabled.
+        :rtype: TradeTape
+        """
+        return self.get_trade_tape(self.symbol)
+
+    def get_trade_tape(self, symbol):
+        """
+        Columnar trade store of symbol, None if not enabled.
+        :param symbol:
+        :rtype: TradeTape
+        """
+        if not self._trade_tape_capacity:
+            return None
+
+        try:
+            return self._trade_tapes[symbol]
+        except KeyError:
+            tape = self._trade_tapes[symbol] = TradeTape(
+                capacity=self._trade_tape_capacity)
+
+            return tape
+
+    def subscribe(self, symbol, wait=True):
+        """
+        Subscribe symbol's tables in current connection.
+        :param symbol:
+        :param wait: wait for symbol's partials
+        :return:
+        """
+        if symbol in self._partitions:
+            return
+
+        self._add_partition(symbol)
+
+        self.__send_command("subscribe", self._symbol_subscriptions(symbol))
+
+        if wait:
+            self.__wait_for_symbol(symbol)
+
+    def unsubscribe(self, symbol):
+        """
+        Unsubscribe symbol's tables and drop its partition.
+        :param symbol:
+        :return:
+        :raise: ValueError if unsubscribe primary symbol
+        """
+        if symbol == self.symbol:
+            raise ValueError(
+                "primary symbol[{}] can not be unsubscribed.".format(symbol))
+
+        if symbol not in self._partitions:
+            return
+
+        self.__send_command("unsubscribe",
+                            self._symbol_subscriptions(symbol))
+
+        self._drop_partition(symbol)
+
+    def _add_partition(self, symbol):
+        """
+        Add symbol's partition, called by caller's thread.
+
+        Symbols & partitions are replaced instead of modified in place,
+        so feed thread iterating them is not affected.
+        :param symbol:
+        :return:
+        """
+        with self._snapshot_lock:
+            self.symbols = self.symbols + [symbol]
+
+            partitions = self._partitions.copy()
+            partitions[symbol] = dict()
+            self._partitions = partitions
+
+            if self._staging is not None:
+                staging = self._staging[0].copy()
+                staging[symbol] = dict()
+                self._staging = (staging, self._staging[1])
+
+            self._publish_all()
+
+    def _drop_partition(self, symbol):
+        """
+        Drop symbol's partition, called by caller's thread.
+        :param symbol:
+        :return:
+        """
+        with self._snapshot_lock:
+            self.symbols = [s for s in self.symbols if s != symbol]
+
+            partitions = self._partitions.copy()
+            partitions.pop(symbol, None)
+            self._partitions = partitions
+
+            if self._staging is not None:
+                staging = self._staging[0].copy()
+                staging.pop(symbol, None)
+                self._staging = (staging, self._staging[1])
+
+            self._trade_tapes.pop(symbol, None)
+            self._publish_all()
+
+    def resync_table(self, table_name, symbol=None):
+        """
+        Resync one table by resubscribing it in current connection,
+        stale table is kept readable until new partial received.
+        Table can be resynced again if partial not received in
+        PARTIAL_TIMEOUT seconds. It may be called from any thread.
+        :param table_name:
+        :param symbol: primary symbol if not specified
+        :return: False if table is already resyncing
+        """
+        if table_name not in self.SYMBOL_TABLES:
+            symbol, subscription = None, table_name
+        else:
+            symbol = symbol or self.symbol
+            subscription = "{}:{}".format(table_name, symbol)
+
+        # connection resync will refresh all tables
+        if self._staging is not None:
+            return False
+
+        now = monotonic()
+
+        with self._resync_lock:
+            started = self._resyncing.get((table_name, symbol))
+
+            if started is not None:
+                if now - started < self.PARTIAL_TIMEOUT:
+                    return False
+
+                # resubscribing lost or partial never came, try again
+                self.integrity_metrics["resync_timeout"] += 1
+
+            self._resyncing[(table_name, symbol)] = now
+            self.integrity_metrics["resync"] += 1
+
+        self.logger.warning("Resyncing table[{}].".format(subscription))
+
+        self._resubscribe([subscription])
+
+        return True
+
+    def _resubscribe(self, subscriptions):
+        self.__send_command("unsubscribe", subscriptions)
+        self.__send_command("subscribe", subscriptions)
+
+    def _on_unknown_row(self, table_name, symbol, row):
+        """
+        Update or delete for unknown row, frames may be lost.
+        :param table_name:
+        :param symbol:
+        :param row:
+        :return:
+        """
+        self.integrity_metrics["unknown." + table_name] += 1
+
+        self.logger.debug("{}: unknown row {}".format(table_name, row))
+
+        if table_name in self.INTEGRITY_TABLES:
+            self.resync_table(table_name, symbol)
+
+    def is_crossed(self, symbol=None):
+        """
+        Whether best bid is not lower than best ask in orderBookL2.
+        :param symbol: primary symbol if not specified
+        :return:
+        """
+        bid, ask = None, None
+
+        for level in self.snapshot(symbol).tables.get("orderBookL2", ()):
+            if level["side"] == "Buy":
+                if bid is None or level["price"] > bid:
+                    bid = level["price"]
+            elif ask is None or level["price"] < ask:
+                ask = level["price"]
+
+        return bid is not None and ask is not None and bid >= ask
+
+    def table_capacity(self, table_name):
+        """
+        Get ring buffer capacity of table.
+        :param table_name:
+        :return: None if table is unbounded
+        """
+        if table_name in self.UNBOUNDED_TABLES:
+            return None
+
+        return self._table_capacity.get(table_name, self.MAX_TABLE_LEN)
+
+    def _new_table(self, table_name, data):
+        capacity = self.table_capacity(table_name)
+
+        if capacity is None:
+            return list(data)
+
+        return deque(data, maxlen=capacity)
+
+    def _reset_tables(self):
+        self._partitions = OrderedDict(
+            (symbol, dict()) for symbol in self.symbols)
+        self._generic = dict()
+        self.data = self.tables()
+        self.keys = dict()
+
+        self._publish_all()
+
+    def _publish_all(self):
+        self._published = (
+            self._published[0] + 1,
+            {symbol: MappingProxyType(dict(partition))
+             for symbol, partition in self._partitions.items()},
+            MappingProxyType(dict(self._generic)))
+
+    def _publish(self, table_name, symbols):
+        """
+        Publish new tables version after message applied.
+        :param table_name:
+        :param symbols: changed partitions
+        :return:
+        """
+        if not self._copy_on_write or self._staging is not None:
+            return
+
+        version, partitions, generic = self._published
+
+        if table_name in self.SYMBOL_TABLES:
+            partitions = partitions.copy()
+
+            for symbol in symbols:
+                partition = self._partitions.get(symbol)
+
+                # dropped by unsubscribe
+                if partition is None:
+                    partitions.pop(symbol, None)
+                    continue
+
+                partitions[symbol] = MappingProxyType(dict(partition))
+        else:
+            generic = MappingProxyType(dict(self._generic))
+
+        # readers get (version, partitions, generic) in one reference
+        self._published = (version + 1, partitions, generic)
+
+    def _writable_table(self, table_name, partition):
+        """
+        Get table for modifying, it's a copy if copy on write enabled
+        and table is exposed by snapshot(), called with _writing().
+        :param table_name:
+        :param partition:
+        :return:
+        :raise: KeyError if table partial not received
+        """
+        table = partition[table_name]
+
+        if not self._copy_on_write or id(table) not in self._shared:
+            return table
+
+        self._shared.discard(id(table))
+
+        if isinstance(table, deque):
+            table = deque(table, maxlen=table.maxlen)
+        else:
+            table = list(table)
+
+        partition[table_name] = table
+
+        return table
+
+    def _writing(self):
+        """
+        Guard of applying message to tables if copy on write enabled.
+        :return: context manager
+        """
+        if self._copy_on_write:
+            return self._snapshot_lock
+
+        return nullcontext()
+
+    def _write_stores(self):
+        """
+        Tables which messages applied to, staging tables while resyncing.
+        :return: (partitions, generic)
+        """
+        if self._staging is not None:
+            return self._staging
+
+        return self._partitions, self._generic
+
+    def _begin_resync(self):
+        with self._snapshot_lock:
+            self._staging = (OrderedDict((symbol, dict())
+                                         for symbol in self.symbols),
+                             dict())
+
+    def _record_disconnected(self):
+        """
+        Start resyncing, keep old tables readable as stale until
+        new partials received.
+        :return:
+        """
+        if self._staging is not None:
+            # disconnected again before resync finished
+            self._begin_resync()
+            return
+
+        self._disconnected_ts = time()
+        self.reconnect_metrics["reconnect"] += 1
+
+        self._begin_resync()
+
+    def _record_reconnected(self):
+        downtime = time() - self._disconnected_ts
+        self.reconnect_metrics["downtime"] += downtime
+        self.reconnect_metrics["last_downtime"] = downtime
+
+        # partials are waited by message handlers
+        self.logger.info(
+            'ReConnected to WS in {:.3f}s, resyncing tables.'.format(
+                downtime))
+
+    def __finish_resync(self):
+        with self._snapshot_lock:
+            partitions, generic = self._staging
+
+            # readers switch to new tables in one reference swap
+            self._partitions, self._generic = partitions, generic
+            self.data = self.tables()
+            self._staging = None
+            self._publish_all()
+
+        recovery = time() - self._disconnected_ts
+        self.reconnect_metrics["recovery"] += recovery
+        self.reconnect_metrics["last_recovery"] = recovery
+
+        self.logger.info(
+            "Tables resynced in {:.3f}s after disconnected.".format(
+                recovery))
+
+        try:
+            self.on_resync()
+        except Exception as e:
+            self.logger.exception(e)
+
+    def __check_resync(self):
+        wait_tables = self._symbol_tables()
+        if self._api_key:
+            wait_tables |= self._account_tables()
+
+        for table_name in wait_tables:
+            for symbol in self.symbols:
+                if not self._is_received(table_name, symbol):
+                    return
+
+        self.__finish_resync()
+
+    def on_resync(self):
+        """
+        Called when tables are resynced after reconnected.
+        :return:
+        """
+        pass
+
+    def _partition_rows(self, table_name, message, partial=False):
+        """
+        Split message rows by table partitions.
+        :param table_name:
+        :param message:
+        :param partial: whether message is a partial, partitions of its
+        filter symbol, or all partitions if the table is subscribed
+        without symbol or the partial has neither filter nor rows, will
+        be included even without any row
+        :return: list of (symbol, partition, rows),
+        symbol is None for generic tables
+        """
+        rows = message['data']
+
+        partitions, generic = self._write_stores()
+
+        if table_name not in self.SYMBOL_TABLES:
+            return [(None, generic, rows)]
+
+        if len(partitions) == 1:
+            return [(self.symbol, partitions[self.symbol], rows)]
+
+        groups = OrderedDict()
+
+        if partial:
+            symbol = message.get('filter', {}).get('symbol')
+
+            if symbol:
+                groups[symbol] = list()
+            elif not rows or table_name in self._generic_subs():
+                # partial of all symbols
+                for symbol in partitions:
+                    groups[symbol] = list()
+
+        for row in rows:
+            # rows without symbol belong to primary symbol, same as
+            # single symbol subscribed
+            symbol = row.get('symbol') or self.symbol
+
+            try:
+                groups[symbol].append(row)
+            except KeyError:
+                groups[symbol] = [row]
+
+        results = list()
+
+        for symbol, symbol_rows in groups.items():
+            try:
+                partition = partitions[symbol]
+            except KeyError:
+                self.logger.debug(
+                    "drop {} rows for unsubscribed symbol[{}]".format(
+                        table_name, symbol))
+                continue
+
+            results.append((symbol, partition, symbol_rows))
+
+        return results
+
+    def _on_partial(self, table_name, symbol):
+        """
+        Called when table partial of symbol received.
+        :param table_name:
+        :param symbol: None for generic tables
         :return:
         """
-        return self.data['trade']
+        pass
 
     def _partial_handler(self, table_name, message):
         self.logger.debug("%s: partial" % table_name)
 
-        self.data[table_name] = message['data']
         # Keys are communicated on partials to let you know how
         # to uniquely identify
         # an item. We use it for updates.
         self.keys[table_name] = message['keys']
 
+        symbols = list()
+
+        for symbol, partition, rows in self._partition_rows(
+                table_name, message, partial=True):
+            partition[table_name] = self._new_table(table_name, rows)
+            symbols.append(symbol)
+
+            if table_name == "trade" and self._trade_tape_capacity:
+                tape = self.get_trade_tape(symbol)
+                tape.clear()
+                tape.extend(rows)
+
+            with self._resync_lock:
+                if self._resyncing.pop((table_name, symbol), None):
+                    self.integrity_metrics["resynced"] += 1
+
+            self._on_partial(table_name, symbol)
+
+        if self._staging is not None:
+            self.__check_resync()
+        else:
+            self._publish(table_name, symbols)
+
+        self._applied_ns = perf_counter_ns()
+
     def _insert_handler(self, table_name, message):
         self.logger.debug(
             '%s: inserting %s' % (table_name, message['data']))
 
-        self.data[table_name] += message['data']
+        with self._writing():
+            symbols = list()
+
+            for symbol, partition, rows in self._partition_rows(
+                    table_name, message):
+                try:
+                    table = self._writable_table(table_name, partition)
+                except KeyError:
+                    self.logger.debug(
+                        "%s: no partial yet, drop insert" % table_name)
+                    continue
+
+                # Bounded tables are ring buffers, oldest rows will be
+                # dropped in O(1) when capacity exceeded.
+                table.extend(rows)
+                symbols.append(symbol)
+
+                if table_name == "trade" and self._trade_tape_capacity:
+                    self.get_trade_tape(symbol).extend(rows)
 
-        # Limit the max length of the table to avoid excessive memory usage.
-        # Don't trim orders because we'll lose valuable state if we do.
-        if table_name not in ('order', 'orderBookL2', "trade") and len(
-                self.data[table_name]) > NGEWebsocket.MAX_TABLE_LEN:
-            self.data[table_name] = self.data[table_name][int(
-                NGEWebsocket.MAX_TABLE_LEN / 2):]
+            self._publish(table_name, symbols)
+
+        self._applied_ns = perf_counter_ns()
 
     def _update_handler(self, table_name, message):
         self.logger.debug(
             '%s: updating %s' % (table_name, message['data']))
 
-        # Locate the item in the collection and update it.
-        for update_data in message['data']:
-            item = find_item_by_keys(self.keys[table_name],
-                                     self.data[table_name], update_data)
-            if not item:
-                return
+        keys = self.keys[table_name]
+
+        # whole rows after updated, unknown rows are excluded
+        self._updated_rows = updated = list()
+
+        with self._writing():
+            symbols = list()
+
+            for symbol, partition, rows in self._partition_rows(
+                    table_name, message):
+                try:
+                    table = self._writable_table(table_name, partition)
+                except KeyError:
+                    self.logger.debug(
+                        "%s: no partial yet, drop update" % table_name)
+                    continue
 
-            item.update(update_data)
-            # Remove cancelled / filled orders
-            if table_name == 'order' and item['leavesQty'] <= 0:
-                self.data[table_name].remove(item)
+                symbols.append(symbol)
+
+                # Locate the item in the collection and update it.
+                for update_data in rows:
+                    idx = find_index_by_keys(keys, table, update_data)
+                    if idx is None:
+                        self._on_unknown_row(table_name, symbol, update_data)
+                        continue
+
+                    item = table[idx]
+
+                    if self._copy_on_write:
+                        # rows may be shared with published snapshots
+                        item = table[idx] = dict(item)
+
+                    item.update(update_data)
+                    updated.append(item)
+                    # Remove cancelled / filled orders
+                    if table_name == 'order' and item['leavesQty'] <= 0:
+                        del table[idx]
+
+            self._publish(table_name, symbols)
+
+        self._applied_ns = perf_counter_ns()
 
     def _delete_handler(self, table_name, message):
         self.logger.debug(
             '%s: deleting %s' % (table_name, message['data']))
 
-        # Locate the item in the collection and remove it.
-        for deleteData in message['data']:
-            item = find_item_by_keys(self.keys[table_name],
-                                     self.data[table_name], deleteData)
-            self.data[table_name].remove(item)
+        keys = self.keys[table_name]
+
+        with self._writing():
+            symbols = list()
+
+            for symbol, partition, rows in self._partition_rows(
+                    table_name, message):
+                try:
+                    table = self._writable_table(table_name, partition)
+                except KeyError:
+                    self.logger.debug(
+                        "%s: no partial yet, drop delete" % table_name)
+                    continue
+
+                symbols.append(symbol)
+
+                # Locate the item in the collection and remove it.
+                for deleteData in rows:
+                    item = find_item_by_keys(keys, table, deleteData)
+
+                    if item is None:
+                        self._on_unknown_row(table_name, symbol, deleteData)
+                        continue
+
+                    table.remove(item)
+
+            self._publish(table_name, symbols)
+
+        self._applied_ns = perf_counter_ns()
 
     def __connect(self, ws_url):
         """Connect to the websocket in a thread.
         """
 
+        self._connected.clear()
+        self._connecting.set()
+
         self.logger.debug("Starting thread")
         self.ws = websocket.WebSocketApp(ws_url,
                                          on_message=self.__on_message,
                                          on_close=self.__on_close,
                                          on_open=self.__on_open,
                                          on_error=self.__on_error,
-                                         header=self.__get_auth())
+                                         header=self._get_auth())
 
         self.wst = threading.Thread(target=lambda: self.ws.run_forever())
         self.wst.daemon = True
@@ -221,46 +978,43 @@ class NGEWebsocket(object):
         self.logger.debug("Started thread")
 
         # Wait for connect before continuing
-        conn_timeout = 5
-        while (not self.ws.sock or
-               not self.ws.sock.connected and
-               conn_timeout <= 0):
-            sleep(1)
-            conn_timeout -= 1
-        if not conn_timeout:
-            self.logger.error("Couldn't connect to WS! Exiting.")
-            self.running = False
-            raise websocket.WebSocketTimeoutException(
-                "Could not connect to WS! Exiting.")
+        try:
+            if not self._connected.wait(self.CONNECT_TIMEOUT):
+                self.ws.close()
+
+                raise websocket.WebSocketTimeoutException(
+                    "Could not connect to WS in {}s.".format(
+                        self.CONNECT_TIMEOUT))
+        finally:
+            self._connecting.clear()
 
     def __reconnect(self):
-        self.data = dict()
-        self.keys = dict()
+        self._record_disconnected()
 
-        ws_url = self.__get_url()
+        ws_url = self._get_url()
         self.logger.info("ReConnecting to %s" % ws_url)
 
+        attempt = 0
+
         while self.running:
+            delay = backoff_delay(attempt, self.RECONNECT_DELAY_BASE,
+                                  self.RECONNECT_DELAY_MAX)
+            self.logger.info(
+                "Delay {:.3f}s to connect, attempt[{}].".format(
+                    delay, attempt + 1))
+            sleep(delay)
+
             try:
                 self.__connect(ws_url)
-            except websocket.WebSocketException:
-                # todo: 随机回退算法进行递增延时重连
-                delay = 5
-                self.logger.info(
-                    "Delay {}s to retry connecting.".format(delay))
-                sleep(delay)
+            except websocket.WebSocketException as e:
+                self.logger.warning(e)
+                self.reconnect_metrics["connect_failed"] += 1
+                attempt += 1
             else:
+                self._record_reconnected()
                 break
 
-        self.logger.info('ReConnected to WS.')
-
-        # Connected. Wait for partials
-        self.__wait_for_symbol(self.symbol)
-        if self._api_key:
-            self.__wait_for_account()
-        self.logger.info('Got all market data. Starting.')
-
-    def __get_auth(self):
+    def _get_auth(self):
         """
         Return auth headers. Will use API Keys if present in settings.
         :return:
@@ -283,14 +1037,11 @@ class NGEWebsocket(object):
             "api-key: " + self._api_key
         ]
 
-    def __get_url(self):
+    def _symbol_subs(self):
         """
-        Generate a connection URL. We can define subscriptions
-        right in the querystring.
-        Most subscription topics are scoped by the symbol we're listening to.
+        Table names subscribed for every symbol.
         :return:
         """
-
         # You can sub to orderBookL2 for all levels, or orderBook10 for top
         # 10 levels & save bandwidth
         symbol_subs = [
@@ -302,14 +1053,38 @@ class NGEWebsocket(object):
                 "execution", "order",
                 "position"] if self.BITMEX_COMPATIABLE else ["order"]
 
-        self.subscribed += symbol_subs
-        subscriptions = [sub + ':' + self.symbol for sub in symbol_subs]
+        return symbol_subs
+
+    def _generic_subs(self):
+        """
+        Table names subscribed without symbol.
+        :return:
+        """
+        if not self.has_authorization:
+            return []
 
-        generic_subs = ["margin"] if self.BITMEX_COMPATIABLE else [
+        return ["margin"] if self.BITMEX_COMPATIABLE else [
             "execution", "position", "margin"]
-        if self.has_authorization:
-            subscriptions += generic_subs
-            self.subscribed += generic_subs
+
+    def _symbol_subscriptions(self, symbol):
+        return [sub + ':' + symbol for sub in self._symbol_subs()]
+
+    def _get_url(self):
+        """
+        Generate a connection URL. We can define subscriptions
+        right in the querystring.
+        Most subscription topics are scoped by the symbol we're listening to,
+        all symbols are multiplexed in one connection.
+        :return:
+        """
+        generic_subs = self._generic_subs()
+
+        self.subscribed = self._symbol_subs() + generic_subs
+
+        subscriptions = list()
+        for symbol in self.symbols:
+            subscriptions += self._symbol_subscriptions(symbol)
+        subscriptions += generic_subs
 
         url_parts = list(urlparse(self.endpoint))
         url_parts[0] = url_parts[0].replace('http', 'ws')
@@ -317,16 +1092,49 @@ class NGEWebsocket(object):
 
         return urlunparse(url_parts)
 
+    def _account_tables(self):
+        """
+        Account tables which partial must be received before starting.
+        :return:
+        """
+        return ({'margin', 'order', 'position'} & set(
+            self.subscribed)) - self._decoder.ignore_tables
+
+    def _symbol_tables(self):
+        """
+        Symbol tables which partial must be received before starting.
+        :return:
+        """
+        return ({'instrument', 'trade', 'quote', 'orderBookL2'} & set(
+            self.subscribed)) - self._decoder.ignore_tables
+
+    def _is_received(self, table_name, symbol):
+        """
+        Whether table partial of symbol is received.
+        :param table_name:
+        :param symbol:
+        :return:
+        """
+        partitions, generic = self._write_stores()
+
+        if table_name in self.SYMBOL_TABLES:
+            return table_name in partitions.get(symbol, ())
+
+        return table_name in generic
+
     def __wait_for_account(self):
         """
         On subscribe, this data will come down. Wait for it.
         :return:
         """
         # Wait for the keys to show up from the ws
-        wait_tables = {'margin', 'order', 'position'} & set(self.subscribed)
+        wait_tables = self._account_tables()
 
         while True:
-            retrieved_account = wait_tables & set(self.data)
+            retrieved_account = {
+                table for table in wait_tables if all(
+                    self._is_received(table, symbol)
+                    for symbol in self.symbols)}
 
             if len(retrieved_account) == len(wait_tables):
                 break
@@ -342,17 +1150,19 @@ class NGEWebsocket(object):
         :param symbol:
         :return:
         """
-        wait_tables = {'instrument', 'trade',
-                       'quote', 'orderBookL2'} & set(self.subscribed)
+        wait_tables = self._symbol_tables()
 
         while True:
-            retrieved_symbols = wait_tables & set(self.data)
+            retrieved_symbols = {
+                table for table in wait_tables
+                if self._is_received(table, symbol)}
 
             if len(retrieved_symbols) == len(wait_tables):
                 break
 
             self.logger.debug(
-                "Symbol table retrieved: {}".format(retrieved_symbols))
+                "Symbol[{}] table retrieved: {}".format(
+                    symbol, retrieved_symbols))
 
             sleep(0.1)
 
@@ -373,19 +1183,39 @@ class NGEWebsocket(object):
         :param message:
         :return:
         """
+        self._on_frame(message)
+
+    def _on_frame(self, frame):
+        """
+        Decode raw frame and apply it to tables.
+        :param frame:
+        :return:
+        """
+        received_ns = self._received_ns = perf_counter_ns()
+
+        if self.capture:
+            self.capture.write(frame, time_ns())
 
         try:
-            message = json.loads(message)
+            message = self._decoder.decode(frame)
         except ValueError as e:
             self.logger.warning(
-                "parse message failed: {}\n{}".format(e, message))
+                "parse message failed: {}\n{}".format(e, frame))
+            return
+
+        if message is None:
             return
 
         if 'subscribe' in message:
             self.logger.debug("Subscribed to %s." % message['subscribe'])
             return
 
-        message["@timestamp"] = time_ms()
+        if 'unsubscribe' in message:
+            self.logger.debug(
+                "Unsubscribed from %s." % message['unsubscribe'])
+            return
+
+        message["@timestamp"] = int(self.clock.time() * 1000)
 
         table = message.get('table')
         action = message.get('action')
@@ -393,29 +1223,53 @@ class NGEWebsocket(object):
         if not action:
             return
 
-        # There are four possible actions from the WS:
-        # 'partial' - full table image
-        # 'insert'  - new row
-        # 'update'  - update row
-        # 'delete'  - delete row
-        action_switch = {
-            "partial": self._partial_handler,
-            "insert": self._insert_handler,
-            "update": self._update_handler,
-            "delete": self._delete_handler
-        }
-
         try:
-            action_func = action_switch[action]
+            action_func = self._action_switch[action]
         except KeyError as e:
             self.logger.error("Unknown action: %s" % action)
             return
 
+        decoded_ns = perf_counter_ns()
+        self._applied_ns = None
+
         try:
             action_func(table, message)
         except Exception as e:
             self.logger.exception(e)
 
+        if self.latency:
+            self._latency_countdown -= 1
+
+            if not self._latency_countdown:
+                self._latency_countdown = self._latency_sample
+                self._record_latency(table, message, received_ns,
+                                     decoded_ns)
+
+    def _record_latency(self, table, message, received_ns, decoded_ns):
+        dispatched_ns = perf_counter_ns()
+        applied_ns = self._applied_ns or dispatched_ns
+
+        self.latency.record("decode", decoded_ns - received_ns)
+        self.latency.record("apply", applied_ns - decoded_ns)
+        self.latency.record("dispatch", dispatched_ns - applied_ns)
+        self.latency.record("total", dispatched_ns - received_ns)
+
+        data = message.get("data")
+
+        if not data or "timestamp" not in data[-1]:
+            return
+
+        try:
+            exchange_ns = timestamp_ns(data[-1]["timestamp"])
+        except (ValueError, AttributeError):
+            return
+
+        # clock at receipt
+        received_wall_ns = (int(self.clock.time() * 1000000000) -
+                            (dispatched_ns - received_ns))
+
+        self.latency.record("lag." + table, received_wall_ns - exchange_ns)
+
     def __on_error(self, error):
         """
         Called on fatal websocket errors. We exit on these.
@@ -432,6 +1286,8 @@ class NGEWebsocket(object):
         """
         self.logger.debug("Websocket Opened.")
 
+        self._connected.set()
+
     def __on_close(self):
         """
         Called on websocket close.
@@ -439,8 +1295,19 @@ class NGEWebsocket(object):
         """
         self.logger.info('Websocket Closed')
 
-        if self.running:
+        # connection failed while connecting will be retried by connector,
+        # and close of replaced connection should be ignored
+        if (not self.running or self._connecting.is_set() or
+                threading.current_thread() is not self.wst):
+            return
+
+        if not self._reconnect_lock.acquire(blocking=False):
+            return
+
+        try:
             self.__reconnect()
+        finally:
+            self._reconnect_lock.release()
 
 
 # Utility method for finding an item in the store.
@@ -461,3 +1328,13 @@ def find_item_by_keys(keys, table_data, match_data):
                 matched = False
         if matched:
             return item
+
+
+def find_index_by_keys(keys, table_data, match_data):
+    for idx, item in enumerate(table_data):
+        matched = True
+        for key in keys:
+            if item[key] != match_data[key]:
+                matched = False
+        if matched:
+            return idx
@@ -0,0 +1,192 @@
+# coding: utf-8
+import json
+
+import requests
+
+from clients.http_session import shared_session
+from clients.nge_rest import NGEAPIKeyAuthenticator
+
+
+class OrderEntryClient(object):
+    """
+    Direct REST client for hot order endpoints.
+
+    Requests are built and signed directly with NGEAPIKeyAuthenticator's
+    signing, bypassing bravado's request validation and marshalling,
+    so order fields are sent as is and not validated locally.
+    Results are returned as (result, response) same as swagger client.
+    Other endpoints should use swagger client built by nge_rest.api().
+
+    Orders are tracked by tracker if specified, e.g.
+    trade.order_latency.OrderLatencyTracker, with kind of "new", "amend"
+    and "cancel".
+    """
+
+    BASE_PATH = "/api/v1"
+
+    ORDER = "/order"
+    ORDER_BULK = "/order/bulk"
+    ORDER_ALL = "/order/all"
+
+    def __init__(self, host, api_key, api_secret, session=None,
+                 base_path=BASE_PATH, tracker=None):
+        """
+        :param host: same as nge_rest.api()
+        :param api_key:
+        :param api_secret:
+        :param session: requests session, shared PooledSession by default
+        :param base_path: api base path
+        :param tracker: order latency tracker
+        """
+        if not api_key or not api_secret:
+            raise ValueError("api key & secret are required.")
+
+        self.session = session or shared_session()
+        self.tracker = tracker
+        self.authenticator = NGEAPIKeyAuthenticator(
+            host=host, api_key=api_key, api_secret=api_secret)
+
+        prefix = host.rstrip("/")
+
+        # endpoint -> (path signed, full url)
+        self._endpoints = {
+            endpoint: (base_path + endpoint, prefix + base_path + endpoint)
+            for endpoint in (self.ORDER, self.ORDER_BULK, self.ORDER_ALL)
+        }
+
+        self._headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+
+    def _request(self, method, endpoint, params):
+        path, url = self._endpoints[endpoint]
+
+        body = json.dumps(
+            {k: v for k, v in params.items() if v is not None})
+
+        headers = self.authenticator.sign(method, path, body)
+        headers.update(self._headers)
+
+        response = self.session.request(
+            method, url, data=body.encode("utf-8"), headers=headers)
+
+        if not response.ok:
+            raise requests.HTTPError(response.text, response=response)
+
+        return response.json(), response
+
+    def _tracked(self, kind, orders, method, endpoint, params):
+        if not self.tracker:
+            return self._request(method, endpoint, params)
+
+        entries = [self.tracker.submit(
+            kind, orderID=order.get("orderID"),
+            clOrdID=order.get("clOrdID") or order.get("origClOrdID"))
+            for order in orders]
+
+        try:
+            result, response = self._request(method, endpoint, params)
+        except Exception:
+            for entry in entries:
+                self.tracker.fail(entry)
+            raise
+
+        rows = result if isinstance(result, list) else [result]
+
+        if len(rows) != len(entries):
+            rows = [dict()] * len(entries)
+
+        for entry, row in zip(entries, rows):
+            self.tracker.responded(entry, orderID=row.get("orderID"))
+
+        return result, response
+
+    @staticmethod
+    def _ids(value):
+        if value is None:
+            return list()
+
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return [value]
+
+        return value if isinstance(value, list) else [value]
+
+    @staticmethod
+    def _orders(orders):
+        return json.loads(orders) if isinstance(orders, str) else orders
+
+    @staticmethod
+    def _json_param(value):
+        if value is None or isinstance(value, str):
+            return value
+
+        return json.dumps(value)
+
+    def new(self, **order):
+        """
+        Place new order, same as Order.Order_new.
+        :param order: order fields, e.g. symbol, side, orderQty, price
+        :return: (order, response)
+        """
+        return self._tracked("new", [order], "POST", self.ORDER, order)
+
+    def amend(self, **order):
+        """
+        Amend order, same as Order.Order_amend.
+        :param order: orderID or origClOrdID, and fields to amend
+        :return: (order, response)
+        """
+        return self._tracked("amend", [order], "PUT", self.ORDER, order)
+
+    def cancel(self, orderID=None, clOrdID=None, text=None):
+        """
+        Cancel orders, same as Order.Order_cancel.
+        :param orderID: order id or list of order ids
+        :param clOrdID: client order id or list of client order ids
+        :param text:
+        :return: (orders, response)
+        """
+        orders = ([{"orderID": i} for i in self._ids(orderID)] +
+                  [{"clOrdID": i} for i in self._ids(clOrdID)])
+
+        return self._tracked("cancel", orders, "DELETE", self.ORDER, {
+            "orderID": self._json_param(orderID),
+            "clOrdID": self._json_param(clOrdID),
+            "text": text})
+
+    def cancel_all(self, symbol=None, filter=None, text=None):
+        """
+        Cancel all orders, same as Order.Order_cancelAll.
+        :param symbol:
+        :param filter: filter dict or json str
+        :param text:
+        :return: (orders, response)
+        """
+        return self._request("DELETE", self.ORDER_ALL, {
+            "symbol": symbol,
+            "filter": self._json_param(filter),
+            "text": text})
+
+    def new_bulk(self, orders):
+        """
+        Place orders in bulk, same as Order.Order_newBulk.
+        :param orders: list of order dict or json str
+        :return: (orders, response)
+        """
+        return self._tracked("new", self._orders(orders), "POST",
+                             self.ORDER_BULK,
+                             {"orders": self._json_param(orders)})
+
+    def amend_bulk(self, orders):
+        """
+        Amend orders in bulk, same as Order.Order_amendBulk.
+        :param orders: list of order dict or json str
+        :return: (orders, response)
+        """
+        return self._tracked("amend", self._orders(orders), "PUT",
+                             self.ORDER_BULK,
+                             {"orders": self._json_param(orders)})
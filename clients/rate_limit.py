@@ -0,0 +1,309 @@
+# coding: utf-8
+import asyncio
+import logging
+import time
+
+from collections import namedtuple
+from threading import Condition
+
+from requests import RequestException
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CANCEL = 0
+PRIORITY_ORDER = 1
+PRIORITY_QUERY = 2
+
+RateBudget = namedtuple("RateBudget", ("tokens", "capacity", "rate",
+                                       "limit", "remaining", "blocked",
+                                       "waiting"))
+
+
+class RateLimitExceeded(RequestException):
+    """
+    Request not sent as rate limit budget exhausted.
+    """
+
+
+def request_priority(method, path):
+    """
+    Priority of REST request, cancels go first.
+    :param method: http method
+    :param path: request path
+    :return: PRIORITY_CANCEL, PRIORITY_ORDER or PRIORITY_QUERY
+    """
+    path = path.split("?", 1)[0].rstrip("/")
+
+    if "/order" not in path:
+        return PRIORITY_QUERY
+
+    method = method.upper()
+
+    if method == "DELETE" or path.endswith("/cancelAllAfter"):
+        return PRIORITY_CANCEL
+
+    if method in ("POST", "PUT"):
+        return PRIORITY_ORDER
+
+    return PRIORITY_QUERY
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiter driven by exchange rate limit headers.
+
+    Bucket capacity and refill rate follow x-ratelimit-limit per WINDOW,
+    tokens never exceed x-ratelimit-remaining of latest response, and
+    all requests are held until reset time if budget exhausted or
+    throttled by 429.
+    Each priority leaves a reserved share of capacity to the higher
+    priorities, and waits while higher priority requests are waiting,
+    so cancels are sent first when budget is tight.
+    Requests are not limited until limit is known from headers if
+    limit is not specified.
+    """
+
+    # seconds of x-ratelimit-limit
+    WINDOW = 60
+
+    # share of capacity reserved for higher priorities, by priority
+    RESERVES = (0, 0.1, 0.2)
+
+    # default max seconds waiting for a token
+    MAX_WAIT = 10
+
+    # max seconds waiting for a token by priority, cancels wait ahead of
+    # others, new orders fail fast instead of stalling order paths
+    WAITS = (3, 0, MAX_WAIT)
+
+    # hold seconds if throttled without Retry-After & reset header
+    THROTTLE_HOLD = 1
+
+    def __init__(self, limit=None, burst=None, window=WINDOW,
+                 reserves=RESERVES, waits=WAITS):
+        """
+        :param limit: requests per window, updated by headers
+        :param burst: max tokens in bucket, limit by default. smaller
+        burst smooths requests more evenly across window
+        :param window: seconds of rate limit window
+        :param reserves: share of capacity reserved by each priority
+        :param waits: max seconds waiting of each priority
+        """
+        self._window = window
+        self._burst = burst
+        self._reserves = reserves
+        self._waits = waits
+
+        self._condition = Condition()
+
+        self.limit = None
+        self.capacity = None
+        self.rate = None
+        self.tokens = 0.0
+        self.remaining = None
+
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+        self._waiting = [0] * len(reserves)
+
+        self.throttled = 0
+
+        if limit:
+            self._set_limit(limit)
+            self.tokens = float(self.capacity)
+
+    def _set_limit(self, limit):
+        self.limit = limit
+        self.capacity = min(self._burst or limit, limit)
+        self.rate = limit / self._window
+
+    def _refill(self, now):
+        if self.capacity is not None:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self._updated) * self.rate)
+
+        self._updated = now
+
+    def _delay(self, priority, now):
+        """
+        Seconds to wait before a token can be taken, 0 if available.
+        """
+        if now < self._blocked_until:
+            return self._blocked_until - now
+
+        if self.capacity is None:
+            return 0
+
+        if any(self._waiting[:priority]):
+            # wake up soon to check again
+            return 1 / self.rate
+
+        threshold = 1 + self._reserves[priority] * self.capacity
+
+        if self.tokens >= threshold:
+            return 0
+
+        return (threshold - self.tokens) / self.rate
+
+    def _try_take(self, priority):
+        now = time.monotonic()
+
+        self._refill(now)
+
+        delay = self._delay(priority, now)
+
+        if not delay and self.capacity is not None:
+            self.tokens -= 1
+
+        return delay
+
+    def max_wait(self, priority):
+        """
+        Max seconds a request of priority should wait for a token.
+        :param priority:
+        :return:
+        """
+        return self._waits[priority]
+
+    def acquire(self, priority=PRIORITY_QUERY, timeout=MAX_WAIT):
+        """
+        Take a token, wait if not available.
+        :param priority:
+        :param timeout: max seconds waiting, None for no limit
+        :return: False if timed out
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            delay = self._try_take(priority)
+
+            if not delay:
+                return True
+
+            self._waiting[priority] += 1
+
+            try:
+                while delay:
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+
+                        if remaining <= 0:
+                            return False
+
+                        delay = min(delay, remaining)
+
+                    self._condition.wait(delay)
+
+                    delay = self._try_take(priority)
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+        return True
+
+    async def acquire_async(self, priority=PRIORITY_QUERY,
+                            timeout=MAX_WAIT):
+        """
+        Coroutine version of acquire().
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            delay = self._try_take(priority)
+
+            if not delay:
+                return True
+
+            self._waiting[priority] += 1
+
+        try:
+            while delay:
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        return False
+
+                    delay = min(delay, remaining)
+
+                await asyncio.sleep(delay)
+
+                with self._condition:
+                    delay = self._try_take(priority)
+        finally:
+            with self._condition:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+        return True
+
+    def update(self, status, headers):
+        """
+        Update budget by response.
+        :param status: response status code
+        :param headers: response headers
+        :return:
+        """
+        limit = headers.get("x-ratelimit-limit")
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        retry_after = headers.get("retry-after")
+
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+
+            if limit is not None and int(limit) != self.limit:
+                known = self.capacity is not None
+
+                self._set_limit(int(limit))
+
+                if not known:
+                    self.tokens = float(self.capacity)
+
+            if remaining is not None:
+                self.remaining = int(remaining)
+
+                if self.capacity is not None:
+                    self.tokens = min(self.tokens, self.remaining)
+
+            hold = None
+
+            if status == 429:
+                self.throttled += 1
+                self.tokens = 0.0
+
+                if retry_after is not None:
+                    hold = float(retry_after)
+                elif reset is not None:
+                    hold = float(reset) - time.time()
+                else:
+                    hold = self.THROTTLE_HOLD
+
+                logger.warning("rate limit throttled, hold {:.3f}s".format(
+                    hold))
+            elif self.remaining == 0 and reset is not None:
+                hold = float(reset) - time.time()
+
+            if hold is not None and hold > 0:
+                self._blocked_until = max(self._blocked_until, now + hold)
+
+            self._condition.notify_all()
+
+    def budget(self):
+        """
+        Current budget.
+        :rtype: RateBudget
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+
+            return RateBudget(
+                tokens=self.tokens if self.capacity is not None else None,
+                capacity=self.capacity, rate=self.rate, limit=self.limit,
+                remaining=self.remaining,
+                blocked=max(self._blocked_until - now, 0),
+                waiting=tuple(self._waiting))
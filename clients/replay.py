@@ -0,0 +1,142 @@
+# coding: utf-8
+import time
+
+from threading import Thread, current_thread
+
+from clients.capture import read_frames
+from clients.nge_websocket import NGEWebsocket
+from common.clock import VirtualClock
+
+
+class ReplayWebsocket(NGEWebsocket):
+    """
+    Replay captured frames through the same handlers as live websocket.
+
+    Setting running to True applies frames until all partials received
+    instead of connecting, then replay() or start() replays the rest.
+    self.clock is a VirtualClock driven by frame receipt timestamps.
+    """
+
+    def __init__(self, host, symbol, api_key=None, api_secret=None,
+                 source=None, speed=0, **kwargs):
+        """
+        :param host:
+        :param symbol:
+        :param api_key:
+        :param api_secret:
+        :param source: capture segment file, directory or glob pattern
+        :param speed: replay speed relative to wall clock,
+        0 for as fast as possible
+        :param kwargs: other NGEWebsocket arguments
+        """
+        if not source:
+            raise ValueError("replay source is required.")
+
+        self._source = source
+        self._speed = speed
+        self._frames = None
+
+        self.replayed = 0
+
+        super(ReplayWebsocket, self).__init__(
+            host, symbol, api_key=api_key, api_secret=api_secret, **kwargs)
+
+        self.clock = VirtualClock()
+
+        self.ws = None
+        self.wst = None
+
+    @property
+    def running(self):
+        return self._running_flag.is_set()
+
+    @running.setter
+    def running(self, value):
+        if value:
+            self._frames = iter(read_frames(self._source))
+            self.subscribed = self._symbol_subs() + self._generic_subs()
+
+            try:
+                first = next(self._frames)
+            except StopIteration:
+                raise ValueError(
+                    "no frame captured in {}".format(self._source))
+
+            # timers started by running flag sleep from first frame's time
+            self.clock.advance(first.timestamp / 1000000000)
+            self._running_flag.set()
+            self._apply(first)
+
+            while not self.__partials_received():
+                try:
+                    self._apply(next(self._frames))
+                except StopIteration:
+                    self.logger.warning(
+                        "replay source exhausted before all partials "
+                        "received.")
+                    break
+
+            self.logger.info('Got all market data. Starting.')
+        else:
+            self._running_flag.clear()
+            self.clock.stop()
+
+            if (self.wst and self.wst.is_alive() and
+                    self.wst is not current_thread()):
+                self.wst.join()
+
+    def __partials_received(self):
+        wait_tables = self._symbol_tables()
+        if self._api_key:
+            wait_tables |= self._account_tables()
+
+        return all(self._is_received(table, symbol)
+                   for table in wait_tables for symbol in self.symbols)
+
+    def _apply(self, captured):
+        self.clock.advance(captured.timestamp / 1000000000)
+
+        self._on_frame(captured.frame)
+
+        self.replayed += 1
+
+    def replay(self):
+        """
+        Replay remaining frames in calling thread,
+        running is set to False when finished.
+        :return:
+        """
+        start_wall = time.monotonic()
+        start_ts = self.clock.time()
+
+        for captured in self._frames:
+            if not self.running:
+                break
+
+            if self._speed:
+                delay = ((captured.timestamp / 1000000000 - start_ts) /
+                         self._speed - (time.monotonic() - start_wall))
+
+                if delay > 0:
+                    time.sleep(delay)
+
+            self._apply(captured)
+
+        self.logger.info("Replay finished, {} frames replayed.".format(
+            self.replayed))
+
+        self._on_replay_finished()
+
+        self.running = False
+
+    def start(self):
+        """
+        Replay remaining frames in background thread.
+        :return:
+        """
+        self.wst = Thread(target=self.replay, name="replay")
+        self.wst.daemon = True
+        self.wst.start()
+
+    def _on_replay_finished(self):
+        pass
@@ -0,0 +1,209 @@
+# coding: utf-8
+import logging
+import time
+
+from collections import Counter, OrderedDict
+from threading import Lock, Thread
+
+from common.metrics import LatencyRecorder
+
+
+logger = logging.getLogger(__name__)
+
+
+def operation_name(method, path):
+    """
+    Operation name of request, e.g. "POST /api/v1/order".
+    :param method: http method
+    :param path: request path or url, query string is ignored
+    :return:
+    """
+    path = path.split("?", 1)[0]
+
+    if "://" in path:
+        path = "/" + path.split("://", 1)[1].partition("/")[2]
+
+    return "{} {}".format(method.upper(), path)
+
+
+class RESTMetrics(object):
+    """
+    REST request metrics of each operation.
+
+    Latencies in nanoseconds are recorded in histograms named by
+    "<operation>.<phase>", phase is one of:
+        total: from sending request to response body read
+        first_byte: from sending request to response headers parsed
+        connect: new connection established, including dns resolving
+    Requests failed or responded with status >= 400 are counted as
+    errors, in flight requests are counted by begin() & end().
+    A summary is logged every report_interval seconds if specified.
+    """
+
+    PHASES = ("total", "first_byte", "connect")
+
+    def __init__(self, report_interval=0):
+        """
+        :param report_interval: seconds between summary logs,
+        0 for disabled
+        """
+        self.latency = LatencyRecorder()
+
+        self.requests = Counter()
+        self.errors = Counter()
+        # (operation, status code) -> count, status 0 for exceptions
+        self.statuses = Counter()
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self._lock = Lock()
+
+        self._report_interval = report_interval
+
+        if report_interval:
+            self._reporter = Thread(target=self.__report,
+                                    name="rest-metrics")
+            self._reporter.daemon = True
+            self._reporter.start()
+
+    def begin(self):
+        """
+        Count request in flight, paired with end().
+        :return: start timestamp in perf_counter_ns
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        return time.perf_counter_ns()
+
+    def end(self, operation, start, status=0, first_byte=None,
+            connect=None):
+        """
+        Record finished request.
+        :param operation: operation name
+        :param start: timestamp returned by begin()
+        :param status: response status code, 0 if request failed
+        :param first_byte: first byte latency in nanoseconds
+        :param connect: connecting latency in nanoseconds
+        :return:
+        """
+        total = time.perf_counter_ns() - start
+
+        with self._lock:
+            self.in_flight -= 1
+
+            self.requests[operation] += 1
+            self.statuses[(operation, status)] += 1
+
+            if not status or status >= 400:
+                self.errors[operation] += 1
+
+            # histograms are not thread safe
+            self.latency.record(operation + ".total", total)
+
+            if first_byte is not None:
+                self.latency.record(operation + ".first_byte", first_byte)
+
+            if connect is not None:
+                self.latency.record(operation + ".connect", connect)
+
+    def operations(self):
+        return list(self.requests.keys())
+
+    def error_rate(self, operation=None):
+        """
+        :param operation: all operations if not specified
+        :return: errors / requests
+        """
+        with self._lock:
+            if operation:
+                requests = self.requests[operation]
+                errors = self.errors[operation]
+            else:
+                requests = sum(self.requests.values())
+                errors = sum(self.errors.values())
+
+        return errors / requests if requests else 0.0
+
+    def percentile(self, operation, percent, phase="total"):
+        """
+        :param operation:
+        :param percent: e.g. 99
+        :param phase: one of PHASES
+        :return: latency in nanoseconds, None if not recorded
+        """
+        with self._lock:
+            histogram = self.latency.histogram(
+                "{}.{}".format(operation, phase))
+
+            if not histogram.count:
+                return None
+
+            return histogram.percentile(percent)
+
+    def summary(self, reset=False):
+        """
+        :param reset: reset counters & histograms after summarized
+        :return: dict of operation -> summary, with in flight gauges
+        """
+        with self._lock:
+            latency = self.latency.summary(reset=reset)
+
+            result = OrderedDict()
+
+            for operation in sorted(self.requests):
+                requests = self.requests[operation]
+                errors = self.errors[operation]
+
+                result[operation] = OrderedDict((
+                    ("requests", requests), ("errors", errors),
+                    ("error_rate", errors / requests if requests else 0.0),
+                    ("statuses", {
+                        status: count for (name, status), count in
+                        self.statuses.items() if name == operation})))
+
+                for phase in self.PHASES:
+                    name = "{}.{}".format(operation, phase)
+
+                    if latency.get(name, dict()).get("count"):
+                        result[operation][phase] = latency[name]
+
+            result["in_flight"] = self.in_flight
+            result["peak_in_flight"] = self.peak_in_flight
+
+            if reset:
+                self.requests.clear()
+                self.errors.clear()
+                self.statuses.clear()
+                self.peak_in_flight = self.in_flight
+
+        return result
+
+    def __report(self):
+        while True:
+            time.sleep(self._report_interval)
+
+            summary = self.summary(reset=True)
+
+            # only in flight gauges
+            if len(summary) <= 2:
+                continue
+
+            for operation, stats in summary.items():
+                if not isinstance(stats, dict):
+                    continue
+
+                total = stats.get("total", dict())
+
+                logger.info(
+                    "{}: requests[{}] errors[{}] p50[{:.3f}ms] "
+                    "p99[{:.3f}ms] max[{:.3f}ms]".format(
+                        operation, stats["requests"], stats["errors"],
+                        total.get("p50", 0) / 1000000,
+                        total.get("p99", 0) / 1000000,
+                        (total.get("max") or 0) / 1000000))
+
+            logger.info("in flight[{}], peak[{}]".format(
+                summary["in_flight"], summary["peak_in_flight"]))
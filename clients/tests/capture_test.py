@@ -0,0 +1,68 @@
+# coding: utf-8
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..capture import FrameCapture, list_segments, read_frames
+from ..nge_websocket import NGEWebsocket
+
+
+class FrameCaptureTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_rotate_and_read(self):
+        capture = FrameCapture(self.directory, segment_size=100)
+
+        frames = [json.dumps({"table": "trade", "seq": i})
+                  for i in range(20)]
+        for ts, frame in enumerate(frames, 1):
+            self.assertTrue(capture.write(frame, ts))
+
+        capture.close()
+
+        self.assertFalse(capture.write(frames[0], 21))
+        self.assertEqual(20, capture.captured)
+        self.assertGreater(len(capture.segments), 1)
+        self.assertEqual(capture.segments, list_segments(self.directory))
+
+        captured = list(read_frames(self.directory))
+
+        self.assertEqual(list(range(1, 21)), [f.timestamp for f in captured])
+        self.assertEqual(frames, [f.frame for f in captured])
+
+    def test_truncated_segment(self):
+        capture = FrameCapture(self.directory)
+        for ts in range(1, 4):
+            capture.write("frame-{}".format(ts), ts)
+        capture.close()
+
+        segment = capture.segments[0]
+        with gzip.open(segment, "rb") as f:
+            content = f.read()
+        with gzip.open(segment, "wb") as f:
+            f.write(content[:-2])
+
+        self.assertEqual(["frame-1", "frame-2"],
+                         [f.frame for f in read_frames(segment)])
+
+    def test_websocket_capture(self):
+        capture = FrameCapture(self.directory)
+        ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD",
+                          capture=capture)
+
+        frame = json.dumps({"table": "trade", "action": "partial",
+                            "keys": [], "data": []})
+        ws._on_frame(frame)
+        capture.close()
+
+        captured = list(read_frames(self.directory))
+
+        self.assertEqual([frame], [f.frame for f in captured])
+        self.assertGreater(captured[0].timestamp, 0)
+        self.assertTrue(os.path.basename(capture.segments[0])
+                        .startswith("frames-"))
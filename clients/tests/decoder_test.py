@@ -0,0 +1,42 @@
+# coding: utf-8
+import json
+import unittest
+
+from ..decoder import MessageDecoder, DECODER_BACKENDS
+
+
+class MessageDecoderTest(unittest.TestCase):
+    FRAME = json.dumps({"table": "orderBookL2", "action": "update",
+                        "data": [{"id": 1, "side": "Buy", "size": 10}]})
+
+    def test_backends(self):
+        self.assertIn("json", DECODER_BACKENDS)
+
+        for backend in DECODER_BACKENDS:
+            decoder = MessageDecoder(backend=backend)
+
+            self.assertEqual(json.loads(self.FRAME),
+                             decoder.decode(self.FRAME))
+
+        with self.assertRaises(ValueError):
+            MessageDecoder(backend="foo")
+
+    def test_ignore_tables(self):
+        decoder = MessageDecoder(ignore_tables=("orderBookL2", ))
+
+        self.assertEqual("orderBookL2", decoder.peek_table(self.FRAME))
+        self.assertEqual("orderBookL2",
+                         decoder.peek_table(self.FRAME.encode()))
+        self.assertIsNone(decoder.decode(self.FRAME))
+        self.assertIsNone(decoder.decode(self.FRAME.encode()))
+
+        self.assertEqual({"subscribe": "trade:XBTUSD"},
+                         decoder.decode('{"subscribe": "trade:XBTUSD"}'))
+
+        # table name not in frame head
+        self.assertIsNone(decoder.decode(json.dumps({
+            "action": "update", "filter": {"symbol": "X" * 64},
+            "table": "orderBookL2", "data": []})))
+
+        with self.assertRaises(ValueError):
+            decoder.decode('{"table": "trade", ')
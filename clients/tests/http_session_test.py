@@ -0,0 +1,172 @@
+# coding: utf-8
+import json
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import requests
+
+from ..http_session import PooledSession, shared_session
+from ..rate_limit import RateLimitExceeded
+from ..utils import http_request
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        content = json.dumps(body).encode("utf-8")
+
+        self.send_response(status)
+        for key, value in (headers or dict()).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        server = self.server
+        server.clients.append(self.client_address)
+
+        if self.path == "/slow":
+            time.sleep(0.5)
+        elif self.path == "/flaky" and len(server.clients) == 1:
+            self._reply(503, {"error": "busy"})
+            return
+        elif self.path == "/limited":
+            self._reply(429, {"error": "throttled"}, {
+                "x-ratelimit-limit": "60", "x-ratelimit-remaining": "0",
+                "Retry-After": "1"})
+            return
+
+        self._reply(200, {"path": self.path})
+
+    do_DELETE = do_GET
+
+    def do_POST(self):
+        self.server.clients.append(self.client_address)
+
+        self._reply(503, {"error": "busy"})
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # timed out client closed connection
+        pass
+
+
+class PooledSessionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = StubServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.clients = list()
+
+        thread = Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        session = PooledSession()
+
+        for _ in range(5):
+            self.assertEqual("/", session.get(self.url + "/").json()["path"])
+
+        # all requests are sent in one connection
+        self.assertEqual(1, len(set(self.server.clients)))
+
+    def test_retry(self):
+        session = PooledSession(backoff_factor=0)
+
+        self.assertEqual(200, session.get(self.url + "/flaky").status_code)
+        self.assertEqual(2, len(self.server.clients))
+
+        # orders are never retried
+        with self.assertRaises(requests.HTTPError):
+            http_request(self.url + "/order", session=session)
+        self.assertEqual(3, len(self.server.clients))
+
+    def test_timeout(self):
+        session = PooledSession(retries=0, timeout=0.1)
+
+        with self.assertRaises(requests.Timeout):
+            session.get(self.url + "/slow")
+
+    def test_rate_limit(self):
+        session = PooledSession(retries=0)
+
+        self.assertEqual(429, session.get(self.url + "/limited").status_code)
+
+        budget = session.limiter().budget()
+        self.assertEqual(60, budget.limit)
+        self.assertGreater(budget.blocked, 0.5)
+
+        # requests of other api keys are not limited
+        session.get(self.url + "/", headers={"api-key": "other"})
+
+        # new orders fail fast while held
+        start = time.monotonic()
+        with self.assertRaises(RateLimitExceeded):
+            session.post(self.url + "/order")
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        # cancels wait until hold time passed in drained bucket
+        self.assertEqual(200,
+                         session.delete(self.url + "/order").status_code)
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+
+        # queries leave reserved budget to orders & cancels
+        self.assertFalse(session.limiter().acquire(timeout=0))
+
+        session = PooledSession(retries=0, rate_limit=False)
+        session.get(self.url + "/limited")
+        self.assertEqual(200, session.get(self.url + "/").status_code)
+
+    def test_metrics(self):
+        session = PooledSession(retries=0)
+
+        for _ in range(3):
+            session.get(self.url + "/?count=1")
+
+        with self.assertRaises(requests.HTTPError):
+            http_request(self.url + "/order", session=session)
+
+        session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        with self.assertRaises(requests.ConnectionError):
+            PooledSession(retries=0, metrics=session.metrics).get(
+                self.url + "/")
+
+        summary = session.metrics.summary()
+
+        self.assertEqual(4, summary["GET /"]["requests"])
+        # connection refused
+        self.assertEqual({200: 3, 0: 1}, summary["GET /"]["statuses"])
+        self.assertEqual(3, summary["GET /"]["first_byte"]["count"])
+        # connection kept alive
+        self.assertEqual(1, summary["GET /"]["connect"]["count"])
+
+        self.assertEqual({503: 1}, summary["POST /order"]["statuses"])
+        self.assertEqual(2 / 5, session.metrics.error_rate())
+        self.assertEqual(0, summary["in_flight"])
+
+    def test_shared(self):
+        from ..nge_rest import api
+
+        client = api(host=self.url)
+
+        self.assertIs(shared_session(), shared_session())
+        self.assertIs(shared_session(),
+                      client.swagger_spec.http_client.session)
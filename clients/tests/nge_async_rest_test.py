@@ -0,0 +1,129 @@
+# coding: utf-8
+import asyncio
+import json
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+import requests
+
+from ..nge_async_rest import AsyncNGERest
+from ..utils import generate_signature
+
+
+API_KEY = "key"
+API_SECRET = "secret"
+
+
+class PositionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, result):
+        content = json.dumps(result).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self):
+        server = self.server
+
+        body = self.rfile.read(
+            int(self.headers.get("Content-Length", 0))).decode("utf-8")
+
+        signature = generate_signature(
+            API_SECRET, self.command, self.path,
+            self.headers["api-expires"], body)
+
+        if self.headers["api-signature"] != signature:
+            self._reply(401, {"error": "invalid signature"})
+            return
+
+        with server.lock:
+            server.running += 1
+            server.peak = max(server.peak, server.running)
+
+        time.sleep(0.05)
+
+        with server.lock:
+            server.running -= 1
+
+        self._reply(200, [{"path": self.path,
+                           "body": json.loads(body) if body else None}])
+
+    do_GET = do_POST = _handle
+
+
+class AsyncNGERestTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PositionHandler)
+        self.server.daemon_threads = True
+        self.server.lock = Lock()
+        self.server.running = 0
+        self.server.peak = 0
+
+        thread = Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fan_out(self):
+        async def fan_out():
+            async with AsyncNGERest(self.url, API_KEY, API_SECRET,
+                                    max_in_flight=4,
+                                    use_aiohttp=False) as client:
+                results = await asyncio.gather(*[
+                    client.get("/position", filter={"symbol": "XBTUSD"})
+                    for _ in range(12)])
+
+                return client, results
+
+        start = time.perf_counter()
+        client, results = asyncio.run(fan_out())
+        duration = time.perf_counter() - start
+
+        self.assertEqual(12, len(results))
+        self.assertEqual(
+            "/api/v1/position?filter=%7B%22symbol%22%3A+%22XBTUSD%22%7D",
+            results[0][0][0]["path"])
+        self.assertEqual(200, results[0][1].status_code)
+
+        self.assertEqual(4, client.peak_in_flight)
+        self.assertEqual(4, self.server.peak)
+        self.assertEqual(0, client.in_flight)
+
+        summary = client.metrics.summary()
+        self.assertEqual(12, summary["GET /api/v1/position"]["requests"])
+        self.assertEqual(4, summary["peak_in_flight"])
+        # 3 rounds of 4 concurrent requests
+        self.assertLess(duration, 12 * 0.05)
+
+    def test_error(self):
+        async def post():
+            async with AsyncNGERest(self.url, API_KEY, API_SECRET,
+                                    use_aiohttp=False) as client:
+                result, _ = await client.post("/order", symbol="XBTUSD",
+                                              price=None)
+                self.assertEqual({"symbol": "XBTUSD"}, result[0]["body"])
+
+            async with AsyncNGERest(self.url, API_KEY, "wrong",
+                                    use_aiohttp=False) as client:
+                await client.get("/position")
+
+        with self.assertRaises(requests.HTTPError) as ctx:
+            asyncio.run(post())
+
+        self.assertEqual(401, ctx.exception.response.status_code)
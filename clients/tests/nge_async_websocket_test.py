@@ -0,0 +1,199 @@
+# coding: utf-8
+import asyncio
+import json
+import unittest
+
+from urllib.parse import urlparse, parse_qs
+
+import websockets
+
+from ..nge_async_websocket import AsyncNGEWebsocket, start_all
+
+
+async def push_tables(ws, request_path, price=100.0):
+    subscriptions = parse_qs(urlparse(request_path).query)["subscribe"]
+    for sub in subscriptions[0].split(","):
+        table, symbol = sub.split(":")
+        keys = ["symbol", "id", "side"] if table == "orderBookL2" else []
+
+        await ws.send(json.dumps({"subscribe": sub, "success": True}))
+        await ws.send(json.dumps({
+            "table": table, "action": "partial", "keys": keys,
+            "data": [{"symbol": symbol, "id": 1, "side": "Buy",
+                      "price": price, "size": 1,
+                      "timestamp": "2019-08-01T04:00:00.000Z"}]}))
+
+    await ws.send(json.dumps({
+        "table": "trade", "action": "insert",
+        "data": [{"symbol": symbol, "side": "Sell", "price": price + 1,
+                  "size": 2, "timestamp": "2019-08-01T04:00:01.000Z"}]}))
+
+
+async def stand_in_handler(ws, *args):
+    """
+    Local NGE realtime stand-in, push partials and one trade insert for
+    every subscribed table.
+    """
+    await push_tables(ws, args[0] if args else ws.request.path)
+
+    await ws.wait_closed()
+
+
+class AsyncNGEWebsocketTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.server = await websockets.serve(stand_in_handler,
+                                             "127.0.0.1", 0)
+        port = list(self.server.sockets)[0].getsockname()[1]
+        self.host = "http://127.0.0.1:{}".format(port)
+
+    async def asyncTearDown(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_multi_clients(self):
+        trades = list()
+
+        class Client(AsyncNGEWebsocket):
+            def _insert_handler(self, table_name, message):
+                super(Client, self)._insert_handler(table_name, message)
+
+                trades.extend(message["data"])
+
+        clients = [Client(host=self.host, symbol=symbol)
+                   for symbol in ("XBTUSD", "ETHUSD")]
+
+        await start_all(*clients)
+
+        for client in clients:
+            self.assertEqual({"instrument", "orderBookL2", "trade"},
+                             set(client.data))
+            self.assertEqual(client.symbol,
+                             client.data["orderBookL2"][0]["symbol"])
+
+        for _ in range(50):
+            if len(trades) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        self.assertEqual({"XBTUSD", "ETHUSD"},
+                         {t["symbol"] for t in trades})
+        self.assertEqual(2, len(clients[0].recent_trades()))
+
+        await asyncio.gather(*[c.stop() for c in clients])
+
+        self.assertFalse(any(c.running for c in clients))
+
+    async def test_subscribe_snapshot(self):
+        class Client(AsyncNGEWebsocket):
+            COPY_ON_WRITE = True
+
+        client = Client(host=self.host, symbol="XBTUSD")
+        await client.start()
+
+        await client.subscribe("ETHUSD", wait=False)
+
+        # snapshots follow partitions changes
+        self.assertEqual({}, dict(client.snapshot("ETHUSD").tables))
+
+        await client.unsubscribe("ETHUSD")
+
+        with self.assertRaises(KeyError):
+            client.snapshot("ETHUSD")
+
+        await client.stop()
+
+    async def test_reconnect(self):
+        connections = list()
+
+        async def drop_first(ws, *args):
+            connections.append(ws)
+
+            if len(connections) == 1:
+                await push_tables(ws, args[0] if args else ws.request.path,
+                                  price=1.0)
+                await asyncio.sleep(0.05)
+                await ws.close()
+                return
+
+            await asyncio.sleep(0.05)
+            await stand_in_handler(ws, *args)
+
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = await websockets.serve(drop_first, "127.0.0.1", 0)
+        port = list(self.server.sockets)[0].getsockname()[1]
+
+        resynced = asyncio.Event()
+
+        class Client(AsyncNGEWebsocket):
+            RECONNECT_DELAY_BASE = 0.01
+
+            def on_resync(self):
+                resynced.set()
+
+        client = Client(host="http://127.0.0.1:{}".format(port),
+                        symbol="XBTUSD")
+        await client.start()
+
+        for _ in range(100):
+            if client.is_stale:
+                break
+            await asyncio.sleep(0.005)
+
+        # old tables are still readable while resyncing
+        self.assertTrue(client.is_stale)
+        self.assertEqual(2.0, client.recent_trades()[-1]["price"])
+
+        await asyncio.wait_for(resynced.wait(), 5)
+
+        self.assertFalse(client.is_stale)
+        self.assertEqual(100.0, client.data["instrument"][0]["price"])
+        self.assertEqual(1, client.reconnect_metrics["reconnect"])
+        self.assertGreater(client.reconnect_metrics["recovery"],
+                           client.reconnect_metrics["downtime"])
+
+        await client.stop()
+
+    async def test_resync_from_thread(self):
+        commands = list()
+
+        async def record_commands(ws, *args):
+            await push_tables(ws, args[0] if args else ws.request.path)
+
+            async for message in ws:
+                commands.append(json.loads(message)["op"])
+
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = await websockets.serve(record_commands,
+                                             "127.0.0.1", 0)
+        port = list(self.server.sockets)[0].getsockname()[1]
+
+        client = AsyncNGEWebsocket(
+            host="http://127.0.0.1:{}".format(port), symbol="XBTUSD")
+        await client.start()
+
+        # as integrity checker does in its own thread
+        self.assertTrue(await asyncio.get_running_loop().run_in_executor(
+            None, client.resync_table, "orderBookL2"))
+
+        for _ in range(100):
+            if len(commands) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(["unsubscribe", "subscribe"], commands)
+        self.assertFalse(client._resubscribing)
+
+        await client.stop()
+
+    async def test_connect_failed(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+        client = AsyncNGEWebsocket(host=self.host, symbol="XBTUSD")
+
+        with self.assertRaises(OSError):
+            await client.start()
+
+        self.assertFalse(client.running)
@@ -0,0 +1,110 @@
+# coding: utf-8
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+import requests
+
+from .. import nge_rest
+from ..utils import generate_signature, Signer
+
+
+class SpecCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        patcher = mock.patch.multiple(
+            nge_rest, SPEC_CACHE_DIR=os.path.join(self.directory, "cache"),
+            _spec_cache=dict(), _client_cache=dict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_json_spec(self):
+        spec_file = os.path.join(self.directory, "nge.json")
+        with open(spec_file, "w") as f:
+            json.dump({"swagger": "2.0", "paths": {}}, f)
+
+        spec_dict, digest, validated = nge_rest.load_spec(spec_file)
+
+        self.assertEqual({"swagger": "2.0", "paths": {}}, spec_dict)
+        self.assertFalse(validated)
+
+        spec_dict["x-scope"] = ["http://127.0.0.1"]
+        nge_rest.save_spec_cache(digest)
+
+        # cached in memory
+        self.assertTrue(nge_rest.load_spec(spec_file)[2])
+
+        # cached on disk
+        nge_rest._spec_cache.clear()
+        spec_dict["paths"]["/order"] = {}
+        self.assertEqual(({"swagger": "2.0", "paths": {}}, digest, True),
+                         nge_rest.load_spec(spec_file))
+
+        # spec changed
+        with open(spec_file, "w") as f:
+            json.dump({"swagger": "2.0", "paths": {"/order": {}}}, f)
+
+        self.assertFalse(nge_rest.load_spec(spec_file)[2])
+
+    def test_shared_client(self):
+        client = nge_rest.api(host="http://127.0.0.1")
+
+        self.assertEqual(1, len(os.listdir(nge_rest.SPEC_CACHE_DIR)))
+        self.assertIs(client, nge_rest.api(host="http://127.0.0.1"))
+        self.assertIsNot(client, nge_rest.api(host="http://127.0.0.2"))
+
+        rebuilt = nge_rest.api(host="http://127.0.0.1", shared=False)
+
+        self.assertIsNot(client, rebuilt)
+        self.assertTrue(hasattr(rebuilt, "Order"))
+
+        # spec cached by other host
+        nge_rest._spec_cache.clear()
+        self.assertTrue(nge_rest.load_spec()[2])
+
+        client = nge_rest.api(host="http://127.0.0.3")
+        self.assertTrue(client.Order.Order_new)
+
+
+class AuthenticatorTest(unittest.TestCase):
+    def test_path_url(self):
+        for url, params in (
+                ("http://h/api/v1/order", None),
+                ("http://h", {"symbol": "XBTUSD"}),
+                ("http://h/api/v1/order?count=1",
+                 {"filter": '{"ordStatus": "New"}', "reverse": True}),
+                ("http://h/api/v1/user/a b", {"text": "测试 ~&=",
+                                              "columns": ["a", "b"]})):
+            req = requests.Request("GET", url, params=params or dict())
+
+            self.assertEqual(req.prepare().path_url,
+                             nge_rest.NGEAPIKeyAuthenticator.path_url(req))
+
+    def test_apply(self):
+        authenticator = nge_rest.NGEAPIKeyAuthenticator(
+            "http://h", "key", "secret")
+
+        req = authenticator.apply(requests.Request(
+            "POST", "http://h/api/v1/order",
+            data={"symbol": "XBTUSD", "price": 100.5}))
+        prepared = req.prepare()
+
+        self.assertEqual(b'{"symbol": "XBTUSD", "price": 100.5}',
+                         prepared.body)
+        self.assertEqual("application/json",
+                         prepared.headers["Content-Type"])
+        self.assertEqual(generate_signature(
+            "secret", "POST", prepared.path_url,
+            prepared.headers["api-expires"], prepared.body.decode("utf-8")),
+            prepared.headers["api-signature"])
+
+        self.assertEqual(
+            generate_signature("secret", "GET", "/api/v1/position?a=1",
+                               1, "{}"),
+            Signer("secret").sign("GET", "/api/v1/position?a=1", 1, "{}"))
@@ -0,0 +1,384 @@
+# coding: utf-8
+import json
+import unittest
+
+from collections import deque
+
+from ..nge_websocket import NGEWebsocket
+
+
+class TableStorageTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD",
+                               table_capacity={"trade": 5})
+
+    def _partial(self, table_name, data, keys=("id", )):
+        self.ws._partial_handler(table_name, {
+            "table": table_name, "action": "partial",
+            "keys": list(keys), "data": data})
+
+    def test_trade_ring_buffer(self):
+        self._partial("trade", [{"id": i, "price": i} for i in range(3)])
+
+        self.assertIsInstance(self.ws.data["trade"], deque)
+        self.assertEqual(5, self.ws.table_capacity("trade"))
+
+        for i in range(3, 20):
+            self.ws._insert_handler("trade", {"data": [{"id": i,
+                                                        "price": i}]})
+
+        self.assertEqual(5, len(self.ws.data["trade"]))
+        self.assertEqual([15, 16, 17, 18, 19],
+                         [t["id"] for t in self.ws.recent_trades()])
+        self.assertEqual([18, 19],
+                         [t["id"] for t in self.ws.recent_trades(2)])
+
+    def test_default_capacity(self):
+        self._partial("quote", [])
+
+        for i in range(NGEWebsocket.MAX_TABLE_LEN * 2):
+            self.ws._insert_handler("quote", {"data": [{"id": i}]})
+
+        self.assertEqual(NGEWebsocket.MAX_TABLE_LEN,
+                         len(self.ws.data["quote"]))
+
+    def test_unbounded_table(self):
+        self._partial("order", [], keys=("orderID", ))
+
+        self.assertIsNone(self.ws.table_capacity("order"))
+
+        for i in range(NGEWebsocket.MAX_TABLE_LEN * 2):
+            self.ws._insert_handler("order", {"data": [{"orderID": i}]})
+
+        self.assertEqual(NGEWebsocket.MAX_TABLE_LEN * 2,
+                         len(self.ws.data["order"]))
+
+
+class MultiSymbolTest(unittest.TestCase):
+    class FakeSocket(object):
+        def __init__(self):
+            self.sent = list()
+
+        def send(self, data):
+            self.sent.append(json.loads(data))
+
+    def setUp(self) -> None:
+        self.ws = NGEWebsocket(host="http://127.0.0.1",
+                               symbol=["XBTUSD", "ETHUSD"],
+                               api_key="key", api_secret="secret")
+        self.ws.ws = self.FakeSocket()
+
+    def test_url(self):
+        url = self.ws._get_url()
+
+        self.assertIn("orderBookL2:XBTUSD", url)
+        self.assertIn("orderBookL2:ETHUSD", url)
+        self.assertEqual(1, url.count("margin"))
+
+    def test_partition(self):
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["symbol", "id", "side"],
+            "data": [{"symbol": "XBTUSD", "id": 1, "side": "Buy",
+                      "size": 1},
+                     {"symbol": "ETHUSD", "id": 1, "side": "Buy",
+                      "size": 2}]})
+        self.ws._partial_handler("margin", {
+            "keys": ["account"], "data": [{"account": 1}]})
+
+        self.assertTrue(self.ws._is_received("orderBookL2", "ETHUSD"))
+        self.assertTrue(self.ws._is_received("margin", "ETHUSD"))
+
+        self.ws._update_handler("orderBookL2", {
+            "data": [{"symbol": "ETHUSD", "id": 1, "side": "Buy",
+                      "size": 3},
+                     {"symbol": "LTCUSD", "id": 1, "side": "Buy",
+                      "size": 3}]})
+
+        self.assertEqual(1, self.ws.market_depth()[0]["size"])
+        self.assertEqual(1, self.ws.data["orderBookL2"][0]["size"])
+        self.assertEqual(3, self.ws.market_depth("ETHUSD")[0]["size"])
+        self.assertEqual({"account": 1},
+                         self.ws.tables("ETHUSD")["margin"][0])
+
+    def test_empty_partial(self):
+        self.ws._partial_handler("trade", {
+            "keys": [], "filter": {"symbol": "ETHUSD"}, "data": []})
+
+        self.assertFalse(self.ws._is_received("trade", "XBTUSD"))
+        self.assertTrue(self.ws._is_received("trade", "ETHUSD"))
+
+        self.ws._partial_handler("position", {"keys": [], "data": []})
+
+        self.assertTrue(self.ws._is_received("position", "XBTUSD"))
+        self.assertTrue(self.ws._is_received("position", "ETHUSD"))
+
+    def test_partial_without_filter(self):
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["symbol", "id", "side"],
+            "filter": {"symbol": "XBTUSD"},
+            "data": [{"symbol": "XBTUSD", "id": 1, "side": "Buy",
+                      "size": 1}]})
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["symbol", "id", "side"],
+            "data": [{"symbol": "ETHUSD", "id": 1, "side": "Buy",
+                      "size": 2}]})
+
+        # only symbols of rows are replaced
+        self.assertEqual(1, self.ws.market_depth("XBTUSD")[0]["size"])
+        self.assertEqual(2, self.ws.market_depth("ETHUSD")[0]["size"])
+
+        # tables subscribed without symbol cover all symbols
+        self.ws._partial_handler("position", {
+            "keys": ["symbol"], "data": [{"symbol": "XBTUSD"}]})
+
+        self.assertTrue(self.ws._is_received("position", "ETHUSD"))
+        self.assertEqual([], list(self.ws.tables("ETHUSD")["position"]))
+
+    def test_row_without_symbol(self):
+        self.ws._partial_handler("execution", {
+            "keys": ["execID"], "data": [{"execID": 1},
+                                         {"execID": 2, "symbol": "ETHUSD"}]})
+
+        # routed to primary symbol, same as single symbol subscribed
+        self.assertEqual([{"execID": 1}],
+                         list(self.ws.tables("XBTUSD")["execution"]))
+        self.assertNotIn("execution", self.ws._generic)
+
+    def test_subscribe(self):
+        partitions = self.ws._partitions
+
+        self.ws.subscribe("LTCUSD", wait=False)
+
+        # partitions iterated by feed thread are not modified in place
+        self.assertEqual(["XBTUSD", "ETHUSD"], list(partitions))
+        self.assertIn("LTCUSD", self.ws._published[1])
+
+        self.assertEqual(["XBTUSD", "ETHUSD", "LTCUSD"], self.ws.symbols)
+        self.assertEqual("subscribe", self.ws.ws.sent[-1]["op"])
+        self.assertIn("trade:LTCUSD", self.ws.ws.sent[-1]["args"])
+
+        self.ws.unsubscribe("ETHUSD")
+
+        self.assertEqual("unsubscribe", self.ws.ws.sent[-1]["op"])
+        self.assertNotIn("ETHUSD", self.ws.symbols)
+        with self.assertRaises(KeyError):
+            self.ws.tables("ETHUSD")
+
+        with self.assertRaises(ValueError):
+            self.ws.unsubscribe("XBTUSD")
+
+
+class ResyncTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.resynced = list()
+
+        class Client(NGEWebsocket):
+            def on_resync(this):
+                self.resynced.append(this.data["trade"][-1])
+
+        self.ws = Client(host="http://127.0.0.1", symbol="XBTUSD")
+        self.ws._get_url()
+
+        for table_name in ("instrument", "orderBookL2", "trade"):
+            self._partial(table_name, [{"id": 1, "price": 1}])
+
+    def _partial(self, table_name, data):
+        self.ws._partial_handler(table_name, {
+            "keys": ["id"], "data": data})
+
+    def test_stale_until_resynced(self):
+        self.ws._record_disconnected()
+
+        self.assertTrue(self.ws.is_stale)
+        self.assertEqual(1, self.ws.reconnect_metrics["reconnect"])
+
+        self._partial("trade", [{"id": 2, "price": 2}])
+        # insert before partial of table is dropped
+        self.ws._insert_handler("instrument", {"data": [{"id": 3}]})
+        self._partial("instrument", [{"id": 2, "price": 2}])
+
+        self.assertTrue(self.ws.is_stale)
+        self.assertEqual(1, self.ws.recent_trades()[-1]["price"])
+        self.assertEqual(1, len(self.ws.data["instrument"]))
+
+        self._partial("orderBookL2", [{"id": 2, "price": 2}])
+
+        self.assertFalse(self.ws.is_stale)
+        self.assertEqual(2, self.ws.recent_trades()[-1]["price"])
+        self.assertEqual([{"id": 2, "price": 2}], self.resynced)
+        self.assertGreater(self.ws.reconnect_metrics["recovery"], 0)
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD",
+                               copy_on_write=True)
+
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["id"], "data": [{"id": 1, "size": 1},
+                                     {"id": 2, "size": 2}]})
+
+    def test_snapshot_isolated(self):
+        snapshot = self.ws.snapshot()
+        book = snapshot.tables["orderBookL2"]
+
+        self.ws._update_handler("orderBookL2", {
+            "data": [{"id": 1, "size": 10}]})
+        self.ws._insert_handler("orderBookL2", {
+            "data": [{"id": 3, "size": 3}]})
+        self.ws._delete_handler("orderBookL2", {"data": [{"id": 2}]})
+
+        self.assertEqual([{"id": 1, "size": 1}, {"id": 2, "size": 2}],
+                         list(book))
+
+        latest = self.ws.snapshot()
+        self.assertEqual(snapshot.version + 3, latest.version)
+        self.assertEqual([{"id": 1, "size": 10}, {"id": 3, "size": 3}],
+                         list(latest.tables["orderBookL2"]))
+
+        with self.assertRaises(TypeError):
+            latest.tables["orderBookL2"] = []
+
+    def test_lazy_copy(self):
+        book = self.ws.data["orderBookL2"]
+
+        # not exposed by snapshot, modified in place
+        self.ws._insert_handler("orderBookL2", {
+            "data": [{"id": 3, "size": 3}]})
+        self.assertIs(book, self.ws.data["orderBookL2"])
+
+        self.ws.snapshot()
+
+        self.ws._insert_handler("orderBookL2", {
+            "data": [{"id": 4, "size": 4}]})
+        copied = self.ws.data["orderBookL2"]
+        self.assertIsNot(book, copied)
+        self.assertEqual(3, len(book))
+
+        # copied only once for each snapshot
+        self.ws._insert_handler("orderBookL2", {
+            "data": [{"id": 5, "size": 5}]})
+        self.assertIs(copied, self.ws.data["orderBookL2"])
+
+    def test_disabled(self):
+        ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD")
+        ws._partial_handler("trade", {"keys": [], "data": [{"id": 1}]})
+
+        snapshot = ws.snapshot()
+
+        self.assertIsNone(snapshot.version)
+        self.assertIs(ws.data["trade"], snapshot.tables["trade"])
+
+
+class LatencyTest(unittest.TestCase):
+    def test_frame_latency(self):
+        ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD",
+                          latency_metrics=True)
+
+        ws._on_frame(json.dumps({
+            "table": "trade", "action": "partial", "keys": [],
+            "data": [{"symbol": "XBTUSD", "price": 1,
+                      "timestamp": "2019-08-01T04:00:00.000Z"}]}))
+        ws._on_frame(json.dumps({"subscribe": "trade:XBTUSD",
+                                 "success": True}))
+
+        summary = ws.latency_summary()
+
+        self.assertEqual(["decode", "apply", "dispatch", "total",
+                          "lag.trade"], list(summary))
+        self.assertEqual(1, summary["total"]["count"])
+        self.assertGreaterEqual(summary["total"]["max"],
+                                summary["apply"]["max"])
+        # lag since 2019 is longer than a year
+        self.assertGreater(summary["lag.trade"]["min"],
+                           365 * 86400 * 10 ** 9)
+
+        disabled = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD")
+        self.assertEqual(dict(), disabled.latency_summary())
+
+    def test_sample(self):
+        ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD",
+                          latency_metrics=True, latency_sample=10)
+
+        for _ in range(25):
+            ws._on_frame(json.dumps({
+                "table": "trade", "action": "partial", "keys": [],
+                "data": []}))
+
+        # 1st, 11th & 21st
+        self.assertEqual(3, ws.latency_summary()["total"]["count"])
+
+
+class IntegrityTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ws = NGEWebsocket(host="http://127.0.0.1", symbol="XBTUSD")
+        self.ws.ws = MultiSymbolTest.FakeSocket()
+
+        self.book = [
+            {"symbol": "XBTUSD", "id": 1, "side": "Sell", "price": 101.0,
+             "size": 1},
+            {"symbol": "XBTUSD", "id": 2, "side": "Buy", "price": 100.0,
+             "size": 2}]
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["symbol", "id", "side"], "data": list(self.book)})
+
+    def test_unknown_row(self):
+        self.ws._update_handler("orderBookL2", {"data": [
+            {"symbol": "XBTUSD", "id": 3, "side": "Buy", "size": 5},
+            {"symbol": "XBTUSD", "id": 2, "side": "Buy", "size": 5}]})
+        self.ws._delete_handler("orderBookL2", {"data": [
+            {"symbol": "XBTUSD", "id": 4, "side": "Buy"}]})
+
+        # later rows are still applied
+        self.assertEqual(5, self.ws.market_depth()[1]["size"])
+        self.assertEqual(2, self.ws.integrity_metrics["unknown.orderBookL2"])
+        # resync only once before partial received
+        self.assertEqual(1, self.ws.integrity_metrics["resync"])
+        self.assertEqual(
+            [("unsubscribe", ["orderBookL2:XBTUSD"]),
+             ("subscribe", ["orderBookL2:XBTUSD"])],
+            [(cmd["op"], cmd["args"]) for cmd in self.ws.ws.sent])
+
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["symbol", "id", "side"],
+            "filter": {"symbol": "XBTUSD"}, "data": list(self.book)})
+
+        self.assertEqual(1, self.ws.integrity_metrics["resynced"])
+        self.assertTrue(self.ws.resync_table("orderBookL2"))
+
+    def test_resync_timeout(self):
+        self.assertTrue(self.ws.resync_table("orderBookL2"))
+        self.assertFalse(self.ws.resync_table("orderBookL2"))
+
+        # partial never received
+        self.ws.PARTIAL_TIMEOUT = 0
+
+        self.assertTrue(self.ws.resync_table("orderBookL2"))
+        self.assertEqual(2, self.ws.integrity_metrics["resync"])
+        self.assertEqual(1, self.ws.integrity_metrics["resync_timeout"])
+
+    def test_checker(self):
+        from ..book_integrity import BookIntegrityChecker
+
+        remote = list(self.book)
+
+        checker = BookIntegrityChecker(self.ws, lambda s, d: remote,
+                                       interval=0)
+        checker.RECHECK_DELAY = 0
+
+        self.assertTrue(checker.check())
+
+        remote[1] = dict(remote[1], size=3)
+        self.assertFalse(checker.check())
+        self.assertEqual(2, self.ws.integrity_metrics["mismatch"])
+        self.assertEqual(1, self.ws.integrity_metrics["resync"])
+
+        self.ws._partial_handler("orderBookL2", {
+            "keys": ["symbol", "id", "side"], "data": list(self.book)})
+        self.ws._update_handler("orderBookL2", {"data": [
+            {"symbol": "XBTUSD", "id": 2, "side": "Buy", "price": 102.0}]})
+
+        self.assertTrue(self.ws.is_crossed())
+        self.assertFalse(checker.check())
+        self.assertEqual(1, self.ws.integrity_metrics["crossed"])
+        self.assertEqual(2, self.ws.integrity_metrics["resync"])
@@ -0,0 +1,141 @@
+# coding: utf-8
+import json
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import requests
+
+from trade.order_latency import OrderLatencyTracker
+
+from ..nge_rest import api
+from ..order_entry import OrderEntryClient
+from ..utils import generate_signature
+
+
+API_KEY = "key"
+API_SECRET = "secret"
+
+
+class OrderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        body = self.rfile.read(
+            int(self.headers.get("Content-Length", 0))).decode("utf-8")
+
+        signature = generate_signature(
+            API_SECRET, self.command, self.path,
+            self.headers["api-expires"], body)
+
+        if (self.headers["api-key"] != API_KEY or
+                self.headers["api-signature"] != signature):
+            status, result = 401, {"error": "invalid signature"}
+        else:
+            status, result = 200, json.loads(body)
+
+            self.server.received.append((self.command, self.path, result))
+
+            # echo request, orders list for bulk & cancel
+            if self.command == "DELETE" or self.path.endswith("/bulk"):
+                result = [result]
+
+        content = json.dumps(result).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_POST = do_PUT = do_DELETE = _handle
+
+
+class OrderEntryClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), OrderHandler)
+        self.server.daemon_threads = True
+        self.server.received = list()
+
+        thread = Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+
+        self.client = OrderEntryClient(self.url, API_KEY, API_SECRET)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_same_as_swagger(self):
+        swagger = api(host=self.url, api_key=API_KEY, api_secret=API_SECRET)
+
+        order = dict(symbol="XBTUSD", side="Buy", orderQty=10,
+                     price=100.5, clOrdID="abc")
+        orders = [dict(order, clOrdID="1"), dict(order, clOrdID="2")]
+
+        calls = (
+            (swagger.Order.Order_new(**order).result,
+             lambda: self.client.new(**order)),
+            (swagger.Order.Order_amend(orderID="1", price=101.0).result,
+             lambda: self.client.amend(orderID="1", price=101.0)),
+            (swagger.Order.Order_cancel(orderID=["1", "2"]).result,
+             lambda: self.client.cancel(orderID=["1", "2"])),
+            (swagger.Order.Order_newBulk(orders=orders).result,
+             lambda: self.client.new_bulk(orders)),
+            (swagger.Order.Order_amendBulk(orders=orders).result,
+             lambda: self.client.amend_bulk(orders))
+        )
+
+        for swagger_call, direct_call in calls:
+            self.assertEqual(swagger_call()[0], direct_call()[0])
+
+        self.assertEqual(2 * len(calls), len(self.server.received))
+
+        for i in range(0, len(self.server.received), 2):
+            self.assertEqual(self.server.received[i],
+                             self.server.received[i + 1])
+
+    def test_error(self):
+        client = OrderEntryClient(self.url, API_KEY, "wrong")
+
+        with self.assertRaises(requests.HTTPError) as ctx:
+            client.cancel_all(symbol="XBTUSD")
+
+        self.assertEqual(401, ctx.exception.response.status_code)
+
+        with self.assertRaises(ValueError):
+            OrderEntryClient(self.url, API_KEY, None)
+
+    def test_tracker(self):
+        tracker = OrderLatencyTracker()
+        client = OrderEntryClient(self.url, API_KEY, API_SECRET,
+                                  tracker=tracker)
+
+        client.new(symbol="XBTUSD", side="Buy", orderQty=10, price=100.5,
+                   clOrdID="c1")
+        self.assertEqual(1, tracker.pending())
+        tracker.on_event({"orderID": "o1", "clOrdID": "c1"})
+
+        client.cancel(orderID="o1")
+        self.assertEqual(1, tracker.pending())
+        tracker.on_event({"orderID": "o1"})
+
+        self.assertEqual(0, tracker.pending())
+        self.assertIsNotNone(tracker.percentile("new", 50, "rest"))
+        self.assertIsNotNone(tracker.percentile("cancel", 50, "ws"))
+
+        wrong = OrderEntryClient(self.url, API_KEY, "wrong",
+                                 tracker=tracker)
+
+        with self.assertRaises(requests.HTTPError):
+            wrong.amend(orderID="o1", price=101.0)
+
+        self.assertEqual(0, tracker.pending())
+        self.assertEqual(1, tracker.summary()["failed"])
@@ -0,0 +1,136 @@
+# coding: utf-8
+import asyncio
+import time
+import unittest
+
+from threading import Thread
+
+from ..rate_limit import (RateLimiter, request_priority, PRIORITY_CANCEL,
+                          PRIORITY_ORDER, PRIORITY_QUERY)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_request_priority(self):
+        self.assertEqual(PRIORITY_CANCEL,
+                         request_priority("DELETE", "/api/v1/order"))
+        self.assertEqual(PRIORITY_CANCEL,
+                         request_priority("delete", "/api/v1/order/all"))
+        self.assertEqual(PRIORITY_CANCEL, request_priority(
+            "POST", "/api/v1/order/cancelAllAfter"))
+        self.assertEqual(PRIORITY_ORDER,
+                         request_priority("PUT", "/api/v1/order/bulk"))
+        self.assertEqual(PRIORITY_QUERY,
+                         request_priority("GET", "/api/v1/order?count=1"))
+        self.assertEqual(PRIORITY_QUERY,
+                         request_priority("POST", "/api/v1/position/leverage"))
+
+    def test_unknown_limit(self):
+        limiter = RateLimiter()
+
+        for _ in range(100):
+            self.assertTrue(limiter.acquire(timeout=0))
+
+        self.assertIsNone(limiter.budget().tokens)
+
+    def test_headers(self):
+        limiter = RateLimiter()
+
+        limiter.update(200, {"x-ratelimit-limit": "60",
+                             "x-ratelimit-remaining": "5"})
+
+        budget = limiter.budget()
+        self.assertEqual((60, 60, 1), (budget.limit, budget.capacity,
+                                       budget.rate))
+        self.assertAlmostEqual(5, budget.tokens, places=1)
+
+        # 20% of capacity reserved for orders & cancels
+        self.assertFalse(limiter.acquire(PRIORITY_QUERY, timeout=0))
+        # 10% of capacity reserved for cancels
+        self.assertFalse(limiter.acquire(PRIORITY_ORDER, timeout=0))
+
+        for _ in range(4):
+            self.assertTrue(limiter.acquire(PRIORITY_CANCEL, timeout=0))
+
+        self.assertLess(limiter.budget().tokens, 1.1)
+
+    def test_throttled(self):
+        limiter = RateLimiter(limit=600)
+
+        limiter.update(429, {"retry-after": "0.2"})
+
+        budget = limiter.budget()
+        self.assertEqual(1, limiter.throttled)
+        self.assertGreater(budget.blocked, 0.1)
+
+        start = time.monotonic()
+        self.assertTrue(limiter.acquire(PRIORITY_CANCEL))
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_exhausted(self):
+        limiter = RateLimiter(limit=600)
+
+        limiter.update(200, {"x-ratelimit-remaining": "0",
+                             "x-ratelimit-reset": str(time.time() + 0.2)})
+
+        self.assertFalse(limiter.acquire(PRIORITY_CANCEL, timeout=0.1))
+        self.assertTrue(limiter.acquire(PRIORITY_CANCEL, timeout=0.5))
+
+    def test_max_wait(self):
+        limiter = RateLimiter(limit=600)
+
+        limiter.update(200, {"x-ratelimit-remaining": "0",
+                             "x-ratelimit-reset": str(time.time() + 0.2)})
+
+        # new orders fail fast, cancels wait in drained bucket
+        self.assertEqual(0, limiter.max_wait(PRIORITY_ORDER))
+        self.assertFalse(limiter.acquire(
+            PRIORITY_ORDER, limiter.max_wait(PRIORITY_ORDER)))
+        self.assertTrue(limiter.acquire(
+            PRIORITY_CANCEL, limiter.max_wait(PRIORITY_CANCEL)))
+
+    def test_cancel_first(self):
+        # 100 requests per second
+        limiter = RateLimiter(limit=60, window=0.6)
+        limiter.update(200, {"x-ratelimit-remaining": "0"})
+
+        acquired = list()
+
+        def acquire(priority):
+            limiter.acquire(priority)
+            acquired.append(priority)
+
+        threads = [Thread(target=acquire, args=(priority,))
+                   for priority in (PRIORITY_QUERY, PRIORITY_ORDER,
+                                    PRIORITY_CANCEL)]
+
+        for thread in threads:
+            thread.start()
+            time.sleep(0.001)
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([PRIORITY_CANCEL, PRIORITY_ORDER, PRIORITY_QUERY],
+                         acquired)
+
+    def test_burst(self):
+        limiter = RateLimiter(limit=60, burst=2, window=0.6)
+
+        start = time.monotonic()
+        for _ in range(10):
+            limiter.acquire(PRIORITY_CANCEL)
+
+        # 2 bursted and 8 paced at 100 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.07)
+
+    def test_acquire_async(self):
+        limiter = RateLimiter(limit=60, window=0.6)
+        limiter.update(200, {"x-ratelimit-remaining": "0"})
+
+        async def acquire():
+            return await asyncio.gather(
+                limiter.acquire_async(PRIORITY_CANCEL),
+                limiter.acquire_async(PRIORITY_QUERY, timeout=0.01))
+
+        self.assertEqual([True, False], asyncio.run(acquire()))
+        self.assertEqual((0, 0, 0), limiter.budget().waiting)
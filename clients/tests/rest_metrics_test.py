@@ -0,0 +1,54 @@
+# coding: utf-8
+import time
+import unittest
+
+from ..rest_metrics import RESTMetrics, operation_name
+
+
+class RESTMetricsTest(unittest.TestCase):
+    def test_operation_name(self):
+        self.assertEqual("GET /api/v1/position",
+                         operation_name("get", "/api/v1/position?count=1"))
+        self.assertEqual("POST /api/v1/order", operation_name(
+            "POST", "https://www.btcmex.com/api/v1/order"))
+        self.assertEqual("GET /", operation_name("GET", "http://h"))
+
+    def test_record(self):
+        metrics = RESTMetrics()
+
+        start = metrics.begin()
+        self.assertEqual(1, metrics.in_flight)
+
+        second = metrics.begin()
+        time.sleep(0.01)
+
+        metrics.end("GET /a", start, status=200, first_byte=5000000,
+                    connect=1000000)
+        metrics.end("GET /a", second, status=503)
+
+        failed = metrics.begin()
+        metrics.end("POST /b", failed)
+
+        self.assertEqual(0, metrics.in_flight)
+        self.assertEqual(2, metrics.peak_in_flight)
+
+        self.assertEqual(0.5, metrics.error_rate("GET /a"))
+        self.assertAlmostEqual(2 / 3, metrics.error_rate())
+        self.assertEqual(0.0, metrics.error_rate("GET /c"))
+
+        self.assertGreaterEqual(metrics.percentile("GET /a", 50), 10000000)
+        self.assertEqual(1000000, metrics.percentile(
+            "GET /a", 99, phase="connect") // 1000 * 1000)
+        self.assertIsNone(metrics.percentile("POST /b", 50, "first_byte"))
+
+        summary = metrics.summary(reset=True)
+
+        self.assertEqual(["GET /a", "POST /b", "in_flight",
+                          "peak_in_flight"], list(summary.keys()))
+        self.assertEqual({200: 1, 503: 1}, summary["GET /a"]["statuses"])
+        self.assertEqual(1, summary["GET /a"]["first_byte"]["count"])
+        self.assertNotIn("connect", summary["POST /b"])
+
+        self.assertEqual(["in_flight", "peak_in_flight"],
+                         list(metrics.summary().keys()))
+        self.assertEqual(0, metrics.peak_in_flight)
@@ -0,0 +1,57 @@
+# coding: utf-8
+import unittest
+
+from unittest import mock
+
+import numpy as np
+
+from .. import trade_tape
+from ..trade_tape import TradeTape, timestamp_ns
+
+
+class TradeTapeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tape = TradeTape(capacity=4)
+
+    @staticmethod
+    def _trade(idx):
+        return {"timestamp": 1000 * idx, "price": float(idx),
+                "size": idx, "side": "Buy" if idx % 2 else "Sell"}
+
+    def test_timestamp(self):
+        self.assertEqual(1000000, timestamp_ns(1))
+        self.assertEqual(timestamp_ns(1564632000123),
+                         timestamp_ns("2019-08-01T04:00:00.123Z"))
+
+    def test_without_numpy(self):
+        with mock.patch.object(trade_tape, "np", None):
+            self.assertEqual(1564632000123000000, timestamp_ns(
+                "2019-08-01T04:00:00.123+00:00"))
+
+            with self.assertRaises(ImportError):
+                TradeTape()
+
+    def test_wrap_around(self):
+        self.tape.extend(self._trade(i) for i in range(1, 7))
+
+        self.assertEqual(4, len(self.tape))
+
+        trades = self.tape.last()
+        np.testing.assert_array_equal([3., 4., 5., 6.], trades.price)
+        np.testing.assert_array_equal([1, -1, 1, -1], trades.side)
+
+        trades = self.tape.last(2)
+        np.testing.assert_array_equal([5, 6], trades.size)
+
+        with self.assertRaises(ValueError):
+            trades.price[0] = 0
+
+    def test_since(self):
+        self.assertEqual(0, len(self.tape.since(1).price))
+
+        self.tape.extend(self._trade(i) for i in range(1, 5))
+
+        np.testing.assert_array_equal([3., 4.],
+                                      self.tape.since(1).price)
+        np.testing.assert_array_equal(
+            [1., 2.], self.tape.since(1, now_ns=timestamp_ns(2000)).price)
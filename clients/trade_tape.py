@@ -0,0 +1,177 @@
+# coding: utf-8
+from collections import namedtuple
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+SIDE_MAP = {
+    "Buy": 1,
+    "Sell": -1
+}
+
+
+TapeSlice = namedtuple("TapeSlice", ("timestamp", "price", "size", "side"))
+
+
+# (seconds prefix, epoch seconds) of last parsed ISO8601 timestamp
+_last_second = ("", 0)
+
+
+def timestamp_ns(value):
+    """
+    Convert trade timestamp to epoch nanoseconds.
+
+    ISO8601 string in "YYYY-MM-DDTHH:MM:SS[.fff]Z" format is sliced, and
+    seconds part is parsed once per second, others are parsed by numpy,
+    or by datetime if numpy is not installed.
+    :param value: epoch milliseconds or ISO8601 string in UTC
+    :return:
+    """
+    global _last_second
+
+    if isinstance(value, (int, float)):
+        return int(value * 1000000)
+
+    if value[-1:] == "Z" and value[19:20] in (".", "Z"):
+        prefix = value[:19]
+        # single reference is replaced atomically
+        last = _last_second
+
+        try:
+            if last[0] == prefix:
+                seconds = last[1]
+            else:
+                seconds = int(datetime.fromisoformat(prefix).replace(
+                    tzinfo=timezone.utc).timestamp())
+                _last_second = (prefix, seconds)
+
+            digits = value[20:-1]
+
+            return seconds * 1000000000 + (
+                int(digits[:9].ljust(9, "0")) if digits else 0)
+        except ValueError:
+            pass
+
+    if np is None:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+
+        return (int(parsed.timestamp()) * 1000000000 +
+                parsed.microsecond * 1000)
+
+    return int(np.datetime64(value.rstrip("Z"), "ns").astype(np.int64))
+
+
+class TradeTape(object):
+    """
+    Columnar trade store with fixed capacity.
+
+    Every column is allocated with 2 * capacity and each row is written
+    twice (at idx and idx + capacity), so the latest N rows are always
+    contiguous and can be returned as zero-copy views.
+    Views are only valid until another capacity rows arrived,
+    copy them if kept longer.
+    Requires numpy, which is an optional dependency.
+    """
+
+    DEFAULT_CAPACITY = 100000
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if np is None:
+            raise ImportError("numpy is required by TradeTape.")
+
+        if capacity <= 0:
+            raise ValueError("invalid capacity: {}".format(capacity))
+
+        self._capacity = capacity
+
+        self._timestamp = np.zeros(capacity * 2, dtype=np.int64)
+        self._price = np.zeros(capacity * 2, dtype=np.float64)
+        self._size = np.zeros(capacity * 2, dtype=np.int64)
+        self._side = np.zeros(capacity * 2, dtype=np.int8)
+
+        self._head = 0
+        self._count = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def append(self, trade: dict):
+        head = self._head
+        tail = head + self._capacity
+
+        self._timestamp[head] = self._timestamp[tail] = timestamp_ns(
+            trade["timestamp"])
+        self._price[head] = self._price[tail] = trade["price"]
+        self._size[head] = self._size[tail] = trade["size"]
+        self._side[head] = self._side[tail] = SIDE_MAP.get(
+            trade.get("side"), 0)
+
+        self._head = (head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def extend(self, trades):
+        for trade in trades:
+            self.append(trade)
+
+    def _view(self, count):
+        end = self._head + self._capacity
+        start = end - count
+
+        columns = list()
+
+        for column in (self._timestamp, self._price, self._size, self._side):
+            view = column[start:end]
+            view.flags.writeable = False
+            columns.append(view)
+
+        return TapeSlice(*columns)
+
+    def last(self, count=0):
+        """
+        Get latest trades in columnar view.
+        :param count: trade count, all trades in tape if not specified
+        :return: TapeSlice with zero-copy column arrays
+        """
+        if not count or count > self._count:
+            count = self._count
+
+        return self._view(count)
+
+    def since(self, seconds, now_ns=None):
+        """
+        Get trades happened in latest seconds.
+        :param seconds: time window in seconds
+        :param now_ns: window end timestamp in ns, latest trade's
+        timestamp if not specified
+        :return: TapeSlice with zero-copy column arrays
+        """
+        trades = self._view(self._count)
+
+        if not self._count:
+            return trades
+
+        if now_ns is None:
+            now_ns = trades.timestamp[-1]
+
+        start = np.searchsorted(trades.timestamp,
+                                now_ns - int(seconds * 1000000000),
+                                side="left")
+        end = np.searchsorted(trades.timestamp, now_ns, side="right")
+
+        return TapeSlice(*(column[start:end] for column in trades))
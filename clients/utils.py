@@ -2,12 +2,15 @@
 
 import hmac
 import hashlib
+import random
 import requests
 import urllib
 
 from time import time
 from functools import wraps
 
+from clients.http_session import shared_session
+
 
 def generate_nonce(expire=5):
     return int(round(time()) + expire)
@@ -29,6 +32,49 @@ def generate_signature(secret, verb, url, nonce, data):
                          digestmod=hashlib.sha256).hexdigest()
     return signature
 
+
+class Signer(object):
+    """
+    Request signer compatible with generate_signature().
+
+    HMAC keyed by secret is created once and copied for each request,
+    path & body are expected already known, so neither url parsing nor
+    body serializing is needed.
+    """
+
+    def __init__(self, secret):
+        self._hmac = hmac.new(secret.encode('utf-8'),
+                              digestmod=hashlib.sha256)
+
+    def sign(self, verb, path, nonce, body=b""):
+        """
+        :param verb: http method
+        :param path: request path with query string
+        :param nonce: expires timestamp
+        :param body: request body in bytes or str
+        :return: signature hex string
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        mac = self._hmac.copy()
+        mac.update((verb + path + str(nonce)).encode('utf-8'))
+        mac.update(body)
+
+        return mac.hexdigest()
+
+
+def backoff_delay(attempt, base=0.5, cap=30):
+    """
+    Exponential backoff delay with full jitter.
+    :param attempt: retry attempt count start from 0
+    :param base: base delay in seconds
+    :param cap: max delay in seconds
+    :return: delay in seconds
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
 def validate_price(price):
     return price != 0
 
@@ -39,7 +85,7 @@ def validate_volume(volume):
 
 def http_request(uri, method="POST", session=None, **kwargs):
     if not session:
-        session = requests.Session()
+        session = shared_session()
 
     response = getattr(session, method.lower())(
         uri, **kwargs)
@@ -0,0 +1,120 @@
+# coding: utf-8
+"""Wall clock & virtual clock for replaying.
+"""
+import logging
+import time
+
+from threading import Condition, current_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+class WallClock(object):
+    @staticmethod
+    def time():
+        return time.time()
+
+    @staticmethod
+    def sleep(seconds):
+        time.sleep(seconds)
+
+
+WALL_CLOCK = WallClock()
+
+
+class VirtualClock(object):
+    """
+    Clock driven by replayed timestamps instead of wall time.
+
+    sleep() blocks until clock is advanced past its deadline.
+    advance() steps through due deadlines in order, and waits for woken
+    sleepers to sleep again or exit before going on, so timer threads
+    see every deadline and run in lockstep with the driving thread.
+    """
+
+    # max seconds waiting for a woken sleeper in advance()
+    HANDSHAKE_TIMEOUT = 1
+
+    def __init__(self, start=0.0):
+        self._now = start
+
+        self._condition = Condition()
+        # thread -> deadline
+        self._deadlines = dict()
+        # threads woken by advance() and not sleeping again
+        self._woken = set()
+        self._stopped = False
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        thread = current_thread()
+
+        with self._condition:
+            self._woken.discard(thread)
+
+            if self._stopped:
+                return
+
+            deadline = self._now + max(seconds, 0)
+            self._deadlines[thread] = deadline
+            self._condition.notify_all()
+
+            self._condition.wait_for(
+                lambda: self._now >= deadline or self._stopped)
+
+            self._deadlines.pop(thread, None)
+            self._woken.add(thread)
+            self._condition.notify_all()
+
+    def advance(self, ts):
+        """
+        Advance clock to ts, clock never goes backward.
+        :param ts: epoch seconds
+        :return:
+        """
+        with self._condition:
+            while not self._stopped:
+                due = [deadline for deadline in self._deadlines.values()
+                       if deadline <= ts]
+
+                if not due:
+                    break
+
+                self._now = max(self._now, min(due))
+                self._condition.notify_all()
+
+                self.__wait_woken()
+
+            self._now = max(self._now, ts)
+
+    def __wait_woken(self):
+        def is_pending():
+            return any(deadline <= self._now
+                       for deadline in self._deadlines.values()) or any(
+                thread.is_alive() for thread in self._woken)
+
+        timeout = time.monotonic() + self.HANDSHAKE_TIMEOUT
+
+        while is_pending():
+            remaining = timeout - time.monotonic()
+
+            if remaining <= 0:
+                logger.warning("sleepers not responding at {}: {}".format(
+                    self._now, [t.name for t in self._woken]))
+                self._woken.clear()
+                return
+
+            # sleeper may exit without notifying
+            self._condition.wait(min(remaining, 0.01))
+
+    def stop(self):
+        """
+        Wake up all sleepers, later sleep() returns immediately.
+        :return:
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
@@ -0,0 +1,206 @@
+# coding: utf-8
+"""Latency metrics.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+
+class LatencyHistogram(object):
+    """
+    HDR style histogram of non-negative integer values.
+
+    Values below 2 ** SUB_BUCKET_BITS are counted exactly, larger values
+    are counted in log-linear buckets with relative error less than
+    1 / 2 ** (SUB_BUCKET_BITS - 1), so recording is O(1) and memory is
+    bounded by the value range instead of sample count.
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self._sub_bits = sub_bucket_bits
+        self._sub_count = 1 << sub_bucket_bits
+        self._half_count = self._sub_count >> 1
+
+        self._counts = [0] * self._sub_count
+
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self._sub_count:
+            return value
+
+        shift = value.bit_length() - self._sub_bits
+
+        return (self._sub_count + (shift - 1) * self._half_count +
+                (value >> shift) - self._half_count)
+
+    def _lowest_value(self, index):
+        if index < self._sub_count:
+            return index
+
+        shift, sub = divmod(index - self._sub_count, self._half_count)
+        shift += 1
+
+        return (sub + self._half_count) << shift
+
+    def _highest_value(self, index):
+        return self._lowest_value(index + 1) - 1
+
+    def record(self, value):
+        """
+        Record one value, negative value is counted as 0.
+        :param value: int
+        :return:
+        """
+        value = max(int(value), 0)
+
+        idx = self._index(value)
+
+        if idx >= len(self._counts):
+            self._counts.extend([0] * (idx + 1 - len(self._counts)))
+
+        self._counts[idx] += 1
+
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """
+        Get value at percentile.
+        :param percent: 0 ~ 100
+        :return: highest equivalent value of bucket, None if empty
+        """
+        if not self.count:
+            return None
+
+        threshold = max(1, self.count * percent / 100)
+
+        accumulated = 0
+
+        for idx, count in enumerate(self._counts):
+            accumulated += count
+
+            if accumulated >= threshold:
+                return min(self._highest_value(idx), self.max)
+
+        return self.max
+
+    def merge(self, other):
+        """
+        Add other histogram's values.
+        :param other: LatencyHistogram with same sub bucket bits
+        :return:
+        """
+        if other._sub_bits != self._sub_bits:
+            raise ValueError("sub bucket bits mismatch.")
+
+        if len(other._counts) > len(self._counts):
+            self._counts.extend(
+                [0] * (len(other._counts) - len(self._counts)))
+
+        for idx, count in enumerate(other._counts):
+            self._counts[idx] += count
+
+        self.count += other.count
+        self.total += other.total
+
+        for value in (other.min, other.max):
+            if value is None:
+                continue
+
+            if self.min is None or value < self.min:
+                self.min = value
+
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def reset(self):
+        self._counts = [0] * self._sub_count
+
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def summary(self, percentiles=PERCENTILES):
+        """
+        Get summary of histogram.
+        :param percentiles:
+        :return: dict of count, min, max, mean and "p<percentile>"
+        """
+        result = OrderedDict((("count", self.count), ("min", self.min),
+                              ("max", self.max), ("mean", self.mean)))
+
+        for percent in percentiles:
+            result["p{:g}".format(percent)] = self.percentile(percent)
+
+        return result
+
+
+class LatencyRecorder(object):
+    """
+    Named latency histograms.
+    """
+
+    def __init__(self, sub_bucket_bits=LatencyHistogram.SUB_BUCKET_BITS):
+        self._sub_bits = sub_bucket_bits
+
+        self._histograms = OrderedDict()
+        self._lock = Lock()
+
+    def histogram(self, name):
+        """
+        Get or create histogram.
+        :param name:
+        :return: LatencyHistogram
+        """
+        try:
+            return self._histograms[name]
+        except KeyError:
+            with self._lock:
+                return self._histograms.setdefault(
+                    name, LatencyHistogram(self._sub_bits))
+
+    def record(self, name, value):
+        self.histogram(name).record(value)
+
+    def names(self):
+        return list(self._histograms.keys())
+
+    def summary(self, reset=False):
+        """
+        Get summaries of all histograms.
+        :param reset: reset histograms after summarized
+        :return: dict of name -> summary
+        """
+        with self._lock:
+            histograms = list(self._histograms.items())
+
+        result = OrderedDict()
+
+        for name, histogram in histograms:
+            result[name] = histogram.summary()
+
+            if reset:
+                histogram.reset()
+
+        return result
@@ -0,0 +1,55 @@
+# coding: utf-8
+import unittest
+
+from threading import Thread
+
+from ..clock import VirtualClock
+
+
+class VirtualClockTest(unittest.TestCase):
+    def test_timer_lockstep(self):
+        clock = VirtualClock(start=10)
+        fired = list()
+
+        def timer():
+            while True:
+                clock.sleep(60 - clock.time() % 60)
+
+                if len(fired) == 3:
+                    return
+
+                fired.append(clock.time())
+
+        thread = Thread(target=timer)
+        thread.daemon = True
+        thread.start()
+
+        # wait for timer sleeping
+        clock.advance(10)
+        while not clock._deadlines:
+            pass
+
+        clock.advance(130)
+        # every due deadline is seen by timer before advance() returns
+        self.assertEqual([60, 120], fired)
+        self.assertEqual(130, clock.time())
+
+        clock.advance(100)
+        self.assertEqual(130, clock.time())
+
+        clock.advance(1000)
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([60, 120, 180], fired)
+
+    def test_stop(self):
+        clock = VirtualClock()
+
+        thread = Thread(target=clock.sleep, args=(60, ))
+        thread.start()
+
+        clock.stop()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
@@ -0,0 +1,64 @@
+# coding: utf-8
+import random
+import unittest
+
+from ..metrics import LatencyHistogram, LatencyRecorder
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_exact_small_values(self):
+        histogram = LatencyHistogram()
+
+        for value in range(1, 101):
+            histogram.record(value)
+
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(1, histogram.min)
+        self.assertEqual(100, histogram.max)
+        self.assertEqual(50.5, histogram.mean)
+        self.assertEqual(50, histogram.percentile(50))
+        self.assertEqual(99, histogram.percentile(99))
+        self.assertEqual(100, histogram.percentile(100))
+
+    def test_relative_error(self):
+        histogram = LatencyHistogram()
+        values = sorted(random.randint(0, 10 ** 9) for _ in range(10000))
+
+        for value in values:
+            histogram.record(value)
+
+        for percent in (50, 90, 99, 99.9):
+            expected = values[int(len(values) * percent / 100) - 1]
+            self.assertAlmostEqual(1, histogram.percentile(percent) /
+                                   expected, delta=0.01)
+
+    def test_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(10)
+        second.record(10 ** 6)
+        second.record(-1)
+
+        first.merge(second)
+
+        self.assertEqual(3, first.count)
+        self.assertEqual(0, first.min)
+        self.assertEqual(10 ** 6, first.percentile(100))
+
+        first.reset()
+        self.assertIsNone(first.percentile(50))
+
+        with self.assertRaises(ValueError):
+            first.merge(LatencyHistogram(sub_bucket_bits=4))
+
+
+class LatencyRecorderTest(unittest.TestCase):
+    def test_summary(self):
+        recorder = LatencyRecorder()
+        recorder.record("decode", 1000)
+        recorder.record("apply", 2000)
+
+        summary = recorder.summary(reset=True)
+
+        self.assertEqual(["decode", "apply"], list(summary))
+        self.assertEqual(1000, summary["decode"]["p99.9"])
+        self.assertEqual(0, recorder.summary()["apply"]["count"])
@@ -0,0 +1,46 @@
+# coding: utf-8
+import logging
+import sys
+import time
+
+from clients.capture import FrameCapture
+from trade.core import Trader
+from trade.replay import replay_class
+
+
+def capture(directory, seconds):
+    frame_capture = FrameCapture(directory)
+
+    trader = Trader(host="https://www.ybmex.com", symbol="XBTUSD",
+                    ws_opts={"capture": frame_capture})
+
+    time.sleep(seconds)
+
+    trader.running = False
+    frame_capture.close()
+
+
+def backtest(directory, speed=0):
+    from strategy.bollmixin import BollTrend
+
+    strategy = replay_class(BollTrend)(
+        host=None, symbol="XBTUSD",
+        kline_opts={"precise": "1m"},
+        ws_opts={"source": directory, "speed": speed})
+
+    start = time.time()
+    strategy.replay()
+
+    print("{} frames replayed in {:.3f}s, profit: {}".format(
+        strategy.replayed, time.time() - start, sum(strategy._profit)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    # python -m examples.replay capture <dir> <seconds>
+    # python -m examples.replay backtest <dir> [speed]
+    if sys.argv[1] == "capture":
+        capture(sys.argv[2], int(sys.argv[3]))
+    else:
+        backtest(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 0)
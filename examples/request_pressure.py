@@ -1,43 +1,119 @@
 # coding: utf-8
+import asyncio
 import os
 import sys
 import time
 
-from bravado.exception import HTTPTooManyRequests, HTTPServiceUnavailable
+import requests
 
 try:
-    from clients.nge_rest import api
+    from clients.nge_async_rest import AsyncNGERest
+    from clients.rate_limit import RateLimiter, RateLimitExceeded
+    from common.metrics import LatencyHistogram
 except ImportError:
-    sys.path.append(os.path.join(os.path.dirname(__file__), "../../"))
+    sys.path.append(os.path.join(os.path.dirname(__file__), "../"))
 
-    from clients.nge_rest import api
+    from clients.nge_async_rest import AsyncNGERest
+    from clients.rate_limit import RateLimiter, RateLimitExceeded
+    from common.metrics import LatencyHistogram
 
-if __name__ == "__main__":
-    # fake id
-    key = "Y2YzvfLAr0e"
-    secret = ("sKNKrI5BTh122tDs4DtHBpy5quM9v05XIpcw6y7s"
+# fake id
+API_KEY = "Y2YzvfLAr0e"
+API_SECRET = ("sKNKrI5BTh122tDs4DtHBpy5quM9v05XIpcw6y7s"
               "m0AhT0Lu5nEmq8g43K860CE9IgM6e9xgB7Ffx61bDa")
 
-    client = api(api_key=key, api_secret=secret)
-
-    count = 0
-    max_count = 1000
-    start = time.time()
-    end = 0
-    while count < max_count:
-        try:
-            result, _ = client.Position.Position_get().result()
-        except (HTTPTooManyRequests, HTTPServiceUnavailable) as e:
-            end = time.time()
-            print(e)
-            break
+THROTTLED_STATUS = (429, 503)
+
+
+async def pressure(host, concurrency, max_count, endpoint="/position",
+                   rate_limiter=None):
+    """
+    Send max_count requests with concurrency requests in flight,
+    stop sending once throttled.
+    :param host:
+    :param concurrency:
+    :param max_count:
+    :param endpoint:
+    :param rate_limiter: pace requests by RateLimiter if specified
+    :return: stats dict
+    """
+    latency = LatencyHistogram()
+    stats = {"concurrency": concurrency, "ok": 0, "throttled": 0,
+             "error": 0, "remaining": None}
+    pending = iter(range(max_count))
+
+    async def worker(client):
+        for _ in pending:
+            if stats["throttled"]:
+                break
+
+            start = time.perf_counter_ns()
+
+            try:
+                _, rsp = await client.get(endpoint)
+            except requests.HTTPError as e:
+                if e.response.status_code in THROTTLED_STATUS:
+                    stats["throttled"] += 1
+                    stats["remaining"] = e.response.headers.get(
+                        "x-ratelimit-remaining")
+                else:
+                    stats["error"] += 1
+                continue
+            except RateLimitExceeded:
+                stats["throttled"] += 1
+                continue
+            except (requests.RequestException, OSError):
+                stats["error"] += 1
+                continue
+
+            latency.record(time.perf_counter_ns() - start)
+            stats["ok"] += 1
+            stats["remaining"] = rsp.headers.get("x-ratelimit-remaining")
+
+    async with AsyncNGERest(host, API_KEY, API_SECRET,
+                            max_in_flight=concurrency,
+                            rate_limiter=rate_limiter) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        stats["duration"] = time.perf_counter() - start
 
-        count += 1
+    stats["rps"] = stats["ok"] / stats["duration"]
+    stats["p50"] = latency.percentile(50) / 1000000 if latency.count else 0
+    stats["p99"] = latency.percentile(99) / 1000000 if latency.count else 0
 
-    if count >= max_count:
-        end = time.time()
+    return stats
 
-    duration = end - start
 
-    print("total request[{:d}] in {:f} seconds with"
-          "request rate {:.2f} rps".format(count, duration, count/duration))
+if __name__ == "__main__":
+    # python examples/request_pressure.py [host] [1,2,4,8,16] [count] [limit]
+    # requests are paced by rate limit headers if "limit" specified
+    host_url = sys.argv[1] if len(sys.argv) > 1 else "https://www.btcmex.com"
+    levels = [int(level) for level in (
+        sys.argv[2] if len(sys.argv) > 2 else "1,2,4,8,16,32").split(",")]
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    limiter = RateLimiter() if "limit" in sys.argv[4:] else None
+
+    best = None
+
+    for level in levels:
+        result = asyncio.run(pressure(host_url, level, count,
+                                      rate_limiter=limiter))
+
+        print("concurrency[{concurrency:d}] ok[{ok:d}] "
+              "throttled[{throttled:d}] error[{error:d}] in "
+              "{duration:.3f} seconds with request rate {rps:.2f} rps, "
+              "latency p50 {p50:.1f}ms p99 {p99:.1f}ms, "
+              "rate limit remaining[{remaining}]".format(**result))
+
+        if limiter:
+            print("rate limit budget: {}".format(limiter.budget()))
+
+        if not best or result["rps"] > best["rps"]:
+            best = result
+
+        if result["throttled"]:
+            print("throttled at concurrency[{:d}], stop.".format(level))
+            break
+
+    print("max request rate {:.2f} rps at concurrency[{:d}]".format(
+        best["rps"], best["concurrency"]))
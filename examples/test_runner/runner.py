@@ -2,11 +2,15 @@
 import os
 import yaml
 import re
+import sys
 import json
+import time
 
-from collections import OrderedDict, namedtuple, ChainMap, UserDict
-from threading import RLock, Condition
-from functools import wraps
+from collections import OrderedDict, namedtuple, UserDict, deque
+from bisect import bisect_left
+from concurrent.futures import (Future, ThreadPoolExecutor,
+                                TimeoutError as FutureTimeout)
+from threading import Event, RLock
 from bravado.client import ResourceDecorator, CallableOperation
 from bravado.exception import HTTPBadRequest
 
@@ -16,7 +20,6 @@ try:
     from common.data_source import CSVData
     from trade.core import Trader
 except ImportError:
-    import sys
     sys.path.append(os.path.join(os.path.dirname(__file__), "../../"))
 
     from common.utils import (path, time_ms, TColor,
@@ -25,30 +28,226 @@ except ImportError:
     from trade.core import Trader
 
 
+class ResultList(object):
+    """
+    Read only view of results with sequence below end.
+    """
+
+    def __init__(self, store, end):
+        self._store = store
+        self._end = end
+
+    def __len__(self):
+        return self._store.count(self._end)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+
+        return self._store.at(index, self._end)
+
+    def __iter__(self):
+        return iter(self._store.values(self._end))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ResultStore(object):
+    """
+    Bounded results of records, indexed by sequence.
+
+    Sequence is record's registered position, or linking order if not
+    registered. Results are evicted in least recently linked order when
+    exceeding capacity, referring an evicted result raises IndexError.
+    """
+
+    CAPACITY = 10000
+
+    def __init__(self, capacity=CAPACITY):
+        """
+        :param capacity: max results kept
+        """
+        self.capacity = capacity
+
+        self._lock = RLock()
+
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # sequence -> result, in linking order
+            self._results = OrderedDict()
+            # unregistered record -> sequence, and reversed
+            self._sequences = dict()
+            self._records = dict()
+            # linked sequences in order, evicted ones included
+            self._linked = list()
+            self._end = 0
+
+            self.evicted = 0
+
+    @property
+    def end(self):
+        return self._end
+
+    def sequence(self, record, position=None):
+        if position is not None:
+            return position
+
+        return self._sequences.get(record)
+
+    def link(self, record, result, position=None):
+        """
+        :param record:
+        :param result:
+        :param position: registered position of record
+        :return:
+        """
+        with self._lock:
+            seq = self.sequence(record, position)
+
+            if seq is None:
+                seq = self._sequences[record] = self._end
+                self._records[seq] = record
+
+            if seq >= self._end:
+                self._linked.append(seq)
+                self._end = seq + 1
+            else:
+                idx = bisect_left(self._linked, seq)
+
+                if idx == len(self._linked) or self._linked[idx] != seq:
+                    self._linked.insert(idx, seq)
+
+            self._results[seq] = result
+            self._results.move_to_end(seq)
+
+            while len(self._results) > self.capacity:
+                evicted, _ = self._results.popitem(last=False)
+
+                self._sequences.pop(self._records.pop(evicted, None), None)
+
+                self.evicted += 1
+
+    def get(self, record, position=None):
+        with self._lock:
+            return self._results.get(self.sequence(record, position))
+
+    def __result(self, seq):
+        try:
+            return self._results[seq]
+        except KeyError:
+            raise IndexError("result[{}] is evicted.".format(seq))
+
+    def count(self, end):
+        with self._lock:
+            if not self._linked or self._linked[-1] < end:
+                return len(self._linked)
+
+            return bisect_left(self._linked, end)
+
+    def at(self, index, end):
+        """
+        Result at index of results with sequence below end, lookup cost
+        doesn't depend on sequences not linked.
+        """
+        with self._lock:
+            length = self.count(end)
+
+            if index < 0:
+                index += length
+
+            if not 0 <= index < length:
+                raise IndexError("result index out of range")
+
+            return self.__result(self._linked[index])
+
+    def last(self, end, exclude=None):
+        """
+        Last result with sequence below end.
+        :param end:
+        :param exclude: sequence excluded
+        :return:
+        """
+        with self._lock:
+            idx = self.count(end) - 1
+
+            if idx >= 0 and self._linked[idx] == exclude:
+                idx -= 1
+
+            if idx >= 0:
+                return self.__result(self._linked[idx])
+
+        raise IndexError("no result linked.")
+
+    def values(self, end):
+        with self._lock:
+            return [self._results[seq] for seq in range(end)
+                    if seq in self._results]
+
+    def __len__(self):
+        return len(self._results)
+
+
 class DataMixin(object):
     __RESOURCE_MAP = dict()
-    __REC_DATA_MAPPER = OrderedDict()
+    __RESULTS = ResultStore()
+    # id(record) -> position in records
+    __POSITIONS = dict()
 
     __PARAM_PATTERN = re.compile(r'@.+@')
     __TABLE_PATTERN = re.compile(r'#.+#')
+    __ITEM_PATTERN = re.compile(
+        r'\$?{?([0-9a-zA-Z_-]+)(?:\[([0-9a-zA-Z_-]+)\])?}?')
 
     @staticmethod
     def register_resource(name, res):
         DataMixin.__RESOURCE_MAP[name] = res
 
+    @staticmethod
+    def register_records(records):
+        """
+        Register records position, so results are referred in records
+        order even if records are run concurrently. Results of previous
+        records are cleared.
+        :param records:
+        :return:
+        """
+        DataMixin.__POSITIONS = {
+            id(record): idx for idx, record in enumerate(records)}
+
+        DataMixin.__RESULTS.clear()
+
+    @staticmethod
+    def results():
+        return DataMixin.__RESULTS
+
+    def position(self):
+        return DataMixin.__POSITIONS.get(id(self))
+
     def link(self, result_data):
-        self.__REC_DATA_MAPPER[self] = result_data
+        DataMixin.__RESULTS.link(self, result_data, self.position())
 
     def last_order(self):
-        last_key = [k for k in self.__REC_DATA_MAPPER.keys() if k != self][-1]
+        position = self.position()
+
+        if position is not None:
+            return DataMixin.__RESULTS.last(position)
 
-        return self.__REC_DATA_MAPPER[last_key]
+        return DataMixin.__RESULTS.last(
+            DataMixin.__RESULTS.end,
+            exclude=DataMixin.__RESULTS.sequence(self))
 
     def order_list(self):
-        return list(self.__REC_DATA_MAPPER.values())
+        position = self.position()
+
+        return ResultList(
+            DataMixin.__RESULTS,
+            DataMixin.__RESULTS.end if position is None else position)
 
     def check_result(self):
-        result = self.__REC_DATA_MAPPER.get(self, None)
+        result = DataMixin.__RESULTS.get(self, self.position())
 
         expect = getattr(self, "expect")
 
@@ -114,14 +313,11 @@ class DataMixin(object):
         return check_bool, result_string
 
     def __parse_param(self, value):
-        item_pattern = re.compile(
-            r'\$?{?([0-9a-zA-Z_-]+)(?:\[([0-9a-zA-Z_-]+)\])?}?')
-
         item_chain = value.strip('@').split(".")
 
         item = self
 
-        for ref_name, ref_idx in [item_pattern.match(i).groups()
+        for ref_name, ref_idx in [self.__ITEM_PATTERN.match(i).groups()
                                   for i in item_chain]:
             try:
                 item = getattr(item, ref_name)
@@ -170,6 +366,26 @@ class DataMixin(object):
 
         return data_dict
 
+    def references(self):
+        """
+        Items referred by params, e.g. ("last_order", None) for
+        "@${last_order}.orderID@", ("order_list", "1") for
+        "@${order_list[1]}.orderID@".
+        :return: list of (ref name, ref index)
+        """
+        values = [v for k, v in getattr(self, "to_dict")().items()
+                  if k not in ("action", "params", "expect") and
+                  isinstance(v, str)]
+
+        params = getattr(self, "params")
+        if params:
+            values.extend(param.strip().split(":")[-1].strip()
+                          for param in params.split(","))
+
+        return [self.__ITEM_PATTERN.match(
+            value.strip('@').split(".")[0]).groups() for value in values
+            if self.__PARAM_PATTERN.match(value)]
+
     def do_action(self, act_resource):
         action = getattr(self, "action")
         data = self.data()
@@ -178,92 +394,151 @@ class DataMixin(object):
             self.link(order_result)
 
 
-def notify_rtn(wait_flag, wait_condition):
-    def waiter(func):
-        @wraps(func)
-        def wrapper(self, *args, **kwargs):
-            result = func(self, *args, **kwargs)
-
-            if getattr(self, wait_flag):
-                wait = getattr(self, wait_condition)
-                with wait:
-                    wait.notify()
-
-            return result
-
-        return wrapper
+class RequestCache(UserDict):
+    """
+    Requests waiting for rtn, correlated by key.
 
-    return waiter
+    Each in flight key has its own future resolved by ack(), entries are
+    evicted once acknowledged or discarded. Acks of unknown keys are kept
+    shortly as websocket may be faster than REST response.
+    """
 
+    MAX_EARLY = 1000
+    # early acks kept for each key
+    MAX_EARLY_PER_KEY = 8
 
-class RequestCache(UserDict):
     def __init__(self):
         super(RequestCache, self).__init__()
 
-        self._inflight_cache = OrderedDict()
-        self._request_cache = OrderedDict()
+        self._lock = RLock()
 
-        self._cache = ChainMap(self._inflight_cache, self._request_cache)
+        self._inflight_cache = OrderedDict()
+        self._futures = dict()
+        # key -> deque of (value, monotonic ts) acked before inflight
+        self._early_cache = OrderedDict()
 
     def is_inflight(self, key):
         return key in self._inflight_cache
 
-    def inflight(self, key, value):
-        self._request_cache[key] = self._inflight_cache[key] = value
+    def inflight(self, key, value, since=None):
+        """
+        Start waiting ack of key.
+        :param key:
+        :param value: request result
+        :param since: monotonic timestamp of sending request, earlier
+        acks are ignored
+        :return: future resolved by ack value
+        """
+        with self._lock:
+            future = self._futures.get(key)
+
+            if future is None:
+                future = self._futures[key] = Future()
+
+            self._inflight_cache[key] = value
+
+            for early_value, early_ts in self._early_cache.pop(key, ()):
+                if since is None or early_ts >= since:
+                    self.ack(key, early_value)
+                    break
+
+        return future
+
+    def ack(self, key, value):
+        """
+        Resolve future of key.
+        :param key:
+        :param value:
+        :return: True if key is in flight
+        """
+        with self._lock:
+            if key not in self._inflight_cache:
+                self._early_cache.setdefault(key, deque(
+                    maxlen=self.MAX_EARLY_PER_KEY)).append(
+                    (value, time.monotonic()))
+                self._early_cache.move_to_end(key)
+
+                while len(self._early_cache) > self.MAX_EARLY:
+                    self._early_cache.popitem(last=False)
+
+                return False
 
-    def __setitem__(self, key, value):
-        if key not in self._inflight_cache and key not in self._request_cache:
-            return self.inflight(key, value)
+            del self._inflight_cache[key]
+            future = self._futures.pop(key)
 
-        if key in self._inflight_cache:
-            self._inflight_cache.pop(key)
+        future.set_result(value)
+
+        return True
+
+    def discard(self, key):
+        with self._lock:
+            self._inflight_cache.pop(key, None)
+            future = self._futures.pop(key, None)
+
+        if future is not None:
+            future.cancel()
 
-        self._request_cache[key] = value
+    def __setitem__(self, key, value):
+        if key in self._inflight_cache:
+            self.ack(key, value)
+        else:
+            self.inflight(key, value)
 
     def __getitem__(self, item):
-        return self._cache[item]
+        return self._inflight_cache[item]
 
     def __getattr__(self, item):
-        return self._cache[item]
+        try:
+            return self._inflight_cache[item]
+        except KeyError:
+            raise AttributeError(item)
 
     def __delitem__(self, key):
-        if key in self._inflight_cache:
-            del self._inflight_cache[key]
+        if key not in self._inflight_cache:
+            raise KeyError(key)
 
-        del self._request_cache[key]
+        self.discard(key)
 
     def __len__(self):
-        return len(self._cache)
+        return len(self._inflight_cache)
 
     def __contains__(self, item):
-        return item in self._cache
+        return item in self._inflight_cache
 
     def __iter__(self):
-        return self._cache.__iter__()
+        return iter(list(self._inflight_cache))
 
 
 class ResourceWrapper:
     args_tuple = namedtuple(
-        "args_tuple", ("sync_req_rtn", "wait_condition",
-                       "rtn_wait_timeout"))
+        "args_tuple", ("sync_req_rtn", "rtn_wait_timeout"))
+
+    # request result & future of its rtn, future is None if not waiting
+    pending_tuple = namedtuple(
+        "pending_tuple", ("req_ts", "key", "result", "future"))
 
     __EXECUTION_PATTERN = re.compile(r'{%.+%}')
 
     def __init__(self, req_key: str, req_cache: RequestCache,
-                 rtn_cache, logger, origin_res, args: args_tuple):
+                 logger, origin_res, args: args_tuple,
+                 origin_operation=None):
         self.key_name = req_key
         self.req_cache = req_cache
-        self.rtn_cache = rtn_cache
         self.logger = logger
         self.args = args
         self.origin_resource = origin_res
-        self.origin_operation = None
+        self.origin_operation = origin_operation
 
     def __execution(self, http_future):
         req_ts = time_ms()
 
         req_results, rsp = http_future.result()
-        self.logger.info(
+
+        # timings are aggregated by session metrics, request details
+        # are only for debugging
+        self.logger.info("request[{}] finished in [{} ms]".format(
+            http_future.operation.operation_id, time_ms() - req_ts))
+        self.logger.debug(
             "send request[{}]: url[{}], method[{}], "
             "header[{}], data[{}]".format(
                 http_future.operation.operation_id,
@@ -282,53 +557,64 @@ class ResourceWrapper:
 
         return req_ts, req_results
 
-    def __call__(self, *args, **kwargs):
+    def request(self, *args, **kwargs):
+        """
+        Send request and start waiting rtn without blocking.
+        :return: list of pending_tuple, rtn results are got by wait()
+        """
         if not self.origin_operation:
             raise TypeError("Operation is invalid.")
 
+        since = time.monotonic()
+
         http_future = self.origin_operation(*args, **kwargs)
 
         try:
             req_ts, req_results = self.__execution(http_future)
         except HTTPBadRequest as e:
             if e.swagger_result:
-                return [e.swagger_result]
+                return [self.pending_tuple(
+                    None, None, e.swagger_result, None)]
             else:
                 raise
 
         if not self.args.sync_req_rtn:
-            return req_results
+            return [self.pending_tuple(req_ts, None, result, None)
+                    for result in req_results]
 
-        rtn_results = list()
+        pending = list()
 
         for result in req_results:
             key_value = result[self.key_name]
 
-            self.req_cache.inflight(key_value, result)
+            pending.append(self.pending_tuple(
+                req_ts, key_value, result,
+                self.req_cache.inflight(key_value, result, since=since)))
 
-            with self.args.wait_condition:
-                wait_count = 0
+        return pending
 
-                while self.req_cache.is_inflight(key_value):
-                    self.args.wait_condition.wait(
-                        self.args.rtn_wait_timeout)
-
-                    wait_count += 1
+    def wait(self, pending):
+        """
+        Wait rtn of pending requests.
+        :param pending: list of pending_tuple returned by request()
+        :return: list of rtn results
+        """
+        rtn_results = list()
 
-                    if wait_count > 3:
-                        raise RuntimeError(
-                            "Waiting response timeout "
-                            "for {} times[{} s]".format(
-                                wait_count, self.args.rtn_wait_timeout))
+        for req_ts, key_value, result, future in pending:
+            if future is None:
+                rtn_results.append(result)
+                continue
 
             try:
-                rtn_result, rtn_ts = self.rtn_cache[key_value]
-            except KeyError:
-                self.logger.error(
-                    "fail to get rtn[{}] from cache: {}".format(
-                        key_value, self.rtn_cache
-                    ))
-                continue
+                rtn_result, rtn_ts = future.result(
+                    self.args.rtn_wait_timeout)
+            except FutureTimeout:
+                self.req_cache.discard(key_value)
+
+                raise RuntimeError(
+                    "Waiting response[{}] timeout[{} s]".format(
+                        key_value, self.args.rtn_wait_timeout))
 
             rtn_results.append(rtn_result)
 
@@ -339,13 +625,18 @@ class ResourceWrapper:
 
         return rtn_results
 
+    def __call__(self, *args, **kwargs):
+        return self.wait(self.request(*args, **kwargs))
+
     def __getattr__(self, attr_name):
         origin_attr = getattr(self.origin_resource, attr_name)
 
         if isinstance(origin_attr, (CallableOperation, )):
-            self.origin_operation = origin_attr
-
-            return self
+            # bound to a new wrapper, so wrapper can be shared by threads
+            return ResourceWrapper(
+                req_key=self.key_name, req_cache=self.req_cache,
+                logger=self.logger, origin_res=self.origin_resource,
+                args=self.args, origin_operation=origin_attr)
 
         return origin_attr
 
@@ -358,47 +649,20 @@ class APITester(Trader):
                  symbol="XBTUSD", api_key="", api_secret=""):
         self._request_cache = RequestCache()
 
-        self._rtn_order_cache = OrderedDict()
-        self._rtn_trade_cache = OrderedDict()
-
-        self._rtn_caches = ChainMap(self._rtn_order_cache,
-                                    self._rtn_trade_cache)
-
-        self._wait_condition = Condition(RLock())
-
         super(APITester, self).__init__(host=host, symbol=symbol,
                                         api_key=api_key,
                                         api_secret=api_secret)
         self.logger = logging.getLogger(__file__)
 
-    @notify_rtn(wait_flag="SYNC_REQ_WITH_RTN",
-                wait_condition="_wait_condition")
     def on_rtn_order(self, order_data: dict, ts: int = None):
-        order_id = order_data["orderID"]
-
-        if order_id not in self._request_cache:
-            return
-
-        self._rtn_order_cache[order_id] = (order_data, ts)
-        self._request_cache[order_id] = order_data
-
-    @notify_rtn(wait_flag="SYNC_REQ_WITH_RTN",
-                wait_condition="_wait_condition")
-    def on_rtn_trade(self, trade_data: dict, ts: int = None):
-        order_id = trade_data["orderID"]
-
-        if order_id not in self._request_cache:
-            return
-
-        self._rtn_trade_cache[order_id] = (trade_data, ts)
+        if self.SYNC_REQ_WITH_RTN:
+            self._request_cache.ack(order_data["orderID"],
+                                    (order_data, ts))
 
     def __getattr__(self, item):
         key_mapper = {
             "Order": "orderID"
         }
-        rtn_cache_mapper = {
-            "Order": self._rtn_order_cache
-        }
 
         origin_attribute = getattr(self._rest_client, item)
 
@@ -406,16 +670,166 @@ class APITester(Trader):
             # noinspection PyCallByClass
             return ResourceWrapper(
                 req_key=key_mapper[item], req_cache=self._request_cache,
-                rtn_cache=rtn_cache_mapper[item], logger=self.logger,
-                origin_res=origin_attribute,
+                logger=self.logger, origin_res=origin_attribute,
                 args=ResourceWrapper.args_tuple(
                     sync_req_rtn=self.SYNC_REQ_WITH_RTN,
-                    wait_condition=self._wait_condition,
                     rtn_wait_timeout=self.RTN_WAIT_TIMEOUT))
 
         return origin_attribute
 
 
+class ParallelRunner(object):
+    """
+    Run records' actions concurrently by a worker pool.
+
+    Dependencies are analyzed from param references of each record:
+        last_order: waits for previous record
+        order_list or unknown items: waits for all previous records
+        record's own fields: no dependency
+    Barrier actions wait for all previous records and block all following
+    records. Records failed or depending on failed records are collected
+    in errors, and the first one is raised after all finished.
+    """
+
+    BARRIER_ACTIONS = ("Order_cancelAll", )
+    WORKERS = 8
+
+    def __init__(self, records, resource, workers=WORKERS):
+        """
+        :param records: records with DataMixin
+        :param resource: resource to do actions
+        :param workers: worker threads, records are run in order if 1
+        """
+        self.records = list(records)
+        self.resource = resource
+        self.workers = workers
+
+        DataMixin.register_records(self.records)
+
+        self.dependencies = [self.__analyze(idx)
+                             for idx in range(len(self.records))]
+
+        # seconds each record spent
+        self.durations = [0.0] * len(self.records)
+        self.wall_time = 0.0
+        self.errors = dict()
+
+    @property
+    def serial_time(self):
+        return sum(self.durations)
+
+    def __is_barrier(self, idx):
+        return getattr(self.records[idx], "action") in self.BARRIER_ACTIONS
+
+    def __analyze(self, idx):
+        previous = set(range(idx))
+
+        if self.__is_barrier(idx):
+            return previous
+
+        dependencies = set()
+
+        for prev in reversed(range(idx)):
+            if self.__is_barrier(prev):
+                dependencies.add(prev)
+                break
+
+        record = self.records[idx]
+
+        for ref_name, _ in record.references():
+            if ref_name == "last_order":
+                dependencies.update(range(idx)[-1:])
+            elif ref_name not in record.headers():
+                return previous
+
+        return dependencies
+
+    def __execute(self, idx):
+        start = time.perf_counter()
+
+        try:
+            self.records[idx].do_action(self.resource)
+        finally:
+            self.durations[idx] = time.perf_counter() - start
+
+    def __run_serial(self):
+        for idx in range(len(self.records)):
+            self.__execute(idx)
+
+    def __run_parallel(self):
+        remains = [len(deps) for deps in self.dependencies]
+        dependents = [list() for _ in self.records]
+
+        for idx, deps in enumerate(self.dependencies):
+            for dep in deps:
+                dependents[dep].append(idx)
+
+        lock = RLock()
+        finished = Event()
+        unfinished = [len(self.records)]
+
+        executor = ThreadPoolExecutor(self.workers,
+                                      thread_name_prefix="runner")
+
+        def run(idx):
+            with lock:
+                failed = sorted(self.dependencies[idx] & set(self.errors))
+
+            try:
+                if failed:
+                    raise RuntimeError(
+                        "dependency record[{}] failed.".format(failed[0]))
+
+                self.__execute(idx)
+            except Exception as e:
+                with lock:
+                    self.errors[idx] = e
+
+            ready = list()
+
+            with lock:
+                for dependent in dependents[idx]:
+                    remains[dependent] -= 1
+
+                    if not remains[dependent]:
+                        ready.append(dependent)
+
+                unfinished[0] -= 1
+
+                if not unfinished[0]:
+                    finished.set()
+
+            for dependent in ready:
+                executor.submit(run, dependent)
+
+        for idx, count in enumerate(remains):
+            if not count:
+                executor.submit(run, idx)
+
+        finished.wait()
+        executor.shutdown()
+
+    def run(self):
+        """
+        Run all records.
+        :return: wall time in seconds
+        """
+        start = time.perf_counter()
+
+        try:
+            if self.workers <= 1 or not self.records:
+                self.__run_serial()
+            else:
+                self.__run_parallel()
+        finally:
+            self.wall_time = time.perf_counter() - start
+
+        if self.errors:
+            raise self.errors[min(self.errors)]
+
+        return self.wall_time
+
+
 if __name__ == "__main__":
     import logging
     logging.basicConfig(level=logging.INFO)
@@ -436,8 +850,10 @@ if __name__ == "__main__":
 
     order_list = CSVData(order_file, rec_obj_mixin=(DataMixin, ))
 
-    for order in order_list:
-        order.do_action(resource)
+    runner = ParallelRunner(
+        order_list, resource,
+        workers=int(sys.argv[1]) if len(sys.argv) > 1 else 1)
+    runner.run()
 
     print()
 
@@ -460,3 +876,12 @@ if __name__ == "__main__":
             "Return", TColor.rend("Return", fg="blue")).replace(
             "Result", TColor.rend("Result", fg="cyan"))
         )
+
+    for operation, stats in ex.rest_metrics().items():
+        print("{}: {}".format(operation, stats))
+
+    print("workers[{}] wall time[{:.3f} s], serial time[{:.3f} s], "
+          "speedup[{:.2f}]".format(
+              runner.workers, runner.wall_time, runner.serial_time,
+              runner.serial_time / runner.wall_time
+              if runner.wall_time else 0))
@@ -0,0 +1,106 @@
+# coding: utf-8
+import os
+import tempfile
+import time
+import unittest
+
+from threading import Lock
+
+from common.data_source import CSVData
+
+from ..runner import DataMixin, ParallelRunner
+
+
+ORDERS = """action,params,expect,symbol,side,price,orderQty
+Order_new,,,XBTUSD,Buy,100,10
+Order_new,,,XBTUSD,Sell,200,10
+Order_amend,orderID:@${last_order}.orderID@,,,,,20
+Order_new,,,XBTUSD,Buy,101,10
+Order_cancel,orderID:@${order_list[1]}.orderID@,,,,,
+Order_new,,,XBTUSD,Buy,102,10
+Order_cancelAll,,,,,,
+Order_new,,,XBTUSD,Buy,103,10
+"""
+
+
+class FakeResource(object):
+    DELAY = 0.05
+
+    def __init__(self):
+        self.calls = list()
+        self._lock = Lock()
+        self._count = 0
+
+    def __getattr__(self, action):
+        def operation(**data):
+            time.sleep(self.DELAY)
+
+            with self._lock:
+                self._count += 1
+                self.calls.append((action, data))
+
+                return [dict(data, orderID="{}-{}".format(
+                    action, data.get("price", data.get("orderID"))))]
+
+        return operation
+
+
+class ParallelRunnerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        fd, self.csv_file = tempfile.mkstemp(suffix=".csv")
+
+        with os.fdopen(fd, "w") as f:
+            f.write(ORDERS)
+
+        self.records = CSVData(self.csv_file, rec_obj_mixin=(DataMixin, ))
+
+    def tearDown(self) -> None:
+        os.remove(self.csv_file)
+
+    def test_dependencies(self):
+        runner = ParallelRunner(self.records, FakeResource())
+
+        self.assertEqual([set(), set(), {1}, set(), {0, 1, 2, 3}, set(),
+                          set(range(6)), {6}], runner.dependencies)
+
+    def test_parallel(self):
+        resource = FakeResource()
+        runner = ParallelRunner(self.records, resource, workers=8)
+
+        runner.run()
+
+        calls = dict(resource.calls)
+
+        self.assertEqual("Order_new-200", calls["Order_amend"]["orderID"])
+        self.assertEqual("Order_new-200", calls["Order_cancel"]["orderID"])
+
+        # critical path: new -> amend -> cancel -> cancelAll -> new
+        self.assertLess(runner.wall_time, runner.serial_time * 0.8)
+        self.assertEqual([call[0] for call in resource.calls][-2:],
+                         ["Order_cancelAll", "Order_new"])
+
+    def test_serial(self):
+        resource = FakeResource()
+        runner = ParallelRunner(self.records, resource, workers=1)
+
+        runner.run()
+
+        self.assertEqual([r.action for r in self.records],
+                         [call[0] for call in resource.calls])
+        self.assertAlmostEqual(runner.wall_time, runner.serial_time,
+                               delta=0.05)
+
+    def test_failed(self):
+        class FailedResource(FakeResource):
+            def __getattr__(self, action):
+                if action == "Order_amend":
+                    raise AttributeError(action)
+
+                return super(FailedResource, self).__getattr__(action)
+
+        runner = ParallelRunner(self.records, FailedResource(), workers=4)
+
+        with self.assertRaises(AttributeError):
+            runner.run()
+
+        self.assertEqual({2, 4, 6, 7}, set(runner.errors))
@@ -1,7 +1,11 @@
 # coding: utf-8
+import time
 import unittest
 
-from ..runner import RequestCache
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from ..runner import RequestCache, ResourceWrapper
 
 
 class TestRequestCache(unittest.TestCase):
@@ -12,23 +16,29 @@ class TestRequestCache(unittest.TestCase):
         self.cache["a"] = 1
 
         self.assertTrue(self.cache.is_inflight("a"))
+        self.assertEqual(self.cache["a"], 1)
+        self.assertEqual(self.cache.get("a"), 1)
+
+        future = self.cache.inflight("a", 1)
+        self.assertFalse(future.done())
 
         self.cache["a"] = 2
 
+        # evicted once acknowledged
         self.assertFalse(self.cache.is_inflight("a"))
+        self.assertFalse("a" in self.cache)
+        self.assertEqual(future.result(0), 2)
 
-        self.assertEqual(self.cache["a"], 2)
-        self.assertEqual(self.cache.get("a"), 2)
+        self.cache["b"] = 1
 
-        del self.cache["a"]
+        del self.cache["b"]
 
-        self.assertFalse("a" in self.cache)
+        self.assertFalse("b" in self.cache)
 
     def test_iter(self):
         data = (("a", 1), ("b", 2), ("c", 3), ("d", 4), ("e", 5))
 
-        for k, v in data:
-            self.cache[k] = v
+        futures = [self.cache.inflight(k, v) for k, v in data]
 
         for idx, (k, v) in enumerate(self.cache.items()):
             self.assertEqual(data[idx][0], k)
@@ -36,6 +46,109 @@ class TestRequestCache(unittest.TestCase):
 
             self.assertTrue(self.cache.is_inflight(k))
 
-            self.cache[k] = v + 1
+            self.assertTrue(self.cache.ack(k, v + 1))
 
             self.assertFalse(self.cache.is_inflight(k))
+
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual([v + 1 for _, v in data],
+                         [f.result(0) for f in futures])
+
+    def test_early_ack(self):
+        self.assertFalse(self.cache.ack("a", "stale"))
+
+        since = time.monotonic()
+
+        self.assertFalse(self.cache.ack("a", 1))
+        self.assertFalse(self.cache.ack("a", 2))
+
+        future = self.cache.inflight("a", 0, since=since)
+
+        # first ack after request sent
+        self.assertEqual(future.result(0), 1)
+        self.assertFalse("a" in self.cache)
+
+        # early acks are bounded
+        for idx in range(2 * self.cache.MAX_EARLY):
+            self.cache.ack(idx, idx)
+
+        self.assertEqual(self.cache.MAX_EARLY,
+                         len(self.cache._early_cache))
+
+    def test_discard(self):
+        future = self.cache.inflight("a", 1)
+
+        self.cache.discard("a")
+
+        self.assertTrue(future.cancelled())
+        self.assertFalse(self.cache.ack("a", 2))
+
+
+class FakeOperation(object):
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, **kwargs):
+        self.count += 1
+
+        result = dict(kwargs, orderID=str(self.count))
+        request = SimpleNamespace(url="", method="POST", headers={},
+                                  data=None, json=kwargs)
+
+        return SimpleNamespace(
+            result=lambda: (result, None),
+            operation=SimpleNamespace(operation_id="Order_new"),
+            future=SimpleNamespace(request=request))
+
+
+class TestResourceWrapper(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = RequestCache()
+        self.operation = FakeOperation()
+
+        self.wrapper = ResourceWrapper(
+            req_key="orderID", req_cache=self.cache,
+            logger=SimpleNamespace(info=lambda *a: None,
+                                   debug=lambda *a: None),
+            origin_res=None,
+            args=ResourceWrapper.args_tuple(sync_req_rtn=True,
+                                            rtn_wait_timeout=1),
+            origin_operation=self.operation)
+
+    def test_concurrent(self):
+        pending = [self.wrapper.request(price=idx) for idx in range(10)]
+
+        self.assertEqual(10, len(self.cache))
+
+        # acked in reversed order, each request waits for its own
+        for idx in reversed(range(10)):
+            self.cache.ack(str(idx + 1), ({"price": idx}, None))
+
+        for idx, item in enumerate(pending):
+            self.assertEqual([{"price": idx}], self.wrapper.wait(item))
+
+        self.assertEqual(0, len(self.cache))
+
+    def test_call(self):
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(self.wrapper, price=1)
+
+            while not self.cache.is_inflight("1"):
+                time.sleep(0.001)
+
+            self.cache.ack("1", ({"ordStatus": "New"}, None))
+
+            self.assertEqual([{"ordStatus": "New"}], future.result(1))
+
+    def test_timeout(self):
+        wrapper = ResourceWrapper(
+            req_key="orderID", req_cache=self.cache,
+            logger=self.wrapper.logger, origin_res=None,
+            args=ResourceWrapper.args_tuple(sync_req_rtn=True,
+                                            rtn_wait_timeout=0.01),
+            origin_operation=self.operation)
+
+        with self.assertRaises(RuntimeError):
+            wrapper(price=1)
+
+        self.assertEqual(0, len(self.cache))
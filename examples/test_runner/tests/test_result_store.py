@@ -0,0 +1,84 @@
+# coding: utf-8
+import unittest
+
+from ..runner import ResultStore
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = ResultStore(capacity=5)
+
+    def test_linking_order(self):
+        for record in "abc":
+            self.store.link(record, record.upper())
+
+        # linked again keeps sequence
+        self.store.link("a", "A1")
+
+        self.assertEqual(3, self.store.end)
+        self.assertEqual("A1", self.store.get("a"))
+        self.assertEqual(["A1", "B", "C"], self.store.values(self.store.end))
+        self.assertEqual("B", self.store.at(1, self.store.end))
+        self.assertEqual("C", self.store.at(-1, self.store.end))
+        self.assertEqual("B", self.store.last(self.store.end, exclude=2))
+
+        with self.assertRaises(IndexError):
+            self.store.at(3, self.store.end)
+
+    def test_position(self):
+        # linked out of order
+        self.store.link("c", "C", position=2)
+        self.store.link("a", "A", position=0)
+
+        self.assertEqual(3, self.store.end)
+        self.assertEqual(2, self.store.count(3))
+        self.assertEqual("C", self.store.at(1, 3))
+        self.assertEqual("A", self.store.last(2))
+
+        self.store.link("b", "B", position=1)
+
+        self.assertEqual(3, self.store.count(3))
+        self.assertEqual("B", self.store.at(1, 3))
+        self.assertEqual("B", self.store.last(2))
+        self.assertEqual("C", self.store.get("c", position=2))
+
+        with self.assertRaises(IndexError):
+            self.store.last(0)
+
+    def test_missing(self):
+        store = ResultStore(capacity=1000)
+
+        # sequence 1 is never linked, e.g. record failed
+        for position in range(1000):
+            if position != 1:
+                store.link(position, position, position=position)
+
+        self.assertEqual(999, store.count(1000))
+        self.assertEqual(1, store.count(2))
+        self.assertEqual(2, store.at(1, 1000))
+        self.assertEqual(999, store.at(-1, 1000))
+        self.assertEqual(0, store.last(2))
+        self.assertEqual(998, store.last(1000, exclude=999))
+
+        with self.assertRaises(IndexError):
+            store.at(999, 1000)
+
+    def test_bounded(self):
+        for idx in range(100):
+            self.store.link(idx, idx)
+
+        self.assertEqual(5, len(self.store))
+        self.assertEqual(95, self.store.evicted)
+        self.assertEqual(5, len(self.store._sequences))
+        self.assertEqual(99, self.store.last(self.store.end))
+        self.assertEqual(95, self.store.at(95, self.store.end))
+
+        with self.assertRaises(IndexError):
+            self.store.at(1, self.store.end)
+
+        self.assertIsNone(self.store.get(1))
+
+        self.store.clear()
+
+        self.assertEqual(0, self.store.end)
+        self.assertEqual(0, len(self.store))
@@ -24,6 +24,8 @@ def convert_timestamp(value):
 
 
 class MarketTicker(NGEWebsocket):
+    LATENCY_METRICS = True
+
     metrics = defaultdict(Counter)
 
     link_latency = 0
@@ -76,6 +78,12 @@ def late_summary(ticker: MarketTicker):
 
         del temp_metrics
 
+        for name, summary in ticker.latency_summary().items():
+            print("{}'s latency: count[{}], p50[{:.3f} ms], "
+                  "p99[{:.3f} ms], max[{:.3f} ms]".format(
+                    name, summary["count"], summary["p50"] / 1e6,
+                    summary["p99"] / 1e6, summary["max"] / 1e6))
+
         sleep(5)
 
 
@@ -10,8 +10,9 @@ from trade.models import Bar
 class BaseStrategy(Trader):
     def __init__(self, host="https://www.ybmex.com",
                  symbol="XBTUSD", api_key="", api_secret="",
-                 kline_opts=None):
-        super(BaseStrategy, self).__init__(host, symbol, api_key, api_secret)
+                 kline_opts=None, ws_opts=None):
+        super(BaseStrategy, self).__init__(host, symbol, api_key, api_secret,
+                                           ws_opts=ws_opts)
 
         default_kline_opts = {
             "precise": self.kline.DEFAULT_PRECISE,
@@ -26,7 +27,10 @@ class BaseStrategy(Trader):
         if kline_opts:
             default_kline_opts.update(kline_opts)
 
-        self.kline.retrieve_bars(**default_kline_opts)
+        if self.kline.offline:
+            self.kline.precise = default_kline_opts["precise"]
+        else:
+            self.kline.retrieve_bars(**default_kline_opts)
 
         self._close_price = np.array(
             [b.close for b in self.kline.history])
@@ -39,5 +43,5 @@ class BaseStrategy(Trader):
         self._close_price = np.append(self._close_price, bar.close)
 
     @abstractmethod
-    def on_trade(self, trade: dict):
+    def on_trade(self, trade: dict, ts: int = None):
         pass
@@ -47,10 +47,11 @@ class BollTrend(BaseStrategy, BollMixin):
 
     def __init__(self, host="https://www.btcmex.com",
                  symbol="XBTUSD", api_key="", api_secret="",
-                 kline_opts=None):
+                 kline_opts=None, ws_opts=None):
         super(BollTrend, self).__init__(host=host, symbol=symbol,
                                         api_key=api_key, api_secret=api_secret,
-                                        kline_opts=kline_opts)
+                                        kline_opts=kline_opts,
+                                        ws_opts=ws_opts)
         BollMixin.__init__(self)
 
     def __open_signal(self, last_price: np.float64,
@@ -192,7 +193,7 @@ class BollTrend(BaseStrategy, BollMixin):
 
         pprint(bar)
 
-    def on_trade(self, trade_data: dict):
+    def on_trade(self, trade_data: dict, ts: int = None):
         if len(self.kline) < self.BOLL_WIDTH:
             return
 
@@ -204,10 +205,11 @@ class BollBand(BaseStrategy, BollMixin):
 
     def __init__(self, host="https://www.btcmex.com",
                  symbol="XBTUSD", api_key="", api_secret="",
-                 kline_opts=None):
+                 kline_opts=None, ws_opts=None):
         super(BollBand, self).__init__(host=host, symbol=symbol,
                                         api_key=api_key, api_secret=api_secret,
-                                        kline_opts=kline_opts)
+                                        kline_opts=kline_opts,
+                                        ws_opts=ws_opts)
         BollMixin.__init__(self)
 
     def __judge_action(self, trade_data: dict):
@@ -222,7 +224,7 @@ class BollBand(BaseStrategy, BollMixin):
 
         pprint(bar)
 
-    def on_trade(self, trade: dict):
+    def on_trade(self, trade: dict, ts: int = None):
         if len(self.kline) < self.BOLL_WIDTH:
             return
 
@@ -0,0 +1,24 @@
+# coding: utf-8
+import asyncio
+
+from clients.nge_async_websocket import AsyncNGEWebsocket
+
+from trade.core import Trader
+
+
+class AsyncTrader(Trader, AsyncNGEWebsocket):
+    """
+    Trader running on asyncio websocket client.
+
+    Construct it as Trader, then await start() in event loop,
+    callbacks are invoked in event loop.
+    """
+
+    join = AsyncNGEWebsocket.join
+
+    async def stop(self):
+        await AsyncNGEWebsocket.stop(self)
+
+        # joining worker threads blocks
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._stop_workers)
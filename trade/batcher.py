@@ -0,0 +1,289 @@
+# coding: utf-8
+import logging
+import time
+
+from collections import namedtuple
+from concurrent.futures import Future
+from threading import Condition, Thread, current_thread
+
+
+logger = logging.getLogger(__name__)
+
+Intent = namedtuple("Intent", ("kind", "params", "future"))
+
+
+class IntentKind(object):
+    NEW = "new"
+    AMEND = "amend"
+    CANCEL = "cancel"
+
+
+class OrderBatcher(object):
+    """
+    Accumulate order intents in a short window and send them in bulk.
+
+    New orders are sent by one Order.newBulk request, amends by one
+    Order.amendBulk request, and cancels by one Order.cancel request
+    with id list. Single intent of its kind is sent by plain request.
+    Cancels flush pending intents at once instead of waiting for the
+    window, intents in one flush are sent in order of new, amend and
+    cancel, so an order can be amended or canceled in same window.
+
+    Client should provide OrderEntryClient's interface:
+    new(), new_bulk(), amend(), amend_bulk() & cancel().
+    """
+
+    # seconds from first pending intent to flush
+    WINDOW = 0.05
+
+    # max intents of one kind in one request
+    MAX_BATCH = 50
+
+    def __init__(self, client, window=WINDOW, max_batch=MAX_BATCH,
+                 name="order-batcher"):
+        """
+        :param client: OrderEntryClient
+        :param window: seconds to accumulate intents
+        :param max_batch: max orders per bulk request
+        :param name: flushing thread name
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be positive.")
+
+        self._client = client
+        self._window = window
+        self._max_batch = max_batch
+
+        self._condition = Condition()
+        self._pending = list()
+        self._urgent = False
+        self._stopped = False
+
+        self.intents = 0
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+        self._thread = Thread(target=self.__run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _submit(self, kind, params, urgent=False):
+        future = Future()
+
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("order batcher is stopped.")
+
+            self._pending.append(Intent(kind, params, future))
+            self.intents += 1
+
+            if urgent:
+                self._urgent = True
+
+            self._condition.notify()
+
+        return future
+
+    def new(self, **order):
+        """
+        Queue new order.
+        :param order: Order.Order_new arguments
+        :return: Future of placed order dict
+        """
+        return self._submit(IntentKind.NEW, order)
+
+    def amend(self, **order):
+        """
+        Queue order amend.
+        :param order: Order.Order_amend arguments, with orderID or
+        origClOrdID
+        :return: Future of amended order dict
+        """
+        if not order.get("orderID") and not order.get("origClOrdID"):
+            raise ValueError("orderID or origClOrdID is required.")
+
+        return self._submit(IntentKind.AMEND, order)
+
+    def cancel(self, orderID=None, clOrdID=None):
+        """
+        Queue order cancel, pending intents are flushed at once.
+        :param orderID:
+        :param clOrdID:
+        :return: Future of canceled order dict
+        """
+        if bool(orderID) == bool(clOrdID):
+            raise ValueError("one of orderID or clOrdID is required.")
+
+        return self._submit(IntentKind.CANCEL,
+                            {"orderID": orderID, "clOrdID": clOrdID},
+                            urgent=True)
+
+    def flush(self):
+        """
+        Send pending intents without waiting for window.
+        :return:
+        """
+        with self._condition:
+            self._urgent = True
+            self._condition.notify()
+
+    def stop(self, timeout=None):
+        """
+        Send pending intents and stop flushing thread.
+        :param timeout:
+        :return:
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        # stopped by future callback in flushing thread itself
+        if self._thread is not current_thread():
+            self._thread.join(timeout)
+
+    def metrics(self):
+        """
+        :return: dict of intents, requests sent, flushed batches, failed
+        requests and pending intents count
+        """
+        with self._condition:
+            return {"intents": self.intents, "requests": self.requests,
+                    "batches": self.batches, "errors": self.errors,
+                    "pending": len(self._pending)}
+
+    def __run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending or self._stopped)
+
+                if not self._pending:
+                    break
+
+                deadline = time.monotonic() + self._window
+
+                while not self._urgent and not self._stopped:
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        break
+
+                    self._condition.wait(remaining)
+
+                batch, self._pending = self._pending, list()
+                self._urgent = False
+                self.batches += 1
+
+            self._send(batch)
+
+    def _send(self, batch):
+        news = [i for i in batch if i.kind == IntentKind.NEW]
+        amends = [i for i in batch if i.kind == IntentKind.AMEND]
+        cancels = [i for i in batch if i.kind == IntentKind.CANCEL]
+
+        for chunk in self._chunks(news):
+            self._request(chunk, self._client.new, self._client.new_bulk,
+                          "clOrdID")
+
+        for chunk in self._chunks(amends):
+            self._request(chunk, self._client.amend,
+                          self._client.amend_bulk, "orderID")
+
+        for id_name in ("orderID", "clOrdID"):
+            by_id = [i for i in cancels if i.params[id_name]]
+
+            for chunk in self._chunks(by_id):
+                self._cancel(chunk, id_name)
+
+    def _chunks(self, intents):
+        for idx in range(0, len(intents), self._max_batch):
+            yield intents[idx:idx + self._max_batch]
+
+    def _call(self, intents, func, *args, **kwargs):
+        with self._condition:
+            self.requests += 1
+
+        try:
+            result, _ = func(*args, **kwargs)
+        except Exception as e:
+            logger.warning("{} {} intents failed: {}".format(
+                len(intents), intents[0].kind, e))
+
+            with self._condition:
+                self.errors += 1
+
+            for intent in intents:
+                intent.future.set_exception(e)
+
+            return None
+
+        return result
+
+    def _request(self, intents, single, bulk, id_name):
+        if len(intents) == 1:
+            result = self._call(intents, single, **intents[0].params)
+
+            if result is not None:
+                intents[0].future.set_result(result)
+
+            return
+
+        results = self._call(intents, bulk,
+                             [intent.params for intent in intents])
+
+        if results is None:
+            return
+
+        if len(results) == len(intents):
+            # bulk results are in request order
+            for intent, result in zip(intents, results):
+                intent.future.set_result(result)
+
+            return
+
+        self._resolve_by_id(intents, results, id_name)
+
+    def _cancel(self, intents, id_name):
+        ids = [intent.params[id_name] for intent in intents]
+
+        results = self._call(intents, self._client.cancel,
+                             **{id_name: ids[0] if len(ids) == 1 else ids})
+
+        if results is not None:
+            self._resolve_by_id(intents, results, id_name)
+
+    @staticmethod
+    def _intent_id(intent, id_name):
+        """
+        Id identifying intent's order in results, amends without orderID
+        are identified by their client order id after amended.
+        :param intent:
+        :param id_name:
+        :return: (id name, id)
+        """
+        params = intent.params
+
+        if intent.kind == IntentKind.AMEND and not params.get("orderID"):
+            return "clOrdID", (params.get("clOrdID") or
+                               params.get("origClOrdID"))
+
+        return id_name, params.get(id_name)
+
+    @classmethod
+    def _resolve_by_id(cls, intents, results, id_name):
+        # id name -> {id: result}
+        indexes = dict()
+
+        for intent in intents:
+            name, order_id = cls._intent_id(intent, id_name)
+
+            if name not in indexes:
+                indexes[name] = {result.get(name): result
+                                 for result in results}
+
+            if order_id in indexes[name]:
+                intent.future.set_result(indexes[name][order_id])
+            else:
+                intent.future.set_exception(ValueError(
+                    "{}[{}] not found in result.".format(name, order_id)))
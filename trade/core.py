@@ -4,7 +4,6 @@ import sys
 import re
 import time
 import arrow
-import requests
 import json
 
 from pprint import pprint
@@ -13,11 +12,19 @@ from threading import Event, Condition, RLock, Thread
 from queue import Queue
 from urllib.parse import urlparse, urlunparse
 
+from clients.http_session import shared_session
 from clients.nge_rest import api
+from clients.book_integrity import BookIntegrityChecker
 from clients.nge_websocket import NGEWebsocket
+from clients.order_entry import OrderEntryClient
 from clients.utils import condition_controller, condition_waiter
+from common.clock import WALL_CLOCK
 
+from trade.batcher import OrderBatcher
+from trade.dispatcher import (
+    BookConflator, CallbackDispatcher, merge_book_changes)
 from trade.models import Bar
+from trade.order_latency import OrderLatencyTracker
 
 
 logger = logging.getLogger(__name__)
@@ -38,10 +45,23 @@ class Kline(object):
 
     BAR_DELAY = 0.01
 
-    def __init__(self, host, symbol, bar_callback, running):
+    def __init__(self, host, symbol, bar_callback, running, clock=None,
+                 session=None):
+        """
+        :param host: kline host, bars are built from trades only
+        without history if host is None
+        :param symbol:
+        :param bar_callback:
+        :param running: running flag Event
+        :param clock: time source of bar timer, wall clock by default
+        :param session: requests session, shared PooledSession by default
+        """
         self._host = host
         self._symbol = symbol
 
+        self._clock = clock or WALL_CLOCK
+        self._session = session or shared_session()
+
         self._running_flag = running if running else Event()
 
         self._kline_cache = list()
@@ -58,6 +78,10 @@ class Kline(object):
         self._wait_condition = Condition(RLock())
         self._synchronized = Event()
 
+        if not self._host:
+            # no history to synchronize with
+            self._synchronized.set()
+
         self._cmd_input = Queue()
         self._callback_cache = {
             "trade": self.__trade_handler,
@@ -73,21 +97,24 @@ class Kline(object):
 
         self._notifier_tr = Thread(
             target=self.__bar_notify_trigger,
-            args=(self._running_flag, self.notify_trade))
+            args=(self._running_flag, self.notify_trade, self._clock))
         self._notifier_tr.daemon = True
         self._notifier_tr.start()
 
     @staticmethod
-    def __bar_notify_trigger(running: Event, notify_func):
+    def __bar_notify_trigger(running: Event, notify_func, clock):
         running.wait()
 
         while running.is_set():
-            ts = time.time()
+            ts = clock.time()
 
             # assume local timestamp has time gap with server
-            time.sleep(60 - (ts % 60) + Kline.BAR_DELAY)
+            clock.sleep(60 - (ts % 60) + Kline.BAR_DELAY)
 
-            trade_data = {"timestamp": int(round(time.time() * 1000)),
+            if not running.is_set():
+                break
+
+            trade_data = {"timestamp": int(round(clock.time() * 1000)),
                           "price": 0, "size": 0}
             notify_func(trade_data)
 
@@ -121,11 +148,33 @@ class Kline(object):
             except Exception as e:
                 logger.exception("fail to handle {} data: {}\n{}".format(
                     cmd.name, cmd.data, e))
+            finally:
+                cmd_input.task_done()
 
     @property
     def symbol(self):
         return self._symbol
 
+    @property
+    def offline(self):
+        return not self._host
+
+    @property
+    def precise(self):
+        return self._precise
+
+    @precise.setter
+    def precise(self, value):
+        """
+        Set resolution of offline kline before bars built.
+        :param value:
+        :return:
+        """
+        if self._kline_cache or self._latest_bar_data:
+            raise ValueError("kline resolution can not be changed.")
+
+        self._precise = value
+
     @property
     @condition_waiter(bool_attr="_finished",
                       condition_attr="_wait_condition")
@@ -139,6 +188,16 @@ class Kline(object):
     def join(self, timeout=None):
         self._command_tr.join(timeout)
 
+    def drain(self):
+        """
+        Wait until all notified trades & bars handled.
+        :return:
+        """
+        self._cmd_input.join()
+
+    def _now(self):
+        return arrow.get(self._clock.time()).to("local")
+
     @staticmethod
     def __unit_keywords(unit):
         unit_switch = {
@@ -198,7 +257,7 @@ class Kline(object):
             }) if r != 1 else t
         }
 
-        to_timestamp = (arrow.now() if not to_ts else to_ts).ceil(
+        to_timestamp = (self._now() if not to_ts else to_ts).ceil(
             self.__unit_keywords(self._precise_unit))
 
         if not from_ts or from_ts >= to_ts:
@@ -264,6 +323,9 @@ class Kline(object):
                       condition_attr="_wait_condition")
     def latest_bar_data(self):
         if not self._latest_bar_data:
+            if self.offline:
+                return None
+
             self.retrieve_bars()
 
         return self._latest_bar_data.copy()
@@ -322,7 +384,7 @@ class Kline(object):
         logger.info("using [{}] resolution to request[{}] {}+ candles "
                     "from: {} to: {}".format(precise, url, count,
                                              from_ts, to_ts))
-        rsp = requests.get(
+        rsp = self._session.get(
             url,
             params={"symbol": self.symbol, "resolution": self._precise_sys,
                     "from": int(round(from_ts.float_timestamp)),
@@ -386,7 +448,7 @@ class Kline(object):
             self._latest_bar_data = bar_dict
 
         # latest bar is not finished
-        if arrow.now() <= self._latest_bar_data["ts"]:
+        if self._now() <= self._latest_bar_data["ts"]:
             self._latest_bar_data = self._kline_cache[-1].to_dict()
 
         # latest bar will be construct by trade tick
@@ -402,13 +464,20 @@ class Kline(object):
         self._synchronized.set()
 
     def notify_trade(self, trade_data):
+        """
+        Build bars with trade, trade is copied as it's converted in
+        kline's thread, while the row may be shared by table snapshots
+        and callbacks.
+        :param trade_data:
+        :return:
+        """
         self._cmd_input.put(
-            self.Command(name="trade", data=trade_data)
+            self.Command(name="trade", data=dict(trade_data))
         )
 
     def __append_bar(self, bar: Bar):
         # last kline cache is not finished in retrieve result
-        if bar.ts == self._kline_cache[-1].ts:
+        if self._kline_cache and bar.ts == self._kline_cache[-1].ts:
             self._kline_cache[-1] = bar
         else:
             self._kline_cache.append(bar)
@@ -455,6 +524,24 @@ class Kline(object):
 
         return is_in_bar, bar_lag_count
 
+    def __start_bar(self, ts: arrow.arrow.Arrow):
+        precise_secs = re.compile(
+            r"(?P<duration>\d+)(?P<unit>[mhDW]?)").match(
+            self._precise).groupdict()
+
+        self.__convert_resolution(duration=precise_secs["duration"],
+                                  unit=precise_secs["unit"])
+
+        unit = self.__unit_keywords(self._precise_unit)
+
+        bar_ts = ts.floor(unit)
+        bar_ts = bar_ts.shift(**{
+            unit + "s": -(getattr(bar_ts, unit) %
+                          int(self._precise_multiplier))})
+
+        self._latest_bar_data = self.__new_bar_data()
+        self._latest_bar_data["ts"] = bar_ts
+
     def is_same_bar_tick(self, trade_data):
         if not self._latest_bar_data:
             return False
@@ -465,7 +552,7 @@ class Kline(object):
     @condition_waiter(bool_attr="_finished",
                       condition_attr="_wait_condition")
     def __trade_handler(self, trade_data):
-        if not self._kline_cache:
+        if not self._kline_cache and not self.offline:
             self.retrieve_bars(count=20)
 
         if isinstance(trade_data["timestamp"], int):
@@ -475,6 +562,13 @@ class Kline(object):
             trade_data["timestamp"] = arrow.get(
                 trade_data["timestamp"]).to("local")
 
+        if not self._latest_bar_data:
+            # offline kline starts from first real trade
+            if not trade_data["price"]:
+                return
+
+            self.__start_bar(trade_data["timestamp"])
+
         if trade_data["timestamp"] < self._latest_bar_data["ts"]:
             logger.debug(
                 "trade tick[{}] is older than kline cache[{}].".format(
@@ -545,32 +639,121 @@ class Trader(NGEWebsocket):
 
     MAX_KLINE_LEN = 1000
 
+    # tables are read by strategy threads, snapshot() copies exposed
+    # tables on next write only
+    COPY_ON_WRITE = True
+
+    DISPATCH_TYPES = ("trade", "order", "execution")
+
+    # Compare orderBookL2 with REST snapshot in seconds, 0 for disabled.
+    INTEGRITY_CHECK_INTERVAL = 0
+
+    # Seconds waiting for each worker thread when stopped.
+    STOP_TIMEOUT = 10
+
     def __init__(self, host="https://www.btcmex.com",
-                 symbol="XBTUSD", api_key="", api_secret=""):
+                 symbol="XBTUSD", api_key="", api_secret="",
+                 ws_opts=None, dispatch_opts=None, book_interval=None,
+                 batch_opts=None):
+        """
+        :param ws_opts: extra NGEWebsocket arguments
+        :param dispatch_opts: CallbackDispatcher arguments of callback
+        type("trade", "order", "execution"), callbacks are invoked in
+        websocket thread by default
+        :param book_interval: conflate on_book() callbacks in interval
+        seconds, 0 for delivering when last callback returned, None for
+        invoking on every orderBookL2 message in websocket thread
+        :param batch_opts: OrderBatcher arguments, orders are batched by
+        self.order_batcher if specified
+        """
         self._host = host
         self._api_key = api_key
         self._api_secret = api_secret
 
         self._order_cache = defaultdict(OrderedDict)
 
+        dispatch_opts = dispatch_opts or dict()
+        self._dispatchers = {
+            name: CallbackDispatcher(name,
+                                     **dispatch_opts.get(name, dict()))
+            for name in self.DISPATCH_TYPES}
+
+        if book_interval is None:
+            self._book_conflator = None
+        else:
+            self._book_conflator = BookConflator(self.on_book,
+                                                 interval=book_interval)
+
         self._rest_client = api(host=self._host,
                                 api_key=self._api_key,
                                 api_secret=self._api_secret)
 
+        # orders sent by self.order_entry & self.order_batcher are tracked
+        self.order_latency = OrderLatencyTracker()
+
+        self.order_entry = None
+        if self._api_key and self._api_secret:
+            self.order_entry = OrderEntryClient(
+                self._host, self._api_key, self._api_secret,
+                tracker=self.order_latency)
+
+        self.order_batcher = None
+        if batch_opts is not None:
+            if not self.order_entry:
+                raise ValueError("api key & secret are required.")
+
+            self.order_batcher = OrderBatcher(self.order_entry,
+                                              **batch_opts)
+
         super(Trader, self).__init__(host=self._host,
                                      symbol=symbol,
                                      api_key=self._api_key,
-                                     api_secret=self._api_secret)
+                                     api_secret=self._api_secret,
+                                     **(ws_opts or dict()))
 
-        self.kline = Kline(host=self._host, symbol=symbol,
+        self.kline = Kline(host=self._host, symbol=self.symbol,
                            bar_callback=self.on_bar,
-                           running=self._running_flag)
+                           running=self._running_flag,
+                           clock=self.clock)
+
+        self.integrity_checker = BookIntegrityChecker(
+            self, self._fetch_book, interval=self.INTEGRITY_CHECK_INTERVAL,
+            running=self._running_flag)
 
         self.running = True
 
+    @property
+    def running(self):
+        return super(Trader, self).running
+
+    @running.setter
+    def running(self, value):
+        # websocket class in MRO, e.g. AsyncNGEWebsocket for AsyncTrader
+        super(Trader, type(self)).running.fset(self, value)
+
+        if not value:
+            self._stop_workers()
+
+    def _stop_workers(self):
+        """
+        Stop worker threads after websocket stopped, queued callbacks
+        are finished and pending order intents are sent before stopped.
+        :return:
+        """
+        for dispatcher in self._dispatchers.values():
+            dispatcher.stop(self.STOP_TIMEOUT)
+
+        # callbacks may queue orders, so flush after dispatchers stopped
+        if self.order_batcher:
+            self.order_batcher.stop(self.STOP_TIMEOUT)
+
+        if self._book_conflator:
+            self._book_conflator.stop(self.STOP_TIMEOUT)
+
     @property
     def buy_side(self):
-        buy_side = [o for o in self.data["orderBookL2"] if o["side"] == "Buy"]
+        buy_side = [o for o in self.snapshot().tables["orderBookL2"]
+                    if o["side"] == "Buy"]
         buy_side.sort(key=lambda o: o["price"], reverse=True)
 
         return buy_side
@@ -581,7 +764,8 @@ class Trader(NGEWebsocket):
 
     @property
     def sell_side(self):
-        sell_side = [o for o in self.data["orderBookL2"] if o["side"] == "Sell"]
+        sell_side = [o for o in self.snapshot().tables["orderBookL2"]
+                     if o["side"] == "Sell"]
         sell_side.sort(key=lambda o: o["price"])
 
         return sell_side
@@ -594,6 +778,44 @@ class Trader(NGEWebsocket):
     def best_quote(self):
         return self.best_sell, self.best_buy
 
+    def _fetch_book(self, symbol, depth):
+        book, _ = self._rest_client.OrderBook.OrderBook_getL2(
+            symbol=symbol, depth=depth).result()
+
+        return book
+
+    def dispatch_metrics(self):
+        """
+        Get callback dispatchers' metrics.
+        :return: dict of callback type -> metrics
+        """
+        metrics = {name: dispatcher.metrics()
+                   for name, dispatcher in self._dispatchers.items()}
+
+        if self._book_conflator:
+            metrics["book"] = self._book_conflator.metrics()
+
+        return metrics
+
+    def order_latency_summary(self, reset=False):
+        """
+        Get order round trip latency summary.
+        :param reset: reset histograms after summarized
+        :return: dict of "<kind>.<phase>" -> summary, with counters
+        """
+        return self.order_latency.summary(reset=reset)
+
+    def rest_metrics(self, reset=False):
+        """
+        Get REST request metrics of swagger client's session.
+        :param reset: reset metrics after summarized
+        :return: dict of operation -> summary, with in flight gauges
+        """
+        metrics = getattr(self._rest_client.swagger_spec.http_client.session,
+                          "metrics", None)
+
+        return metrics.summary(reset=reset) if metrics else dict()
+
     def join(self, timeout=None):
         while self.running:
             if self.wst and self.wst.is_alive():
@@ -614,6 +836,17 @@ class Trader(NGEWebsocket):
     def on_bar(self, bar: Bar):
         pprint(bar)
 
+    def on_book(self, symbol: str, changes: dict, ts: int = None):
+        """
+        Order book changed.
+        :param symbol:
+        :param changes: dict of price id -> latest whole row, None if
+        deleted, changes is None if whole book is replaced
+        :param ts:
+        :return:
+        """
+        pass
+
     def on_rtn_order(self, order_data: dict, ts: int = None):
         pass
 
@@ -626,22 +859,23 @@ class Trader(NGEWebsocket):
         ts = message.get("@timestamp", None)
 
         if table_name == "trade":
-            for trade_data in self.recent_trades():
-                self.kline.notify_trade(trade_data)
+            for trade_data in message["data"]:
+                # kline is built for primary symbol only
+                if trade_data["symbol"] == self.symbol:
+                    self.kline.notify_trade(trade_data)
 
         if table_name == "order":
             for his_order in message["data"]:
-                try:
-                    self.on_rtn_order(order_data=his_order, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["order"].dispatch(
+                    self.on_rtn_order, his_order, ts=ts)
 
         if table_name == "execution":
             for his_exe in message["data"]:
-                try:
-                    self.on_rtn_trade(trade_data=his_exe, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["execution"].dispatch(
+                    self.on_rtn_trade, his_exe, ts=ts)
+
+        if table_name == "orderBookL2":
+            self._notify_book("partial", message)
 
     def _insert_handler(self, table_name, message):
         super(Trader, self)._insert_handler(table_name, message)
@@ -651,45 +885,93 @@ class Trader(NGEWebsocket):
         if table_name == "trade":
             for trade_data in message["data"]:
                 # sequence can not be revered
-                try:
-                    self.on_trade(trade_data=trade_data, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["trade"].dispatch(
+                    self.on_trade, trade_data, ts=ts)
+
+                if trade_data["symbol"] == self.symbol:
+                    self.kline.notify_trade(trade_data)
 
-                self.kline.notify_trade(trade_data)
+        if table_name in ("order", "execution"):
+            self._track_orders(message)
 
         if table_name == "order":
             for order_data in message["data"]:
-                try:
-                    self.on_rtn_order(order_data=order_data, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["order"].dispatch(
+                    self.on_rtn_order, order_data, ts=ts)
 
         if table_name == "execution":
             for exe in message["data"]:
-                try:
-                    self.on_rtn_trade(trade_data=exe, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["execution"].dispatch(
+                    self.on_rtn_trade, exe, ts=ts)
+
+        if table_name == "orderBookL2":
+            self._notify_book("insert", message)
 
     def _update_handler(self, table_name, message):
         super(Trader, self)._update_handler(table_name, message)
 
         ts = message.get("@timestamp", None)
 
+        if table_name in ("order", "execution"):
+            self._track_orders(message)
+
         if table_name == "order":
             for order_data in message["data"]:
-                try:
-                    self.on_rtn_order(order_data=order_data, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["order"].dispatch(
+                    self.on_rtn_order, order_data, ts=ts)
 
         if table_name == "execution":
             for exe in message["data"]:
-                try:
-                    self.on_rtn_trade(trade_data=exe, ts=ts)
-                except Exception as e:
-                    self.logger.exception(e)
+                self._dispatchers["execution"].dispatch(
+                    self.on_rtn_trade, exe, ts=ts)
+
+        if table_name == "orderBookL2":
+            # update messages carry changed fields only
+            self._notify_book("update", message, self._updated_rows)
+
+    def _delete_handler(self, table_name, message):
+        super(Trader, self)._delete_handler(table_name, message)
+
+        if table_name == "orderBookL2":
+            self._notify_book("delete", message)
+
+    def _track_orders(self, message):
+        for row in message["data"]:
+            self.order_latency.on_event(row, ts=self._received_ns)
+
+    def _notify_book(self, action, message, data=None):
+        """
+        :param action:
+        :param message:
+        :param data: rows notified instead of message's
+        :return:
+        """
+        ts = message.get("@timestamp", None)
+
+        rows = OrderedDict()
+
+        if action == "partial":
+            symbol = message.get("filter", dict()).get("symbol")
+            if symbol:
+                rows[symbol] = list()
+
+        for row in message["data"] if data is None else data:
+            rows.setdefault(row["symbol"], list()).append(row)
+
+        for symbol, data in rows.items():
+            if self._book_conflator:
+                self._book_conflator.add(symbol, action, data, ts)
+                continue
+
+            if action == "partial":
+                changes = None
+            else:
+                changes = merge_book_changes(dict(), action, data)
+
+            try:
+                self.on_book(symbol, changes, ts=ts)
+            except Exception as e:
+                self.logger.exception(e)
 
     def __getattr__(self, item):
         return getattr(self._rest_client, item)
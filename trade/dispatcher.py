@@ -0,0 +1,373 @@
+# coding: utf-8
+import logging
+import time
+
+from collections import deque, OrderedDict
+from threading import Condition, Event, Lock, Thread, current_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchMode(object):
+    # invoke callback in caller(websocket) thread
+    INLINE = "inline"
+    # one dedicated worker, callbacks are invoked in dispatching order
+    SINGLE = "single"
+    # worker pool partitioned by key, same key is always dispatched to
+    # same worker, so order is preserved per key
+    PARTITIONED = "partitioned"
+
+
+class QueuePolicy(object):
+    # wait for queue space, back pressure to caller
+    BLOCK = "block"
+    # drop the new callback when queue is full
+    DROP_NEWEST = "drop_newest"
+    # drop the oldest pending callback when queue is full
+    DROP_OLDEST = "drop_oldest"
+    # replace pending callback with same key by the new one,
+    # consumer will only see latest data of that key
+    COALESCE = "coalesce"
+
+
+class _Worker(object):
+    def __init__(self, name, max_queue, policy):
+        self._max_queue = max_queue
+        self._policy = policy
+
+        self._queue = deque()
+        # key -> pending entry, for coalescing
+        self._pending = dict()
+        self._condition = Condition()
+        self._stopped = False
+
+        self.max_depth = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+        self._thread = Thread(target=self.__run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def put(self, key, func, args, kwargs):
+        with self._condition:
+            if self._policy == QueuePolicy.COALESCE and key is not None:
+                entry = self._pending.get(key)
+
+                if entry is not None:
+                    # keep queue position, replace with latest data
+                    entry[1:] = func, args, kwargs
+                    self.coalesced += 1
+                    return
+
+            if self._max_queue and len(self._queue) >= self._max_queue:
+                if self._policy == QueuePolicy.BLOCK:
+                    self._condition.wait_for(
+                        lambda: (len(self._queue) < self._max_queue or
+                                 self._stopped))
+                elif self._policy == QueuePolicy.DROP_OLDEST:
+                    self.__discard(self._queue.popleft())
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return
+
+            entry = [key, func, args, kwargs]
+            self._queue.append(entry)
+
+            if self._policy == QueuePolicy.COALESCE and key is not None:
+                self._pending[key] = entry
+
+            self.max_depth = max(self.max_depth, len(self._queue))
+
+            self._condition.notify_all()
+
+    def __discard(self, entry):
+        if self._pending.get(entry[0]) is entry:
+            self._pending.pop(entry[0])
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def join(self, timeout=None):
+        # stopped by callback in worker thread itself
+        if self._thread is not current_thread():
+            self._thread.join(timeout)
+
+    def __run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._queue or self._stopped)
+
+                if not self._queue:
+                    return
+
+                entry = self._queue.popleft()
+                self.__discard(entry)
+
+                self._condition.notify_all()
+
+            _, func, args, kwargs = entry
+
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.exception(e)
+
+            self.dispatched += 1
+
+
+class CallbackDispatcher(object):
+    """
+    Dispatch callbacks inline or to worker threads with bounded queues.
+    """
+
+    DEFAULT_MAX_QUEUE = 10000
+
+    def __init__(self, name, mode=DispatchMode.INLINE, workers=1, key=None,
+                 max_queue=DEFAULT_MAX_QUEUE, policy=QueuePolicy.BLOCK):
+        """
+        :param name: dispatcher name
+        :param mode: DispatchMode
+        :param workers: worker count in PARTITIONED mode
+        :param key: field name or function to get partition &
+        coalescing key from first callback argument
+        :param max_queue: max pending callbacks per worker, 0 is unbounded
+        :param policy: QueuePolicy when queue is full
+        """
+        if mode not in (DispatchMode.INLINE, DispatchMode.SINGLE,
+                        DispatchMode.PARTITIONED):
+            raise ValueError("invalid dispatch mode: {}".format(mode))
+
+        if mode == DispatchMode.PARTITIONED and not key:
+            raise ValueError("key is required in partitioned mode.")
+
+        if policy == QueuePolicy.COALESCE and not key:
+            raise ValueError("key is required for coalescing.")
+
+        self._name = name
+        self._mode = mode
+
+        if isinstance(key, str):
+            field = key
+
+            def key(data):
+                return data.get(field)
+
+        self._key_func = key
+
+        self.dispatched = 0
+
+        if mode == DispatchMode.INLINE:
+            workers = 0
+        elif mode == DispatchMode.SINGLE:
+            workers = 1
+
+        self._workers = [
+            _Worker("{}-dispatcher-{}".format(name, idx), max_queue, policy)
+            for idx in range(workers)]
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def dispatch(self, func, *args, **kwargs):
+        """
+        Dispatch callback, exceptions in callback are logged.
+        :param func: callback function
+        :param args: callback arguments, first one is used to get key
+        :param kwargs: callback keyword arguments
+        :return:
+        """
+        if not self._workers:
+            self.dispatched += 1
+
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.exception(e)
+
+            return
+
+        key = self._key_func(args[0]) if self._key_func else None
+
+        if len(self._workers) > 1:
+            worker = self._workers[hash(key) % len(self._workers)]
+        else:
+            worker = self._workers[0]
+
+        worker.put(key, func, args, kwargs)
+
+    def metrics(self):
+        """
+        Get dispatcher metrics.
+        :return: dict of mode, per worker queue depth and counters
+        """
+        if not self._workers:
+            return {"mode": self._mode, "depth": [], "max_depth": 0,
+                    "dispatched": self.dispatched, "dropped": 0,
+                    "coalesced": 0}
+
+        return {
+            "mode": self._mode,
+            "depth": [w.depth for w in self._workers],
+            "max_depth": max(w.max_depth for w in self._workers),
+            "dispatched": sum(w.dispatched for w in self._workers),
+            "dropped": sum(w.dropped for w in self._workers),
+            "coalesced": sum(w.coalesced for w in self._workers)
+        }
+
+    def stop(self, timeout=None):
+        """
+        Stop workers after pending callbacks finished.
+        :param timeout:
+        :return:
+        """
+        for worker in self._workers:
+            worker.stop()
+
+        for worker in self._workers:
+            worker.join(timeout)
+
+
+def merge_book_changes(changes, action, rows):
+    """
+    Merge orderBookL2 rows into pending changes by price id.
+    :param changes: dict of id -> latest row, None if deleted
+    :param action: insert, update or delete
+    :param rows: whole rows for insert & update, e.g. table rows after
+    update applied, changed fields of update are merged into pending
+    row; keys only for delete
+    :return: changes
+    """
+    for row in rows:
+        if action == "delete":
+            changes[row["id"]] = None
+            continue
+
+        pending = changes.get(row["id"])
+
+        if action == "update" and pending is not None:
+            pending = dict(pending)
+            pending.update(row)
+            changes[row["id"]] = pending
+        else:
+            changes[row["id"]] = dict(row)
+
+    return changes
+
+
+class BookConflator(object):
+    """
+    Conflate orderBookL2 changes per symbol & price id, deliver at most
+    one callback per symbol in every interval. With interval 0, changes
+    are delivered as soon as last callback returns, so a slow consumer
+    receives merged changes instead of a growing backlog.
+    """
+
+    def __init__(self, callback, interval=0, name="book"):
+        """
+        :param callback: function(symbol, changes, ts), changes is None
+        if whole book is replaced by partial
+        :param interval: min seconds between deliveries
+        :param name: worker thread name
+        """
+        self._callback = callback
+        self._interval = interval
+
+        # symbol -> pending changes, None for book reset
+        self._pending = OrderedDict()
+        self._timestamps = dict()
+        self._lock = Lock()
+        self._ready = Event()
+        self._stopping = Event()
+        self._stopped = False
+
+        self.received = 0
+        self.delivered = 0
+
+        self._thread = Thread(target=self.__run,
+                              name="{}-conflator".format(name))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add(self, symbol, action, rows, ts=None):
+        with self._lock:
+            self.received += 1
+
+            if action == "partial":
+                self._pending[symbol] = None
+            else:
+                changes = self._pending.setdefault(symbol, dict())
+
+                # changes are already covered by book reset
+                if changes is not None:
+                    merge_book_changes(changes, action, rows)
+
+            self._timestamps[symbol] = ts
+
+            self._ready.set()
+
+    def metrics(self):
+        return {"received": self.received, "delivered": self.delivered,
+                "pending": len(self._pending)}
+
+    def stop(self, timeout=None):
+        """
+        Stop worker after pending changes delivered.
+        :param timeout:
+        :return:
+        """
+        with self._lock:
+            self._stopped = True
+            self._stopping.set()
+            self._ready.set()
+
+        # stopped by callback in conflator thread itself
+        if self._thread is not current_thread():
+            self._thread.join(timeout)
+
+    def __run(self):
+        last_delivery = 0
+
+        while True:
+            self._ready.wait()
+
+            # pending changes are delivered before stopped
+            if self._stopped and not self._pending:
+                return
+
+            delay = last_delivery + self._interval - time.time()
+            if delay > 0:
+                # interrupted by stop()
+                self._stopping.wait(delay)
+
+            with self._lock:
+                pending, self._pending = self._pending, OrderedDict()
+                timestamps, self._timestamps = self._timestamps, dict()
+
+                if not self._stopped:
+                    self._ready.clear()
+
+            for symbol, changes in pending.items():
+                try:
+                    self._callback(symbol, changes, timestamps.get(symbol))
+                except Exception as e:
+                    logger.exception(e)
+
+                self.delivered += 1
+
+            last_delivery = time.time()
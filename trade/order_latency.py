@@ -0,0 +1,258 @@
+# coding: utf-8
+import time
+
+from collections import OrderedDict, deque
+from threading import Lock
+
+from common.metrics import LatencyRecorder
+
+
+class _Entry(object):
+    __slots__ = ("kind", "submit_ns", "rest_ns", "ws_ns", "order_id",
+                 "cl_ord_id")
+
+    def __init__(self, kind, submit_ns, order_id, cl_ord_id):
+        self.kind = kind
+        self.submit_ns = submit_ns
+        self.rest_ns = None
+        self.ws_ns = None
+        self.order_id = order_id
+        self.cl_ord_id = cl_ord_id
+
+
+class OrderLatencyTracker(object):
+    """
+    Order round trip latency from REST submit to websocket event.
+
+    Each submitted order is tracked by orderID or clOrdID, latencies in
+    nanoseconds are recorded in histograms named by "<kind>.<phase>":
+        rest: from submit to REST response
+        ws: from submit to first order/execution event
+        ws_after_rest: from REST response to first websocket event,
+            only if event arrives after response
+    Entries are dropped when both REST response and websocket event
+    received, or expired by max_pending & max_age, so memory is bounded.
+    Events of orderID not responded yet are kept shortly for matching
+    later response, as websocket may be faster than REST.
+    Timestamps are in time.perf_counter_ns().
+    """
+
+    NEW = "new"
+    AMEND = "amend"
+    CANCEL = "cancel"
+
+    MAX_PENDING = 10000
+    # seconds
+    MAX_AGE = 60
+
+    def __init__(self, max_pending=MAX_PENDING, max_age=MAX_AGE):
+        """
+        :param max_pending: max tracking orders
+        :param max_age: max seconds tracking an order
+        """
+        self._max_pending = max_pending
+        self._max_age_ns = int(max_age * 1000000000)
+
+        self.latency = LatencyRecorder()
+
+        self._lock = Lock()
+        # id(entry) -> entry in submitting order
+        self._pending = OrderedDict()
+        # order id / client order id -> entries waiting for event
+        self._by_id = dict()
+        # order id -> event ns of events not matched yet
+        self._early = OrderedDict()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+
+    def _index(self, entry, order_id):
+        if order_id:
+            self._by_id.setdefault(order_id, deque()).append(entry)
+
+    def _unindex(self, entry):
+        for order_id in (entry.order_id, entry.cl_ord_id):
+            entries = self._by_id.get(order_id)
+
+            if entries is None:
+                continue
+
+            try:
+                entries.remove(entry)
+            except ValueError:
+                pass
+
+            if not entries:
+                self._by_id.pop(order_id, None)
+
+    def _drop(self, entry):
+        self._pending.pop(id(entry), None)
+        self._unindex(entry)
+
+    def _expire(self, now):
+        deadline = now - self._max_age_ns
+
+        while self._pending:
+            entry = next(iter(self._pending.values()))
+
+            if (len(self._pending) < self._max_pending and
+                    entry.submit_ns >= deadline):
+                break
+
+            self._drop(entry)
+            self.expired += 1
+
+        while self._early:
+            order_id, event_ns = next(iter(self._early.items()))
+
+            if (len(self._early) < self._max_pending and
+                    event_ns >= deadline):
+                break
+
+            self._early.popitem(last=False)
+
+    def _record(self, entry, phase, value):
+        self.latency.record("{}.{}".format(entry.kind, phase), value)
+
+    def _complete(self, entry):
+        if entry.rest_ns is not None and entry.ws_ns is not None:
+            self._drop(entry)
+            self.completed += 1
+
+    def _on_ws(self, entry, event_ns):
+        entry.ws_ns = event_ns
+        self._record(entry, "ws", event_ns - entry.submit_ns)
+
+        if entry.rest_ns is not None and event_ns >= entry.rest_ns:
+            self._record(entry, "ws_after_rest", event_ns - entry.rest_ns)
+
+        self._unindex(entry)
+        self._complete(entry)
+
+    def submit(self, kind, orderID=None, clOrdID=None, ts=None):
+        """
+        Start tracking an order request.
+        :param kind: NEW, AMEND or CANCEL
+        :param orderID:
+        :param clOrdID:
+        :param ts: submit timestamp, now if not specified
+        :return: tracking entry
+        """
+        submit_ns = ts or time.perf_counter_ns()
+
+        with self._lock:
+            self._expire(submit_ns)
+
+            entry = _Entry(kind, submit_ns, orderID, clOrdID)
+
+            self._pending[id(entry)] = entry
+            self._index(entry, orderID)
+            self._index(entry, clOrdID)
+
+            self.submitted += 1
+
+        return entry
+
+    def responded(self, entry, orderID=None, ts=None):
+        """
+        REST response received.
+        :param entry: returned by submit()
+        :param orderID: order id in response
+        :param ts: response timestamp, now if not specified
+        :return:
+        """
+        rest_ns = ts or time.perf_counter_ns()
+
+        with self._lock:
+            if id(entry) not in self._pending:
+                return
+
+            entry.rest_ns = rest_ns
+            self._record(entry, "rest", rest_ns - entry.submit_ns)
+
+            if entry.ws_ns is None and orderID and not entry.order_id:
+                entry.order_id = orderID
+
+                event_ns = self._early.pop(orderID, None)
+
+                if event_ns is not None and event_ns >= entry.submit_ns:
+                    self._on_ws(entry, event_ns)
+                    return
+
+                self._index(entry, orderID)
+
+            self._complete(entry)
+
+    def fail(self, entry):
+        """
+        Stop tracking an order request failed.
+        :param entry: returned by submit()
+        :return:
+        """
+        with self._lock:
+            if id(entry) in self._pending:
+                self._drop(entry)
+                self.failed += 1
+
+    def on_event(self, row, ts=None):
+        """
+        Websocket order or execution row received.
+        :param row: order / execution row
+        :param ts: event timestamp, now if not specified
+        :return: True if matched a tracking order
+        """
+        event_ns = ts or time.perf_counter_ns()
+
+        order_id = row.get("orderID")
+
+        with self._lock:
+            for key in (order_id, row.get("clOrdID")):
+                entries = self._by_id.get(key) if key else None
+
+                if entries:
+                    self._on_ws(entries[0], event_ns)
+                    return True
+
+            if order_id and self._pending:
+                self._early.setdefault(order_id, event_ns)
+
+        return False
+
+    def pending(self):
+        return len(self._pending)
+
+    def percentile(self, kind, percent, phase="ws"):
+        """
+        :param kind: NEW, AMEND or CANCEL
+        :param percent: e.g. 99
+        :param phase: rest, ws or ws_after_rest
+        :return: latency in nanoseconds, None if not recorded
+        """
+        with self._lock:
+            histogram = self.latency.histogram("{}.{}".format(kind, phase))
+
+            if not histogram.count:
+                return None
+
+            return histogram.percentile(percent)
+
+    def summary(self, reset=False):
+        """
+        :param reset: reset histograms after summarized
+        :return: dict of histogram name -> summary, with counters
+        """
+        with self._lock:
+            result = OrderedDict(
+                (name, summary) for name, summary in
+                self.latency.summary(reset=reset).items()
+                if summary["count"])
+
+            result["submitted"] = self.submitted
+            result["completed"] = self.completed
+            result["failed"] = self.failed
+            result["expired"] = self.expired
+            result["pending"] = len(self._pending)
+
+        return result
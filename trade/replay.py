@@ -0,0 +1,35 @@
+# coding: utf-8
+from clients.replay import ReplayWebsocket
+
+from trade.core import Trader
+
+
+class ReplayTrader(Trader, ReplayWebsocket):
+    """
+    Trader replaying captured frames.
+
+    Construct it as Trader with ws_opts={"source": ..., "speed": ...},
+    then call replay() or start(). Kline bar timer runs on replay's
+    virtual clock, with host None bars are built from replayed trades
+    only and no request is sent.
+    """
+
+    def _on_replay_finished(self):
+        # bars are handled in kline thread
+        self.kline.drain()
+
+
+def replay_class(trader_cls):
+    """
+    Make replay version of Trader subclass, e.g. strategies.
+    :param trader_cls:
+    :return: subclass of trader_cls and ReplayTrader
+    """
+    if issubclass(trader_cls, ReplayTrader):
+        return trader_cls
+
+    if trader_cls is Trader:
+        return ReplayTrader
+
+    return type("Replay" + trader_cls.__name__,
+                (trader_cls, ReplayTrader), dict())
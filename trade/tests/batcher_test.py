@@ -0,0 +1,157 @@
+# coding: utf-8
+import time
+import unittest
+
+from threading import Lock
+
+from ..batcher import OrderBatcher
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.calls = list()
+        self._lock = Lock()
+
+    def _record(self, name, params):
+        with self._lock:
+            self.calls.append((name, params))
+
+    def new(self, **order):
+        self._record("new", order)
+        return dict(order, orderID="id-single"), None
+
+    def new_bulk(self, orders):
+        self._record("new_bulk", orders)
+        return [dict(order, orderID="id-{}".format(idx))
+                for idx, order in enumerate(orders)], None
+
+    def amend(self, **order):
+        self._record("amend", order)
+        return dict(order), None
+
+    def amend_bulk(self, orders):
+        self._record("amend_bulk", orders)
+
+        results = list()
+
+        for order in orders:
+            # orders not amended are absent from result
+            if "missing" in (order.get("orderID"),
+                             order.get("origClOrdID")):
+                continue
+
+            result = dict(order)
+
+            if "origClOrdID" in result:
+                orig_id = result.pop("origClOrdID")
+                result.setdefault("clOrdID", orig_id)
+                result["orderID"] = "id-" + orig_id
+
+            results.append(result)
+
+        return results, None
+
+    def cancel(self, orderID=None, clOrdID=None):
+        self._record("cancel", orderID or clOrdID)
+
+        if orderID == "bad":
+            raise ValueError("rejected")
+
+        ids = orderID if isinstance(orderID, list) else [orderID]
+        return [{"orderID": i, "ordStatus": "Canceled"} for i in ids], None
+
+
+class OrderBatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = FakeClient()
+        self.batcher = OrderBatcher(self.client, window=0.1)
+        self.addCleanup(self.batcher.stop)
+
+    def test_bulk(self):
+        futures = [self.batcher.new(symbol="XBTUSD", side="Buy",
+                                    orderQty=1, price=100 + idx)
+                   for idx in range(5)]
+
+        results = [future.result(timeout=1) for future in futures]
+
+        self.assertEqual(["id-{}".format(idx) for idx in range(5)],
+                         [result["orderID"] for result in results])
+        self.assertEqual(104, results[-1]["price"])
+        self.assertEqual(["new_bulk"],
+                         [name for name, _ in self.client.calls])
+
+        metrics = self.batcher.metrics()
+        self.assertEqual((5, 1, 1, 0), (metrics["intents"],
+                                        metrics["requests"],
+                                        metrics["batches"],
+                                        metrics["pending"]))
+
+    def test_single_and_missing(self):
+        self.assertEqual("id-single", self.batcher.new(
+            symbol="XBTUSD").result(timeout=1)["orderID"])
+
+        amended = self.batcher.amend(orderID="1", price=101)
+        missing = self.batcher.amend(orderID="missing", price=102)
+
+        self.assertEqual(101, amended.result(timeout=1)["price"])
+        with self.assertRaises(ValueError):
+            missing.result(timeout=1)
+
+        with self.assertRaises(ValueError):
+            self.batcher.amend(price=101)
+
+    def test_amend_by_client_id(self):
+        by_id = self.batcher.amend(orderID="1", price=101)
+        by_orig = self.batcher.amend(origClOrdID="a", price=102)
+        renamed = self.batcher.amend(origClOrdID="b", clOrdID="b2",
+                                     price=103)
+        missing = self.batcher.amend(origClOrdID="missing", price=104)
+
+        self.assertEqual(101, by_id.result(timeout=1)["price"])
+        self.assertEqual(("id-a", 102), (by_orig.result(timeout=1)["orderID"],
+                                         by_orig.result()["price"]))
+        self.assertEqual(("id-b", 103), (renamed.result(timeout=1)["orderID"],
+                                         renamed.result()["price"]))
+        with self.assertRaises(ValueError):
+            missing.result(timeout=1)
+
+        self.assertEqual(["amend_bulk"],
+                         [name for name, _ in self.client.calls])
+
+    def test_cancel_flush(self):
+        start = time.monotonic()
+
+        placed = self.batcher.new(symbol="XBTUSD", clOrdID="a")
+        amended = self.batcher.amend(orderID="1", price=101)
+        canceled = [self.batcher.cancel(orderID=order_id)
+                    for order_id in ("1", "2")]
+
+        self.assertEqual("Canceled",
+                         canceled[1].result(timeout=1)["ordStatus"])
+        # flushed by cancel without waiting window
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        self.assertTrue(placed.done() and amended.done())
+        self.assertEqual(["new", "amend", "cancel"],
+                         [name for name, _ in self.client.calls])
+        self.assertEqual(["1", "2"], self.client.calls[-1][1])
+
+    def test_error(self):
+        canceled = self.batcher.cancel(orderID="bad")
+
+        with self.assertRaises(ValueError):
+            canceled.result(timeout=1)
+
+        self.assertEqual(1, self.batcher.metrics()["errors"])
+
+        with self.assertRaises(ValueError):
+            self.batcher.cancel()
+
+    def test_stop(self):
+        future = self.batcher.new(symbol="XBTUSD")
+
+        self.batcher.stop()
+
+        self.assertTrue(future.done())
+        with self.assertRaises(RuntimeError):
+            self.batcher.new(symbol="XBTUSD")
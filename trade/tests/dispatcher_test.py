@@ -0,0 +1,193 @@
+# coding: utf-8
+import time
+import unittest
+
+from threading import Event
+
+from ..dispatcher import (
+    BookConflator, CallbackDispatcher, DispatchMode, QueuePolicy,
+    merge_book_changes)
+
+
+class CallbackDispatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.received = list()
+        self.blocker = Event()
+
+    def _callback(self, data, ts=None):
+        self.blocker.wait(1)
+        self.received.append((data["orderID"], data["size"], ts))
+
+    def _dispatcher(self, **kwargs):
+        dispatcher = CallbackDispatcher("order", **kwargs)
+        self.addCleanup(dispatcher.stop, 1)
+
+        return dispatcher
+
+    def test_inline(self):
+        self.blocker.set()
+        dispatcher = self._dispatcher()
+
+        dispatcher.dispatch(self._callback, {"orderID": 1, "size": 1}, ts=1)
+        # exceptions are not raised to caller
+        dispatcher.dispatch(self._callback, {})
+
+        self.assertEqual([(1, 1, 1)], self.received)
+        self.assertEqual(2, dispatcher.metrics()["dispatched"])
+
+    def test_partitioned_order(self):
+        self.blocker.set()
+        dispatcher = self._dispatcher(mode=DispatchMode.PARTITIONED,
+                                      workers=4, key="orderID",
+                                      max_queue=0)
+
+        for size in range(100):
+            for order_id in range(8):
+                dispatcher.dispatch(self._callback,
+                                    {"orderID": order_id, "size": size})
+
+        dispatcher.stop(1)
+
+        self.assertEqual(800, len(self.received))
+        for order_id in range(8):
+            self.assertEqual(
+                list(range(100)),
+                [size for oid, size, _ in self.received if oid == order_id])
+
+    def test_coalesce(self):
+        dispatcher = self._dispatcher(mode=DispatchMode.SINGLE,
+                                      key="orderID",
+                                      policy=QueuePolicy.COALESCE)
+
+        for size in range(10):
+            for order_id in range(3):
+                dispatcher.dispatch(self._callback,
+                                    {"orderID": order_id, "size": size})
+
+        self.blocker.set()
+        dispatcher.stop(1)
+
+        metrics = dispatcher.metrics()
+        # first callback may be taken by worker before coalescing
+        self.assertGreaterEqual(metrics["coalesced"], 26)
+        self.assertEqual(30, metrics["dispatched"] + metrics["coalesced"])
+        self.assertEqual([(0, 9, None), (1, 9, None), (2, 9, None)],
+                         self.received[-3:])
+
+    def test_drop(self):
+        dispatcher = self._dispatcher(mode=DispatchMode.SINGLE, max_queue=5,
+                                      policy=QueuePolicy.DROP_OLDEST)
+
+        for size in range(20):
+            dispatcher.dispatch(self._callback, {"orderID": 1, "size": size})
+
+        self.assertEqual(5, dispatcher.metrics()["max_depth"])
+
+        self.blocker.set()
+        dispatcher.stop(1)
+
+        metrics = dispatcher.metrics()
+        self.assertEqual(20, metrics["dispatched"] + metrics["dropped"])
+        self.assertEqual([15, 16, 17, 18, 19],
+                         [size for _, size, _ in self.received[-5:]])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            CallbackDispatcher("order", mode=DispatchMode.PARTITIONED)
+
+        with self.assertRaises(ValueError):
+            CallbackDispatcher("order", mode="unknown")
+
+
+class BookConflatorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.delivered = list()
+        self.blocker = Event()
+        self.done = Event()
+        self.entered = Event()
+
+    def _on_book(self, symbol, changes, ts):
+        self.entered.set()
+        self.blocker.wait(1)
+        self.delivered.append((symbol, changes, ts))
+
+        if ts == "last":
+            self.done.set()
+
+    def test_merge(self):
+        changes = merge_book_changes(dict(), "insert", [
+            {"id": 1, "side": "Buy", "price": 1.0, "size": 1},
+            {"id": 2, "side": "Buy", "price": 2.0, "size": 1}])
+        merge_book_changes(changes, "update", [{"id": 1, "size": 5}])
+        merge_book_changes(changes, "delete", [{"id": 2}])
+        merge_book_changes(changes, "update", [{"id": 3, "size": 3}])
+
+        self.assertEqual({1: {"id": 1, "side": "Buy", "price": 1.0,
+                              "size": 5},
+                          2: None,
+                          3: {"id": 3, "size": 3}}, changes)
+
+    def test_conflate_slow_consumer(self):
+        conflator = BookConflator(self._on_book)
+        self.addCleanup(conflator.stop, 1)
+
+        conflator.add("XBTUSD", "update", [{"id": 1, "size": 0}], ts=0)
+        self.assertTrue(self.entered.wait(1))
+
+        for size in range(1, 100):
+            conflator.add("XBTUSD", "update", [{"id": 1, "size": size}],
+                          ts=size)
+            conflator.add("ETHUSD", "update", [{"id": 1, "size": size}],
+                          ts=size)
+        conflator.add("XBTUSD", "partial", [], ts=100)
+        conflator.add("ETHUSD", "update", [{"id": 2, "size": 1}], ts="last")
+
+        self.blocker.set()
+        self.assertTrue(self.done.wait(1))
+        conflator.stop(1)
+
+        # one round after the blocking one
+        self.assertEqual(3, conflator.metrics()["delivered"])
+
+        latest = {symbol: (changes, ts)
+                  for symbol, changes, ts in self.delivered}
+        # book replaced by partial
+        self.assertEqual((None, 100), latest["XBTUSD"])
+        self.assertEqual(({1: {"id": 1, "size": 99},
+                           2: {"id": 2, "size": 1}}, "last"),
+                         latest["ETHUSD"])
+
+    def test_stop_delivers_pending(self):
+        conflator = BookConflator(self._on_book, interval=10)
+
+        conflator.add("XBTUSD", "insert", [{"id": 1, "size": 1}], ts=1)
+        self.blocker.set()
+        self.assertTrue(self.entered.wait(1))
+
+        # waiting for interval
+        conflator.add("XBTUSD", "update", [{"id": 1, "size": 2}], ts=2)
+        time.sleep(0.05)
+        conflator.stop(1)
+
+        self.assertEqual([1, 2], [ts for _, _, ts in self.delivered])
+        self.assertFalse(conflator._thread.is_alive())
+
+    def test_interval(self):
+        self.blocker.set()
+        conflator = BookConflator(self._on_book, interval=0.2)
+        self.addCleanup(conflator.stop, 1)
+
+        conflator.add("XBTUSD", "insert", [{"id": 1, "size": 1}], ts=1)
+        for _ in range(50):
+            if self.delivered:
+                break
+            time.sleep(0.01)
+
+        conflator.add("XBTUSD", "update", [{"id": 1, "size": 2}], ts=2)
+        conflator.add("XBTUSD", "update", [{"id": 1, "size": 3}],
+                      ts="last")
+
+        self.assertFalse(self.done.wait(0.1))
+        self.assertTrue(self.done.wait(1))
+
+        self.assertEqual([1, "last"], [ts for _, _, ts in self.delivered])
@@ -0,0 +1,107 @@
+# coding: utf-8
+import unittest
+
+from ..order_latency import OrderLatencyTracker
+
+
+MS = 1000000
+
+
+class OrderLatencyTrackerTest(unittest.TestCase):
+    def test_rest_then_event(self):
+        tracker = OrderLatencyTracker()
+
+        entry = tracker.submit(tracker.NEW, clOrdID="c1", ts=1 * MS)
+        tracker.responded(entry, orderID="o1", ts=3 * MS)
+
+        self.assertEqual(1, tracker.pending())
+
+        self.assertTrue(tracker.on_event({"orderID": "o1"}, ts=4 * MS))
+        self.assertEqual(0, tracker.pending())
+
+        self.assertEqual(2 * MS, tracker.percentile("new", 50, "rest"))
+        self.assertEqual(3 * MS, tracker.percentile("new", 50, "ws"))
+        self.assertEqual(
+            1 * MS, tracker.percentile("new", 50, "ws_after_rest"))
+
+        # later events of same order are not matched
+        self.assertFalse(tracker.on_event({"orderID": "o1"}, ts=5 * MS))
+
+        summary = tracker.summary()
+        self.assertEqual(1, summary["submitted"])
+        self.assertEqual(1, summary["completed"])
+        self.assertEqual(1, summary["new.ws"]["count"])
+
+    def test_event_by_client_order_id(self):
+        tracker = OrderLatencyTracker()
+
+        entry = tracker.submit(tracker.NEW, clOrdID="c1", ts=1 * MS)
+
+        self.assertTrue(tracker.on_event(
+            {"orderID": "o1", "clOrdID": "c1"}, ts=2 * MS))
+        tracker.responded(entry, orderID="o1", ts=5 * MS)
+
+        self.assertEqual(0, tracker.pending())
+        self.assertEqual(1 * MS, tracker.percentile("new", 50, "ws"))
+        self.assertEqual(4 * MS, tracker.percentile("new", 50, "rest"))
+        self.assertIsNone(tracker.percentile("new", 50, "ws_after_rest"))
+
+    def test_event_before_response(self):
+        tracker = OrderLatencyTracker()
+
+        entry = tracker.submit(tracker.NEW, ts=1 * MS)
+
+        # event without client order id arrives before REST response
+        self.assertFalse(tracker.on_event({"orderID": "o1"}, ts=2 * MS))
+        tracker.responded(entry, orderID="o1", ts=3 * MS)
+
+        self.assertEqual(0, tracker.pending())
+        self.assertEqual(1 * MS, tracker.percentile("new", 50, "ws"))
+
+    def test_amend_and_cancel(self):
+        tracker = OrderLatencyTracker()
+
+        amend = tracker.submit(tracker.AMEND, orderID="o1", ts=1 * MS)
+        cancel = tracker.submit(tracker.CANCEL, orderID="o1", ts=2 * MS)
+
+        # events of same order are matched in submitting order
+        tracker.on_event({"orderID": "o1"}, ts=4 * MS)
+        tracker.on_event({"orderID": "o1"}, ts=6 * MS)
+        tracker.responded(amend, ts=5 * MS)
+        tracker.responded(cancel, ts=7 * MS)
+
+        self.assertEqual(0, tracker.pending())
+        self.assertEqual(3 * MS, tracker.percentile("amend", 50))
+        self.assertEqual(4 * MS, tracker.percentile("cancel", 50))
+
+    def test_fail(self):
+        tracker = OrderLatencyTracker()
+
+        entry = tracker.submit(tracker.NEW, clOrdID="c1", ts=1 * MS)
+        tracker.fail(entry)
+
+        self.assertEqual(0, tracker.pending())
+        self.assertFalse(tracker.on_event({"clOrdID": "c1"}, ts=2 * MS))
+        self.assertEqual(1, tracker.summary()["failed"])
+
+    def test_bounded(self):
+        tracker = OrderLatencyTracker(max_pending=10, max_age=1)
+
+        for idx in range(100):
+            tracker.submit(tracker.NEW, clOrdID=str(idx), ts=(idx + 1) * MS)
+            tracker.on_event({"orderID": "x{}".format(idx)},
+                             ts=(idx + 1) * MS)
+
+        self.assertLessEqual(tracker.pending(), 10)
+        self.assertLessEqual(len(tracker._by_id), 10)
+        self.assertLessEqual(len(tracker._early), 11)
+        self.assertEqual(90, tracker.summary()["expired"])
+
+        # expired by age
+        tracker.submit(tracker.NEW, ts=2000 * MS)
+
+        self.assertEqual(1, tracker.pending())
+
+
+if __name__ == "__main__":
+    unittest.main()
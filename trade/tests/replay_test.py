@@ -0,0 +1,182 @@
+# coding: utf-8
+import json
+import shutil
+import tempfile
+import time
+import unittest
+
+import arrow
+
+from clients.capture import FrameCapture
+
+from ..batcher import OrderBatcher
+from ..core import Trader
+from ..replay import ReplayTrader, replay_class
+
+
+START = arrow.get("2019-08-01T04:00:00.000Z")
+
+
+def trade_frame(action, seconds, price, size=1):
+    timestamp = START.shift(seconds=seconds)
+
+    return timestamp, json.dumps({
+        "table": "trade", "action": action, "keys": [],
+        "data": [{"symbol": "XBTUSD", "side": "Buy", "price": price,
+                  "size": size,
+                  "timestamp": timestamp.isoformat().replace("+00:00",
+                                                             "Z")}]})
+
+
+class ReplayTraderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        frames = [trade_frame("partial", 0, 100.0)]
+        for table in ("instrument", "orderBookL2", "quote"):
+            frames.append((START, json.dumps({
+                "table": table, "action": "partial", "keys": ["id"],
+                "data": [{"symbol": "XBTUSD", "id": 1, "side": "Buy",
+                          "price": 100.0, "size": 1}]})))
+
+        # one trade every 30s in 10 minutes
+        for idx in range(1, 21):
+            frames.append(trade_frame("insert", idx * 30, 100.0 + idx))
+
+        capture = FrameCapture(self.directory)
+        for timestamp, frame in frames:
+            capture.write(frame, int(timestamp.float_timestamp * 10 ** 9))
+        capture.close()
+
+    def test_offline_bars(self):
+        bars = list()
+        trades = list()
+
+        class Trader(ReplayTrader):
+            def on_bar(self, bar):
+                bars.append(bar)
+
+            def on_trade(self, trade_data, ts=None):
+                trades.append((trade_data["price"], ts))
+
+        trader = Trader(host=None, symbol="XBTUSD",
+                        ws_opts={"source": self.directory})
+
+        self.assertTrue(trader.running)
+        self.assertEqual(START.float_timestamp, trader.clock.time())
+
+        trader.replay()
+
+        self.assertFalse(trader.running)
+        self.assertEqual(24, trader.replayed)
+        self.assertEqual(20, len(trades))
+        self.assertEqual(
+            int(START.shift(seconds=600).float_timestamp * 1000),
+            trades[-1][1])
+
+        # bars are confirmed by virtual bar timer & trades
+        self.assertEqual([START.shift(minutes=m) for m in (0, 3, 6)],
+                         [bar.ts for bar in bars])
+        # partial trade is counted too
+        self.assertEqual((100.0, 105.0, 6),
+                         (bars[0].open, bars[0].close, bars[0].volume))
+
+        # table rows are not converted by kline
+        self.assertTrue(all(isinstance(trade["timestamp"], str)
+                            for trade in trader.data["trade"]))
+
+    def test_stop_dispatchers(self):
+        trades = list()
+
+        class Trader(ReplayTrader):
+            def on_trade(self, trade_data, ts=None):
+                time.sleep(0.005)
+                trades.append(trade_data["price"])
+
+        trader = Trader(host=None, symbol="XBTUSD",
+                        ws_opts={"source": self.directory},
+                        dispatch_opts={"trade": {"mode": "single"}})
+
+        trader.replay()
+
+        # queued callbacks are finished before workers stopped
+        self.assertEqual(20, len(trades))
+        self.assertFalse(any(
+            worker._thread.is_alive()
+            for worker in trader._dispatchers["trade"]._workers))
+
+    def test_flush_batcher(self):
+        from .batcher_test import FakeClient
+
+        trader = ReplayTrader(host=None, symbol="XBTUSD",
+                              ws_opts={"source": self.directory})
+        trader.order_batcher = OrderBatcher(FakeClient(), window=60)
+
+        future = trader.order_batcher.new(symbol="XBTUSD", orderQty=1)
+
+        trader.replay()
+
+        # pending intents are sent when stopped
+        self.assertEqual("id-single", future.result(1)["orderID"])
+
+    def test_book_rows(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        frames = [trade_frame("partial", 0, 100.0)]
+        for table in ("instrument", "orderBookL2", "quote"):
+            frames.append((START, json.dumps({
+                "table": table, "action": "partial", "keys": ["id"],
+                "data": [{"symbol": "XBTUSD", "id": 1, "side": "Buy",
+                          "price": 100.0, "size": 1}]})))
+        for size in (5, 6):
+            frames.append((START.shift(seconds=1), json.dumps({
+                "table": "orderBookL2", "action": "update",
+                "data": [{"symbol": "XBTUSD", "id": 1, "side": "Buy",
+                          "size": size}]})))
+
+        capture = FrameCapture(directory)
+        for timestamp, frame in frames:
+            capture.write(frame, int(timestamp.float_timestamp * 10 ** 9))
+        capture.close()
+
+        for book_interval in (None, 0):
+            books = list()
+
+            class Trader(ReplayTrader):
+                def on_book(self, symbol, changes, ts=None):
+                    books.append(changes)
+
+            trader = Trader(host=None, symbol="XBTUSD",
+                            ws_opts={"source": directory},
+                            book_interval=book_interval)
+            trader.replay()
+
+            if book_interval is not None:
+                self.assertIsNone(books[0])
+                # updates may be conflated into book reset
+                self.assertTrue(all(changes is None or
+                                    changes[1]["price"] == 100.0
+                                    for changes in books))
+                self.assertFalse(trader._book_conflator._thread.is_alive())
+                continue
+
+            # whole rows with price, not update messages' fields
+            self.assertEqual(
+                {1: {"symbol": "XBTUSD", "id": 1, "side": "Buy",
+                     "price": 100.0, "size": 6}}, books[-1])
+
+    def test_replay_class(self):
+        class Strategy(Trader):
+            pass
+
+        replay_cls = replay_class(Strategy)
+
+        self.assertTrue(issubclass(replay_cls, Strategy))
+        self.assertTrue(issubclass(replay_cls, ReplayTrader))
+        self.assertIs(ReplayTrader, replay_class(Trader))
+        self.assertIs(ReplayTrader, replay_class(ReplayTrader))
+
+        with self.assertRaises(ValueError):
+            replay_cls(host=None, symbol="XBTUSD")